@@ -1,10 +1,14 @@
 import streamlit as st
 import os
-import openai
 import datetime
 import plotly.express as px
 import pandas as pd
 import random
+from utils.data_manager import DataManager
+from utils.components import paginated_list
+from utils.figures import THEME_ACCENTS, current_theme
+from utils.openai_helper import get_ai_health
+from utils.theme import use_theme
 
 # Define eco-driving tips
 eco_tips = [
@@ -46,17 +50,6 @@ eco_tips = [
     }
 ]
 
-# Check if the API key is available
-api_key = os.getenv("OPENAI_API_KEY")
-if not api_key:
-    st.error("OpenAI API key not found. Please set the OPENAI_API_KEY environment variable.")
-    # For demo purposes only - don't hardcode API keys in production
-    # You can use a placeholder for the demo or handle it differently
-    api_key = "Your API key here"  # Replace with your actual API key for testing
-
-# Initialize OpenAI client
-openai.api_key = api_key
-
 # Configure the page with custom theme settings
 st.set_page_config(
     page_title="Eco-Driving Assistant",
@@ -70,291 +63,12 @@ st.set_page_config(
     }
 )
 
-# Custom CSS for better UI with simplified styles
-st.markdown("""
-<style>
-    /* Base theme colors - simplified */
-    :root {
-        --primary-dark: #1B5E20;
-        --primary-main: #2E7D32;
-        --primary-light: #4CAF50;
-        --background-dark: #1E1E1E;
-        --background-light: #263238;
-        --text-light: #ECEFF1;
-        --text-dark: #B0BEC5;
-    }
-    
-    /* Simple background - better performance */
-    .stApp {
-        background-color: var(--background-dark);
-        background-image: url('https://images.unsplash.com/photo-1557692538-9564c4b2cd33?auto=format&fit=crop&q=60&w=500&ixlib=rb-4.0.3');
-        background-size: 400px;
-        background-repeat: repeat;
-        background-position: center;
-        background-blend-mode: soft-light;
-        background-opacity: 0.1;
-    }
-    
-    /* Fix for Streamlit elements to ensure proper rendering */
-    .stMarkdown, .stButton, .stSelectbox, .stRadio, .stMetric {
-        position: relative;
-        z-index: 5;
-    }
-    
-    /* Main header styling */
-    .main-header {
-        font-size: 2.5rem;
-        color: var(--primary-light);
-        margin-bottom: 0;
-        position: relative;
-        z-index: 5;
-    }
-    
-    .sub-header {
-        font-size: 1.1rem;
-        color: var(--text-dark);
-        font-style: italic;
-        margin-bottom: 2rem;
-        position: relative;
-        z-index: 5;
-    }
-    
-    /* Card styling */
-    .metric-card {
-        background-color: var(--background-light);
-        border-radius: 10px;
-        padding: 20px;
-        box-shadow: 0 4px 8px rgba(0, 0, 0, 0.2);
-        border-left: 4px solid var(--primary-light);
-        color: var(--text-light);
-        position: relative;
-        overflow: hidden;
-        transition: transform 0.3s, box-shadow 0.3s;
-        background-image: url('https://images.unsplash.com/photo-1523961131990-5ea7c61b2107?auto=format&fit=crop&q=60&w=200&ixlib=rb-4.0.3');
-        background-size: 100px;
-        background-position: right bottom;
-        background-repeat: no-repeat;
-        background-blend-mode: soft-light;
-        background-opacity: 0.15;
-        margin-bottom: 0.5rem;
-    }
-    
-    .metric-card:hover {
-        transform: translateY(-5px);
-        box-shadow: 0 8px 16px rgba(0, 0, 0, 0.3);
-    }
-    
-    /* Section headers */
-    .section-header {
-        margin-top: 2rem;
-        margin-bottom: 1rem;
-        font-weight: 600;
-        color: var(--primary-light);
-        border-bottom: 1px solid var(--primary-light);
-        padding-bottom: 8px;
-    }
-    
-    /* Dynamic header with clean eco-driving themed image */
-    .dynamic-header {
-        background: linear-gradient(90deg, rgba(27,94,32,0.75) 0%, rgba(46,125,50,0.75) 100%);
-        padding: 20px;
-        border-radius: 10px;
-        margin-bottom: 20px;
-        box-shadow: 0 6px 12px rgba(0, 0, 0, 0.3);
-        color: white;
-        position: relative;
-        z-index: 1;
-        background-image: url('https://images.unsplash.com/photo-1605618325400-327c61f1d455?auto=format&fit=crop&q=80&w=500&ixlib=rb-4.0.3');
-        background-size: cover;
-        background-position: center;
-        background-blend-mode: overlay;
-        overflow: hidden;
-    }
-    
-    /* Welcome card with sleek car image */
-    .welcome-card-container {
-        background-color: var(--background-light);
-        padding: 30px 25px;
-        border-radius: 12px;
-        margin-bottom: 20px;
-        box-shadow: 0 8px 16px rgba(0, 0, 0, 0.4);
-        color: var(--text-light);
-        position: relative;
-        z-index: 1;
-        background-image: url('https://images.unsplash.com/photo-1610647752706-3bb12232b3ab?auto=format&fit=crop&q=80&w=500&ixlib=rb-4.0.3');
-        background-size: cover;
-        background-position: center;
-        background-blend-mode: overlay;
-        background-color: rgba(24, 30, 36, 0.75);
-        border-left: 5px solid #9CCC65;
-        overflow: hidden;
-    }
-    
-    .welcome-content {
-        position: relative;
-        z-index: 2;
-        padding: 20px;
-        background-color: rgba(0,0,0,0.6);
-        border-radius: 10px;
-        margin: 5px;
-        box-shadow: 0 4px 8px rgba(0,0,0,0.3);
-    }
-    
-    .welcome-heading {
-        margin-top: 0;
-        color: #9CCC65;
-        font-size: 1.9rem;
-        text-shadow: 0 2px 4px rgba(0,0,0,0.7);
-        position: relative;
-        z-index: 3;
-    }
-    
-    .welcome-text {
-        font-size: 1.05rem;
-        text-shadow: 0 1px 3px rgba(0,0,0,0.6);
-        max-width: 80%;
-        color: #E0E0E0;
-        position: relative;
-        z-index: 3;
-    }
-    
-    .eco-score-container {
-        display: inline-flex;
-        align-items: center;
-        gap: 8px;
-        box-shadow: 0 4px 12px rgba(0,0,0,0.5);
-        padding: 8px 18px;
-        position: relative;
-        z-index: 3;
-        background-color: rgba(27, 94, 32, 0.9);
-        border-radius: 20px;
-    }
-    
-    /* Tip card with eco-driving themed image */
-    .tip-card {
-        background-color: var(--background-light);
-        padding: 20px;
-        border-radius: 10px;
-        margin-bottom: 20px;
-        border-left: 5px solid var(--primary-light);
-        box-shadow: 0 4px 8px rgba(0, 0, 0, 0.2);
-        color: var(--text-light);
-        position: relative;
-        overflow: hidden;
-        z-index: 1;
-        background-image: url('https://images.unsplash.com/photo-1566935534912-68d2fff4a673?auto=format&fit=crop&q=80&w=500&ixlib=rb-4.0.3');
-        background-size: cover;
-        background-position: center;
-        background-blend-mode: soft-light;
-        background-color: rgba(38, 50, 56, 0.9);
-        transition: transform 0.3s;
-    }
-    
-    .tip-card:hover {
-        transform: translateY(-5px);
-        box-shadow: 0 8px 16px rgba(0, 0, 0, 0.3);
-    }
-    
-    /* Activity card styling */
-    .activity-card {
-        background-color: var(--background-light);
-        padding: 15px;
-        border-radius: 10px;
-        margin-bottom: 12px;
-        display: flex;
-        align-items: center;
-        box-shadow: 0 3px 6px rgba(0,0,0,0.2);
-        transition: transform 0.2s, box-shadow 0.2s;
-        border-left: 4px solid var(--primary-light);
-    }
-    
-    .activity-card:hover {
-        transform: translateY(-2px);
-        box-shadow: 0 6px 12px rgba(0,0,0,0.3);
-    }
-    
-    .activity-icon {
-        font-size: 28px;
-        margin-right: 15px;
-        width: 50px;
-        height: 50px;
-        border-radius: 50%;
-        display: flex;
-        align-items: center;
-        justify-content: center;
-    }
-    
-    .activity-content {
-        flex-grow: 1;
-    }
-    
-    .activity-header {
-        display: flex;
-        justify-content: space-between;
-        align-items: center;
-    }
-    
-    .activity-title {
-        font-weight: bold;
-        color: var(--text-light);
-        font-size: 1.1rem;
-    }
-    
-    .activity-date {
-        color: var(--text-dark);
-        font-size: 0.9rem;
-        background-color: rgba(0,0,0,0.2);
-        padding: 3px 10px;
-        border-radius: 12px;
-    }
-    
-    .activity-details {
-        color: var(--text-dark);
-        margin-top: 6px;
-    }
-    
-    .activity-tag {
-        font-size: 0.8rem;
-        color: white;
-        padding: 2px 8px;
-        border-radius: 12px;
-        display: inline-flex;
-        align-items: center;
-        margin-top: 8px;
-    }
-    
-    .activity-tag-dot {
-        display: inline-block;
-        width: 8px;
-        height: 8px;
-        border-radius: 50%;
-        background-color: white;
-        margin-right: 5px;
-    }
-    
-    /* Score badge */
-    .eco-score-badge {
-        display: inline-flex;
-        align-items: center;
-        padding: 5px 15px;
-        background-color: var(--primary-dark);
-        color: white;
-        border-radius: 20px;
-        font-weight: bold;
-        margin-top: 10px;
-    }
-    
-    /* Streamlit element overrides */
-    [data-testid="stMetricValue"] {
-        font-weight: bold;
-        color: var(--text-light);
-    }
-    
-    [data-testid="stMetricLabel"] {
-        color: var(--text-dark);
-    }
-</style>
-""", unsafe_allow_html=True)
+# The AI helpers fall back to built-in tips without a key, so this is a notice rather than a stop
+if not os.getenv("OPENAI_API_KEY"):
+    st.warning("OpenAI API key not found. Set the OPENAI_API_KEY environment variable to get personalized AI tips.")
+
+# Styles come from the shared theme as one cached stylesheet
+use_theme("home")
 
 # Sidebar for user profile and app settings
 with st.sidebar:
@@ -374,11 +88,25 @@ with st.sidebar:
     </div>
     """, unsafe_allow_html=True)
     
-    vehicle_model = st.text_input("Vehicle", value="Toyota Prius")
+    # Vehicle selection is shared with the other pages through session state
+    fleet = DataManager.get_fleet()
+    vehicle_models = dict(zip(fleet['vehicle_id'], fleet['model']))
+    vehicle_options = list(vehicle_models) + [None]
+    current_vehicle = st.session_state.get("vehicle_id", vehicle_options[0])
+    vehicle_id = st.selectbox(
+        "Vehicle",
+        vehicle_options,
+        index=vehicle_options.index(current_vehicle) if current_vehicle in vehicle_options else 0,
+        format_func=lambda v: "All vehicles (fleet)" if v is None else f"{vehicle_models[v]} ({v})"
+    )
+    st.session_state.vehicle_id = vehicle_id
+    vehicle_model = "Fleet" if vehicle_id is None else vehicle_models[vehicle_id]
     
     # Display a dynamic vehicle icon based on the model name
     vehicle_icon = "🚗"
-    if "suv" in vehicle_model.lower() or "truck" in vehicle_model.lower():
+    if vehicle_id is None:
+        vehicle_icon = "🚚"
+    elif "suv" in vehicle_model.lower() or "truck" in vehicle_model.lower():
         vehicle_icon = "🚙"
     elif "electric" in vehicle_model.lower() or "ev" in vehicle_model.lower() or "tesla" in vehicle_model.lower():
         vehicle_icon = "🔋"
@@ -391,7 +119,7 @@ with st.sidebar:
             <div style="font-size: 24px; margin-right: 10px;">{vehicle_icon}</div>
             <div>
                 <div style="font-weight: bold; color: #ECEFF1;">{vehicle_model}</div>
-                <div style="color: #B0BEC5;">Your vehicle</div>
+                <div style="color: #B0BEC5;">{"All vehicles" if vehicle_id is None else "Your vehicle"}</div>
             </div>
         </div>
     </div>
@@ -400,49 +128,29 @@ with st.sidebar:
     st.markdown("---")
     
     st.markdown("### App Settings")
-    theme = st.selectbox("Theme", ["Dark Green", "Dark Blue", "Dark Purple"])
+    # The theme is shared with the other pages through session state, like the vehicle. It's set in
+    # the callback so the stylesheet loaded at the top of the page is already the new one
+    themes = list(THEME_ACCENTS)
+    st.selectbox("Theme", themes, index=themes.index(current_theme()), key="theme_picker",
+                 on_change=lambda: st.session_state.update(theme=st.session_state.theme_picker))
     unit_system = st.radio("Unit System", ["Metric (km, L)", "Imperial (mi, gal)"])
     
+    # AI service health, so an outage shows up here rather than as unexplained generic tips
+    ai_health = get_ai_health()
+    if not ai_health['configured']:
+        st.caption("🤖 AI service: not configured · showing built-in tips")
+    elif ai_health['circuit'] != 'closed':
+        st.caption("🤖 AI service: degraded · showing built-in tips")
+    elif ai_health['scheduler']['queued']:
+        st.caption("🤖 AI service: busy · some tips may be built-in")
+    else:
+        st.caption("🤖 AI service: online")
+    
     st.markdown("---")
     
     # Quick navigation with advanced styling
     st.markdown("### Quick Navigation")
     
-    # Create navigation buttons with icons and hover effects
-    st.markdown("""
-    <style>
-    .nav-button {
-        background-color: #263238;
-        border: none;
-        color: #ECEFF1;
-        padding: 12px 16px;
-        text-align: left;
-        text-decoration: none;
-        display: flex;
-        align-items: center;
-        margin: 8px 0;
-        border-radius: 6px;
-        cursor: pointer;
-        transition: all 0.3s;
-        box-shadow: 0 2px 5px rgba(0, 0, 0, 0.2);
-        width: 100%;
-    }
-    
-    .nav-button:hover {
-        background-color: #1B5E20;
-        box-shadow: 0 4px 8px rgba(0, 0, 0, 0.3);
-        transform: translateY(-2px);
-    }
-    
-    .nav-icon {
-        font-size: 20px;
-        margin-right: 10px;
-        width: 24px;
-        text-align: center;
-    }
-    </style>
-    """, unsafe_allow_html=True)
-    
     if st.button("📊 Driving Analysis", use_container_width=True):
         st.switch_page("pages/1_driving_analysis.py")
     if st.button("🔧 Vehicle Maintenance", use_container_width=True):
@@ -576,6 +284,29 @@ with col2:
         horizontal=True
     )
 
+# Icon and colours of each activity type's cards
+ACTIVITY_STYLES = {
+    'Trip': {'icon': "🚗", 'bg_color': "#1B3C20", 'border_color': "#4CAF50"},
+    'Maintenance': {'icon': "🔧", 'bg_color': "#1A3855", 'border_color': "#2196F3"},
+    'Fuel': {'icon': "⛽", 'bg_color': "#553319", 'border_color': "#FF9800"},
+    'Other': {'icon': "📋", 'bg_color': "#263238", 'border_color': "#9E9E9E"},
+}
+ACTIVITY_CARD_TEMPLATE = """
+    <div class="activity-card" style="background-color: {bg_color}; border-left-color: {border_color};">
+        <div class="activity-icon">{icon}</div>
+        <div class="activity-content">
+            <div class="activity-header">
+                <span class="activity-title">{Activity}</span>
+                <span class="activity-date">{Date}</span>
+            </div>
+            <div class="activity-details">{Details}</div>
+            <span class="activity-tag" style="background-color: {border_color};">
+                <span class="activity-tag-dot"></span>{Type}
+            </span>
+        </div>
+    </div>
+"""
+
 # Activity data
 activity_data = {
     'Date': ['2024-01-15', '2024-01-14', '2024-01-13', '2024-01-10', '2024-01-08'],
@@ -599,55 +330,14 @@ else:
     df = df.sort_values(by='Date', ascending=True)
 df['Date'] = df['Date'].dt.strftime('%b %d, %Y')
 
-# Simple activity cards using standard components with dynamic styling
+# Activity cards, styled by activity type, rendered a page at a time as one element
 if not df.empty:
-    for _, row in df.iterrows():
-        col1, col2 = st.columns([1, 4])
-        
-        # Set background color based on activity type
-        if row['Type'] == 'Trip':
-            bg_color = "#1B3C20"
-            icon = "🚗"
-            border_color = "#4CAF50"
-        elif row['Type'] == 'Maintenance':
-            bg_color = "#1A3855"
-            icon = "🔧"
-            border_color = "#2196F3"
-        elif row['Type'] == 'Fuel':
-            bg_color = "#553319"
-            icon = "⛽"
-            border_color = "#FF9800"
-        else:
-            bg_color = "#263238"
-            icon = "📋"
-            border_color = "#9E9E9E"
-        
-        with col1:
-            st.markdown(f'<div style="font-size:36px; text-align:center; margin-top:10px;">{icon}</div>', unsafe_allow_html=True)
-        
-        with col2:
-            st.markdown(f"""
-            <div style="background-color: {bg_color}; padding: 12px; border-radius: 8px; margin-bottom: 12px; 
-                      border-left: 4px solid {border_color}; box-shadow: 0 3px 6px rgba(0,0,0,0.2); 
-                      transition: transform 0.2s; position: relative;"
-                 onmouseover="this.style.transform='translateY(-3px)'"
-                 onmouseout="this.style.transform='translateY(0)'">
-                <div>
-                    <strong style="color: #ECEFF1; font-size: 1.1rem;">{row['Activity']}</strong> 
-                    <span style="float:right; color: #B0BEC5; font-size:0.9rem; background-color: rgba(0,0,0,0.2); 
-                          padding: 2px 10px; border-radius: 12px;">{row['Date']}</span>
-                </div>
-                <div style="color: #B0BEC5; margin-top: 8px;">{row['Details']}</div>
-                <div style="margin-top: 8px;">
-                    <span style="background-color: {border_color}; color: white; padding: 3px 10px; 
-                          border-radius: 12px; font-size: 0.8rem; display: inline-flex; align-items: center;">
-                        <span style="display: inline-block; width: 8px; height: 8px; border-radius: 50%; 
-                              background-color: white; margin-right: 5px;"></span>
-                        {row['Type']}
-                    </span>
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
+    def activity_rows(offset, limit):
+        return [dict(row, **ACTIVITY_STYLES.get(row['Type'], ACTIVITY_STYLES['Other']))
+                for row in df.iloc[offset:offset + limit].to_dict('records')]
+
+    paginated_list("recent_activity", len(df), activity_rows, ACTIVITY_CARD_TEMPLATE,
+                   reset_on=(activity_filter, sort_order))
 else:
     st.info("No activities found. Try changing your filter settings.")
 
@@ -698,11 +388,12 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
-# Sample data for demonstration
+# Sample data for demonstration; seeded so every rerun shows the same numbers
+sample_rng = random.Random(42)
 data = {
     'date': pd.date_range(start='2023-01-01', periods=30),
-    'eco_score': [random.randint(50, 100) for _ in range(30)],
-    'fuel_consumption': [random.uniform(5, 15) for _ in range(30)],
+    'eco_score': [sample_rng.randint(50, 100) for _ in range(30)],
+    'fuel_consumption': [sample_rng.uniform(5, 15) for _ in range(30)],
 }
 
 driving_data = pd.DataFrame(data)
@@ -2,372 +2,97 @@ import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
 from utils.data_manager import DataManager
-from utils.openai_helper import get_driving_tips
+from utils.trip_store import DEFAULT_VEHICLE_ID, bytes_per_trip
+from utils.trip_query import TripIndex
+from utils import background
+from utils.components import lazy_sections, paginated_list
+from utils.downsample import downsample_bars, downsample_line, points_for_width
+from utils.figures import THEME_ACCENTS, cached_figure
+from utils.openai_helper import get_ai_health, get_driving_tips, summarize_driving_data
+from utils.tip_engine import RULE_TIPS, rule_tips
+from utils.theme import use_theme
 import json
 import pandas as pd
 import datetime
 import random
+from functools import partial
 
 # Enable caching for better performance
-@st.cache_data(ttl=600)  # Cache data for 10 minutes
-def load_driving_data():
-    return DataManager.get_driving_history()
-
-@st.cache_data(ttl=3600)  # Cache tips for 1 hour
-def get_cached_driving_tips(data_dict):
-    try:
-        tips_json = get_driving_tips(data_dict)
-        return json.loads(tips_json)
-    except Exception as e:
-        st.error(f"Unable to generate driving tips: {str(e)}")
-        return {"tips": []}
+@st.cache_data(ttl=600)  # Cache data for 10 minutes, or until the data version changes
+def load_driving_data(start=None, end=None, columns=None, vehicle_id=DEFAULT_VEHICLE_ID, approximate=False,
+                      data_version=None):
+    # The fleet view is one row per day, aggregated across vehicles in parallel (or estimated from the trip sample)
+    if vehicle_id is None:
+        daily = DataManager.get_fleet_daily_summary(start=start, end=end, approximate=approximate)
+        return daily[list(columns)] if columns else daily
+    return DataManager.get_driving_history(start=start, end=end, columns=columns, vehicle_id=vehicle_id)
 
-# Page configuration
-st.set_page_config(
-    page_title="Driving Analysis | Eco-Driving Assistant",
-    page_icon="🚦",
-    layout="wide"
-)
+# Trip history index shared by all sessions; a new data version builds a new one
+@st.cache_resource(max_entries=32)
+def load_trip_index(vehicle_id, data_version):
+    return TripIndex(load_driving_data(columns=['distance', 'eco_score'], vehicle_id=vehicle_id,
+                                       data_version=data_version))
 
-# Custom CSS with dark theme - optimized for performance
-st.markdown("""
-<style>
-    :root {
-        --primary-dark: #1B5E20;
-        --primary: #2E7D32;
-        --primary-light: #4CAF50;
-        --accent: #81C784;
-        --background-darkest: #121212;
-        --background-dark: #1E1E1E;
-        --background-medium: #202A2E;
-        --text-light: #ECEFF1;
-        --text-medium: #B0BEC5;
-        --text-dark: #607D8B;
-        --warning: #FFC107;
-        --error: #F44336;
-    }
+# Poll until the background jobs behind the estimates finish, then rerun the page with exact figures
+@st.fragment(run_every=2)
+def refine_when_ready(keys):
+    if all(background.done(key) for key in keys):
+        st.rerun()
 
-    /* Text shadows for better performance */
-    .text-shadow-sm {
-        text-shadow: 0 1px 2px rgba(0,0,0,0.3);
-    }
-    
-    .text-shadow-md {
-        text-shadow: 0 1px 3px rgba(0,0,0,0.5);
-    }
-    
-    .text-shadow-lg {
-        text-shadow: 0 2px 4px rgba(0,0,0,0.6);
-    }
-    
-    /* Common container styles */
-    .card-container {
-        background-color: var(--background-medium);
-        border-radius: 10px;
-        padding: 20px;
-        box-shadow: 0 4px 8px rgba(0,0,0,0.2);
-        margin-bottom: 20px;
-        position: relative;
-        overflow: hidden;
-    }
-    
-    /* Page header with dynamic background */
-    .page-header {
-        background: linear-gradient(90deg, rgba(27,94,32,0.85) 0%, rgba(46,125,50,0.85) 100%);
-        border-radius: 10px;
-        padding: 20px;
-        margin-bottom: 30px;
-        position: relative;
-        overflow: hidden;
-        background-image: url('https://images.unsplash.com/photo-1553260188-75a8d6205b4e?auto=format&fit=crop&q=60&w=300');
-        background-size: cover;
-        background-position: center;
-        background-blend-mode: overlay;
-    }
-    
-    .page-header-content {
-        position: relative;
-        z-index: 2;
-    }
-    
-    .page-title {
-        margin: 0;
-        color: #ECEFF1;
-        font-size: 2.5rem;
-        text-shadow: 0 2px 4px rgba(0,0,0,0.5);
-    }
-    
-    .page-subtitle {
-        color: #B0BEC5;
-        margin-top: 5px;
-        font-size: 1.1rem;
-        text-shadow: 0 1px 3px rgba(0,0,0,0.5);
-    }
-    
-    /* Chart container styling */
-    .chart-container {
-        border-left: 4px solid var(--primary);
-    }
-    
-    .chart-header {
-        position: relative;
-        z-index: 3;
-        color: var(--primary-light);
-        margin-bottom: 1rem;
-        text-shadow: 0 1px 2px rgba(0,0,0,0.3);
-    }
-    
-    .chart-container::before {
-        content: "";
-        position: absolute;
-        top: 0;
-        right: 0;
-        bottom: 0;
-        width: 120px;
-        background-image: url('https://images.unsplash.com/photo-1567808291548-fc3ee04dbcf0?auto=format&fit=crop&q=60&w=150');
-        background-position: center right;
-        background-repeat: no-repeat;
-        background-size: cover;
-        opacity: 0.1;
-        z-index: 1;
-    }
-    
-    /* Tips styling */
-    .driving-tip {
-        background-color: #19321E;
-        border-left: 5px solid var(--primary);
-        padding: 20px;
-        border-radius: 8px;
-        margin-bottom: 15px;
-        position: relative;
-        overflow: hidden;
-        box-shadow: 0 3px 6px rgba(0,0,0,0.2);
-    }
-    
-    .driving-tip h4 {
-        color: var(--accent);
-        margin-top: 0;
-        position: relative;
-        z-index: 3;
-    }
-    
-    .driving-tip p {
-        position: relative;
-        z-index: 3;
-    }
-    
-    .tips-container {
-        padding: 15px;
-        border-radius: 10px;
-        background-color: rgba(25, 50, 30, 0.6);
-        margin-top: 20px;
-        margin-bottom: 30px;
-        background-image: url('https://images.unsplash.com/photo-1449965408869-eaa3f722e40d?auto=format&fit=crop&q=60&w=200');
-        background-size: cover;
-        background-position: center;
-        background-blend-mode: soft-light;
-        position: relative;
-        overflow: hidden;
-    }
-    
-    .tips-header {
-        color: #81C784;
-        margin-top: 10px;
-        margin-bottom: 20px;
-        position: relative;
-        z-index: 3;
-        text-shadow: 0 1px 3px rgba(0,0,0,0.5);
-    }
-    
-    /* Score container styling */
-    .score-title {
-        font-size: 1.5rem;
-        margin-bottom: 0.5rem;
-        color: var(--primary-light);
-        text-shadow: 0 1px 3px rgba(0,0,0,0.4);
-        position: relative;
-        z-index: 3;
-    }
-    
-    .score-container {
-        background: linear-gradient(90deg, rgba(23, 61, 27, 0.85) 0%, rgba(27, 71, 32, 0.85) 50%, rgba(31, 81, 37, 0.85) 100%);
-        padding: 25px;
-        border-radius: 10px;
-        text-align: center;
-        margin-bottom: 20px;
-        box-shadow: 0 4px 8px rgba(0,0,0,0.2);
-        position: relative;
-        overflow: hidden;
-        background-image: url('https://images.unsplash.com/photo-1494976388531-d1058494cdd8?auto=format&fit=crop&q=60&w=300');
-        background-size: cover;
-        background-position: center;
-        background-blend-mode: overlay;
-    }
-    
-    .score-content {
-        position: relative;
-        z-index: 2;
-        background-color: rgba(0,0,0,0.5);
-        border-radius: 10px;
-        padding: 20px;
-        margin: 10px;
-    }
-    
-    /* Trip card styling */
-    .trip-card {
-        background-color: var(--background-medium);
-        border-radius: 8px;
-        padding: 20px;
-        box-shadow: 0 3px 6px rgba(0,0,0,0.2);
-        margin-bottom: 15px;
-        border-left: 3px solid var(--primary);
-        position: relative;
-        overflow: hidden;
-        transition: transform 0.2s ease, box-shadow 0.2s ease;
-    }
-    
-    .trip-card:hover {
-        transform: translateY(-3px);
-        box-shadow: 0 6px 12px rgba(0,0,0,0.3);
-    }
-    
-    .trip-card::after {
-        content: "🚗";
-        position: absolute;
-        bottom: 10px;
-        right: 20px;
-        font-size: 24px;
-        opacity: 0.1;
-        transform: rotate(-5deg);
-    }
-    
-    .trip-card h4 {
-        color: var(--text-light);
-        margin-top: 0;
-        position: relative;
-        z-index: 2;
-    }
-    
-    .trip-details {
-        position: relative;
-        z-index: 2;
-    }
-    
-    .eco-score-circle {
-        position: relative;
-        z-index: 2;
-    }
-    
-    .metric-label {
-        font-weight: 600;
-        color: var(--text-medium);
-    }
-    
-    .filter-container {
-        background-color: #162938;
-        padding: 15px;
-        border-radius: 10px;
-        margin-bottom: 20px;
-        border-left: 4px solid #2196F3;
-    }
-    
-    /* UI controls styling */
-    .stButton>button {
-        background-color: var(--primary);
-        color: white;
-        border: none;
-        border-radius: 4px;
-        transition: all 0.3s;
-    }
-    
-    .stButton>button:hover {
-        background-color: var(--primary-light);
-        box-shadow: 0 4px 8px rgba(0, 0, 0, 0.2);
-    }
-    
-    .stSlider [data-baseweb=slider] {
-        height: 6px;
-    }
-    
-    .stSlider [data-baseweb=thumb] {
-        background-color: var(--primary-light);
-    }
-    
-    .stRadio>div {
-        background-color: var(--background-medium);
-        padding: 10px;
-        border-radius: 5px;
-    }
-    
-    .stTabs [data-baseweb="tab-list"] {
-        gap: 8px;
-    }
-    
-    .stTabs [data-baseweb="tab"] {
-        height: 50px;
-        border-radius: 5px 5px 0 0;
-        padding: 10px 20px;
-        background-color: var(--background-medium);
-    }
-    
-    .stTabs [aria-selected="true"] {
-        background-color: var(--primary) !important;
-        color: white !important;
-    }
-    
-    /* Override Streamlit's default theme */
-    .stApp {
-        background-color: var(--background-dark);
-    }
-    
-    h1, h2, h3, h4, h5, h6, .stMarkdown p {
-        color: var(--text-light);
-    }
-    
-    .stSelectbox label, .stSlider label {
-        color: var(--text-medium) !important;
-    }
-    
-    /* Apply card-container class to chart and other containers */
-    .chart-container, .tips-container, .score-container, .filter-container {
-        @extend .card-container;
-    }
-</style>
-""", unsafe_allow_html=True)
+def show_interval(metrics, name, fmt, unit=""):
+    """Show an estimated metric's 95% confidence interval under it; exact metrics show nothing."""
+    if metrics is None:
+        return
+    half_width = (metrics[name].high - metrics[name].low) / 2
+    if half_width > 0:
+        st.caption(f"±{half_width:{fmt}}{unit} (95% CI)")
 
-# Page title with dynamic background
-st.markdown("""
-<div class="page-header">
-    <div class="page-header-content">
-        <h1 class="page-title">Driving Behavior Analysis</h1>
-        <p class="page-subtitle">
-            Gain insights into your driving patterns and receive personalized tips to improve your eco-driving score.
-        </p>
+TRIP_SORT_ORDERS = {
+    "Date (newest first)": "date_desc",
+    "Date (oldest first)": "date_asc",
+    "Eco-Score (highest first)": "eco_desc",
+    "Eco-Score (lowest first)": "eco_asc",
+}
+
+# One trip in the Trip History tab
+TRIP_CARD_TEMPLATE = """
+    <div class='trip-card'>
+        <div style='display: flex; justify-content: space-between; align-items: center;'>
+            <div class='trip-details'>
+                <h4 style="margin-top: 0;">{date}</h4>
+                <p style="color: #B0BEC5;"><span class='metric-label'>Distance:</span> {distance:.1f} km</p>
+                <p style="color: #B0BEC5;"><span class='metric-label'>Eco-Score:</span> <span style="color: {eco_score_color};">{eco_score:.0f}</span></p>
+            </div>
+        </div>
     </div>
-    <div style="position: absolute; top: 10px; right: 20px; font-size: 50px; opacity: 0.8; text-shadow: 0 2px 5px rgba(0,0,0,0.6);">🚦</div>
-    <div style="position: absolute; bottom: 10px; right: 80px; font-size: 35px; opacity: 0.7; text-shadow: 0 2px 5px rgba(0,0,0,0.6);">🚗</div>
-</div>
-""", unsafe_allow_html=True)
+"""
 
-# Get driving data
-driving_data = load_driving_data()
+# One day of fleet totals in the Trip History tab when the whole fleet is selected; its
+# history is the fleet's daily summary, so each row is a day rather than a trip
+FLEET_DAY_CARD_TEMPLATE = """
+    <div class='trip-card'>
+        <div style='display: flex; justify-content: space-between; align-items: center;'>
+            <div class='trip-details'>
+                <h4 style="margin-top: 0;">{date} · all vehicles</h4>
+                <p style="color: #B0BEC5;"><span class='metric-label'>Fleet distance:</span> {distance:.1f} km</p>
+                <p style="color: #B0BEC5;"><span class='metric-label'>Average Eco-Score:</span> <span style="color: {eco_score_color};">{eco_score:.0f}</span></p>
+            </div>
+        </div>
+    </div>
+"""
 
-# Create tabs for different views
-tab1, tab2, tab3 = st.tabs(["📊 Overview", "🔍 Detailed Analysis", "📝 Trip History"])
+def trip_history_rows(trip_index, positions, offset, limit):
+    trips = trip_index.trips.iloc[positions[offset:offset + limit]]
+    return [{
+        'date': trip_date.strftime('%B %d, %Y'),
+        'distance': distance,
+        'eco_score': eco_score,
+        'eco_score_color': "#4CAF50" if eco_score >= 75 else "#FFC107" if eco_score >= 50 else "#F44336",
+    } for trip_date, distance, eco_score in zip(trips.index, trips['distance'], trips['eco_score'])]
 
-with tab1:
-    # Display overall eco-score with gauge chart
-    current_score = driving_data['eco_score'].iloc[-1]
-    previous_score = driving_data['eco_score'].iloc[-2]
-    score_change = current_score - previous_score
-    
-    st.markdown("""
-    <div class='score-container'>
-        <div class='score-content'>
-            <h2 class='score-title'>Current Eco-Score</h2>
-    """, unsafe_allow_html=True)
-    
-    # Create a gauge chart for the eco-score with dark theme - optimized for performance
+# Chart builders for cached_figure: shared by every session, so they only use their arguments.
+# Long ranges are downsampled to what the chart's width can show, keeping its shape and extremes.
+def eco_score_gauge_figure(current_score, previous_score, theme):
     fig = go.Figure(go.Indicator(
         mode="gauge+number+delta",
         value=current_score,
@@ -389,7 +114,7 @@ with tab1:
         number={"font": {"color": "#ECEFF1", "size": 40}},
         title={"text": "Eco-Driving Score", "font": {"color": "#B0BEC5"}}
     ))
-    
+
     fig.update_layout(
         height=280,
         margin=dict(l=20, r=20, t=50, b=20),
@@ -397,6 +122,333 @@ with tab1:
         plot_bgcolor="rgba(0,0,0,0)",
         font={"color": "#B0BEC5"}
     )
+    return fig
+
+def eco_score_trend_figure(data, theme):
+    data = downsample_line(data, 'eco_score', points=points_for_width(0.5))
+    fig_score = px.line(
+        data,
+        x=data.index,
+        y='eco_score',
+        title=None,
+        line_shape='linear',
+        markers=True
+    )
+    fig_score.update_traces(line=dict(width=2, color=THEME_ACCENTS[theme]), marker=dict(size=6))
+    fig_score.update_layout(
+        xaxis_title="Date",
+        yaxis_title="Eco-Score",
+        xaxis=dict(showgrid=False, color="#607D8B", nticks=8),
+        yaxis=dict(range=[0, 100], color="#607D8B"),
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font={"color": "#B0BEC5"},
+        hovermode='x unified',
+        margin=dict(l=50, r=20, t=30, b=50)
+    )
+    return fig_score
+
+def fuel_trend_figure(data, theme):
+    data = downsample_line(data, 'fuel_consumption', points=points_for_width(0.5))
+    fig_fuel = px.line(
+        data,
+        x=data.index,
+        y='fuel_consumption',
+        title=None,
+        line_shape='linear',
+        markers=True
+    )
+    fig_fuel.update_traces(line=dict(width=2, color='#2196F3'), marker=dict(size=6))
+    fig_fuel.update_layout(
+        xaxis_title="Date",
+        yaxis_title="Fuel Consumption (L/100km)",
+        xaxis=dict(showgrid=False, color="#607D8B", nticks=8),
+        yaxis=dict(color="#607D8B"),
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font={"color": "#B0BEC5"},
+        hovermode='x unified',
+        margin=dict(l=50, r=20, t=30, b=50)
+    )
+    return fig_fuel
+
+def harsh_braking_figure(data, theme):
+    data = downsample_bars(data, 'harsh_braking', points=points_for_width(0.5))
+    fig_braking = px.bar(
+        data,
+        x=data.index,
+        y='harsh_braking',
+        title=None,
+        color_discrete_sequence=['#F44336']
+    )
+    fig_braking.update_layout(
+        xaxis_title="Date",
+        yaxis_title="Count",
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font={"color": "#B0BEC5"},
+        xaxis=dict(color="#607D8B", nticks=6),
+        yaxis=dict(color="#607D8B"),
+        bargap=0.3,
+        margin=dict(l=50, r=20, t=30, b=50)
+    )
+    return fig_braking
+
+def rapid_acceleration_figure(data, theme):
+    data = downsample_bars(data, 'rapid_acceleration', points=points_for_width(0.5))
+    fig_accel = px.bar(
+        data,
+        x=data.index,
+        y='rapid_acceleration',
+        title=None,
+        color_discrete_sequence=['#FF9800']
+    )
+    fig_accel.update_layout(
+        xaxis_title="Date",
+        yaxis_title="Count",
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font={"color": "#B0BEC5"},
+        xaxis=dict(color="#607D8B", nticks=6),
+        yaxis=dict(color="#607D8B"),
+        bargap=0.3,
+        margin=dict(l=50, r=20, t=30, b=50)
+    )
+    return fig_accel
+
+def combined_figure(data, theme):
+    # Create a figure with secondary y-axis
+    fig = go.Figure()
+
+    # Add eco-score line - optimized with fewer points if possible
+    line = downsample_line(data, 'eco_score')
+    fig.add_trace(go.Scatter(
+        x=line.index,
+        y=line['eco_score'],
+        name='Eco-Score',
+        line=dict(color=THEME_ACCENTS[theme], width=2),
+        mode='lines+markers',
+        marker=dict(size=6)
+    ))
+
+    # Add harsh events bars with simplified configuration
+    braking = downsample_bars(data, 'harsh_braking')
+    fig.add_trace(go.Bar(
+        x=braking.index,
+        y=braking['harsh_braking'],
+        name='Harsh Braking',
+        marker_color='#F44336',
+        opacity=0.7
+    ))
+
+    acceleration = downsample_bars(data, 'rapid_acceleration')
+    fig.add_trace(go.Bar(
+        x=acceleration.index,
+        y=acceleration['rapid_acceleration'],
+        name='Rapid Acceleration',
+        marker_color='#FF9800',
+        opacity=0.7
+    ))
+
+    # Update layout with optimized configuration
+    fig.update_layout(
+        title=None,
+        xaxis_title="Date",
+        yaxis_title="Eco-Score",
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font={"color": "#B0BEC5"},
+        xaxis=dict(color="#607D8B", nticks=6),
+        yaxis=dict(color="#607D8B"),
+        barmode='group',
+        bargap=0.2,
+        hovermode='x unified',
+        margin=dict(l=50, r=20, t=40, b=50),
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=1.02,
+            xanchor="right",
+            x=1,
+            font=dict(color="#B0BEC5", size=11)
+        )
+    )
+    return fig
+
+# Tips are cached on disk by the summary sent to the model, shared by every session and worker.
+# Runs on the background executor, so it must not call Streamlit.
+def get_cached_driving_tips(data_dict, force_ai=False):
+    return json.loads(get_driving_tips(data_dict, force_ai=force_ai))
+
+def pick_another_tip(tip_count):
+    st.session_state.tip_index = random.randint(0, tip_count - 1)
+
+def ask_ai_coach(summary_key):
+    # Remembered per summary, so new driving data goes back to the rule-based tips
+    st.session_state.ask_ai_tips = summary_key
+    st.session_state.pop('tip_index', None)
+
+def render_driving_tips(tips_key, recent_data, polling):
+    """Fill the tips placeholder once the background model call has finished.
+
+    ``polling`` is True while the fragment reruns on a timer; when the call finishes the
+    whole page reruns so the fragment stops polling.
+    """
+    # A no-op for a known job; restarts one dropped from the finished jobs since the page ran,
+    # which would otherwise read as a failed call
+    background.submit(tips_key, get_cached_driving_tips, recent_data, tips_key[2])
+    finished = background.done(tips_key)
+    # Done while polling, or restarted in a fragment that doesn't poll
+    if finished == polling:
+        st.rerun()
+    if not finished:
+        st.markdown("""
+            <div class='driving-tip'>
+                <h4>Analyzing your driving patterns...</h4>
+                <p style="color: #B0BEC5;">Your personalized tips will appear here in a moment.</p>
+            </div>
+        """, unsafe_allow_html=True)
+        return
+    show_driving_tips(background.result(tips_key), tips_key[1])
+
+def show_driving_tips(tips_dict, summary_key):
+    if tips_dict is None:
+        st.error("Unable to generate driving tips right now.")
+        # Display fallback tips with nicer styling
+        for i, tip in enumerate(RULE_TIPS['general'], 1):
+            st.markdown(f"""
+                <div class='driving-tip'>
+                    <div style="position: absolute; top: 0; right: 0; font-size: 80px; opacity: 0.08; transform: translate(20%, -30%);">💡</div>
+                    <h4>Tip {i}</h4>
+                    <p style="color: #B0BEC5;">{tip}</p>
+                </div>
+            """, unsafe_allow_html=True)
+        return
+
+    # Display each tip with nicer styling
+    if 'tips' in tips_dict and tips_dict['tips']:
+        if st.session_state.get('tip_index', 0) >= len(tips_dict['tips']):
+            del st.session_state['tip_index']
+        if 'tip_index' not in st.session_state:
+            st.session_state.tip_index = random.randint(0, len(tips_dict['tips']) - 1)
+
+        # Display the tip based on the index
+        daily_tip = tips_dict['tips'][st.session_state.tip_index]
+
+        st.markdown(f"""
+            <div class='driving-tip'>
+                <div style="position: absolute; top: 0; right: 0; font-size: 80px; opacity: 0.08; transform: translate(20%, -30%);">💡</div>
+                <h4>Tip {st.session_state.tip_index + 1}</h4>
+                <p style="color: #B0BEC5;">{daily_tip}</p>
+            </div>
+        """, unsafe_allow_html=True)
+
+        # Pick the next tip in a callback so the rerun the click triggers already shows it
+        st.button("🔄 Show me another tip", use_container_width=True, on_click=pick_another_tip,
+                  args=(len(tips_dict['tips']),))
+        if tips_dict.get('source') == 'rules' and get_ai_health()['configured']:
+            st.caption("Tips matched to your driving pattern.")
+            st.button("✨ Ask the AI coach for personalized tips", use_container_width=True, on_click=ask_ai_coach,
+                      args=(summary_key,))
+    else:
+        st.warning("No specific driving tips available at this time.")
+
+# Page configuration
+st.set_page_config(
+    page_title="Driving Analysis | Eco-Driving Assistant",
+    page_icon="🚦",
+    layout="wide"
+)
+
+# Dark theme styles, shared with the other pages through one cached stylesheet
+use_theme("driving")
+
+# Page title with dynamic background
+st.markdown("""
+<div class="page-header">
+    <div class="page-header-content">
+        <h1 class="page-title">Driving Behavior Analysis</h1>
+        <p class="page-subtitle">
+            Gain insights into your driving patterns and receive personalized tips to improve your eco-driving score.
+        </p>
+    </div>
+    <div style="position: absolute; top: 10px; right: 20px; font-size: 50px; opacity: 0.8; text-shadow: 0 2px 5px rgba(0,0,0,0.6);">🚦</div>
+    <div style="position: absolute; bottom: 10px; right: 80px; font-size: 35px; opacity: 0.7; text-shadow: 0 2px 5px rgba(0,0,0,0.6);">🚗</div>
+</div>
+""", unsafe_allow_html=True)
+
+# Get the last 30 days of driving data for the vehicle picked in the sidebar; other views load their own ranges
+vehicle_id = st.session_state.get("vehicle_id", DEFAULT_VEHICLE_ID)
+today = datetime.date.today()
+window_start = today - datetime.timedelta(days=29)
+
+# Fleet-wide views can be answered from the trip sample while the exact figures are computed in the background
+approximate = vehicle_id is None and st.toggle(
+    "⚡ Approximate fleet metrics",
+    key="approximate_metrics",
+    help="Estimate fleet totals from a stratified sample of trips, shown with 95% confidence intervals. "
+         "Exact values replace them as soon as they have been computed."
+)
+trip_metrics = None
+data_version = DataManager.get_data_version(vehicle_id)
+if approximate:
+    exact_jobs = {
+        'driving_data': (('fleet_daily_summary', window_start, today, data_version),
+                         DataManager.get_fleet_daily_summary, dict(start=window_start, end=today)),
+        'trip_metrics': (('fleet_trip_metrics', window_start, today, data_version),
+                         DataManager.get_trip_metrics, dict(start=window_start, end=today, vehicle_id=None)),
+    }
+    exact = {}
+    for name, (key, fn, kwargs) in exact_jobs.items():
+        background.submit(key, fn, **kwargs)
+        exact[name] = background.result(key)
+    driving_data = exact['driving_data']
+    if driving_data is None:
+        driving_data = load_driving_data(start=window_start, end=today, vehicle_id=None, approximate=True,
+                                         data_version=data_version)
+    trip_metrics = exact['trip_metrics'] or DataManager.get_trip_metrics(window_start, today, vehicle_id=None,
+                                                                          approximate=True)
+    pending = [key for key, _, _ in exact_jobs.values() if not background.done(key)]
+    if pending:
+        st.caption("⏳ Showing estimates; exact figures are being computed in the background.")
+        refine_when_ready(pending)
+    else:
+        st.caption("✅ Exact figures.")
+else:
+    driving_data = load_driving_data(start=window_start, end=today, vehicle_id=vehicle_id, data_version=data_version)
+# Charts are rebuilt only when this changes (or the period or theme does); estimates get their own figures
+figure_version = (vehicle_id, data_version, today, approximate and exact['driving_data'] is None)
+
+# Sections of the page; only the one picked is computed, so the charts and trip list
+# don't slow down the overview. Filters are kept while their section is hidden.
+OVERVIEW, DETAILED_ANALYSIS, TRIP_HISTORY = "📊 Overview", "🔍 Detailed Analysis", "📝 Trip History"
+section = lazy_sections([OVERVIEW, DETAILED_ANALYSIS, TRIP_HISTORY], key="driving_section", keep={
+    DETAILED_ANALYSIS: ["analysis_period", "analysis_start", "analysis_end"],
+    TRIP_HISTORY: ["trip_min_eco_score", "trip_date_range", "trip_sort", "trip_history_page_size"],
+})
+
+if section == OVERVIEW and len(driving_data) < 2:
+    # The score gauge compares the last two entries of the window
+    st.info("Not enough driving data in the last 30 days for an overview yet. Record a few trips to see "
+            "your eco-score, metrics and tips here.")
+elif section == OVERVIEW:
+    # Week-on-week deltas are only shown once there are two full weeks to compare
+    full_fortnight = len(driving_data) >= 14
+
+    # Display overall eco-score with gauge chart
+    current_score = driving_data['eco_score'].iloc[-1]
+    previous_score = driving_data['eco_score'].iloc[-2]
+    score_change = current_score - previous_score
+    
+    st.markdown("""
+    <div class='score-container'>
+        <div class='score-content'>
+            <h2 class='score-title'>Current Eco-Score</h2>
+    """, unsafe_allow_html=True)
+    
+    # Gauge chart for the eco-score with dark theme, built once per data version
+    fig = cached_figure('driving.eco_score_gauge', figure_version, 'latest', eco_score_gauge_figure,
+                        current_score, previous_score)
     
     st.plotly_chart(fig, use_container_width=True)
     
@@ -421,32 +473,40 @@ with tab1:
     # Key metrics in a row
     col1, col2, col3 = st.columns(3)
     with col1:
-        avg_fuel = driving_data['fuel_consumption'].mean()
+        avg_fuel = driving_data['fuel_consumption'].mean() if trip_metrics is None else trip_metrics['fuel_consumption'].value
         st.metric(
             label="Avg. Fuel Consumption",
             value=f"{avg_fuel:.1f} L/100km",
             delta=f"{avg_fuel - driving_data['fuel_consumption'].iloc[0]:.1f}",
             delta_color="inverse"
         )
+        show_interval(trip_metrics, 'fuel_consumption', ".2f", " L/100km")
     
     with col2:
-        total_distance = driving_data['distance'].sum()
+        total_distance = driving_data['distance'].sum() if trip_metrics is None else trip_metrics['distance'].value
         st.metric(
             label="Total Distance",
             value=f"{total_distance:.1f} km",
             delta=f"{driving_data['distance'].iloc[-7:].sum() - driving_data['distance'].iloc[-14:-7].sum():.1f} km"
+            if full_fortnight else None
         )
+        show_interval(trip_metrics, 'distance', ",.0f", " km")
     
     with col3:
-        harsh_events = driving_data['harsh_braking'].sum() + driving_data['rapid_acceleration'].sum()
-        recent_harsh = driving_data['harsh_braking'].iloc[-7:].sum() + driving_data['rapid_acceleration'].iloc[-7:].sum()
-        previous_harsh = driving_data['harsh_braking'].iloc[-14:-7].sum() + driving_data['rapid_acceleration'].iloc[-14:-7].sum()
+        # Event counts are stored as small unsigned ints; use Python ints so the delta can go negative
+        if trip_metrics is None:
+            harsh_events = int(driving_data['harsh_braking'].sum()) + int(driving_data['rapid_acceleration'].sum())
+        else:
+            harsh_events = round(trip_metrics['harsh_events'].value)
+        recent_harsh = int(driving_data['harsh_braking'].iloc[-7:].sum()) + int(driving_data['rapid_acceleration'].iloc[-7:].sum())
+        previous_harsh = int(driving_data['harsh_braking'].iloc[-14:-7].sum()) + int(driving_data['rapid_acceleration'].iloc[-14:-7].sum())
         st.metric(
             label="Harsh Driving Events",
             value=f"{harsh_events}",
-            delta=f"{recent_harsh - previous_harsh}",
+            delta=f"{recent_harsh - previous_harsh}" if full_fortnight else None,
             delta_color="inverse"
         )
+        show_interval(trip_metrics, 'harsh_events', ",.0f")
     
     # AI-powered driving tips with better styling
     st.markdown("""
@@ -456,61 +516,32 @@ with tab1:
         <div style="position: absolute; bottom: 15px; right: 70px; font-size: 25px; opacity: 0.4; text-shadow: 0 2px 5px rgba(0,0,0,0.5);">🌱</div>
     """, unsafe_allow_html=True)
 
-    with st.spinner("Analyzing your driving patterns..."):
-        try:
-            # Get recent driving data (last 7 days)
-            recent_data = driving_data.tail(7).to_dict()
-            
-            # Get driving tips from OpenAI
-            tips_dict = get_cached_driving_tips(recent_data)
-            
-            # Display each tip with nicer styling
-            if 'tips' in tips_dict and tips_dict['tips']:
-                if 'tip_index' not in st.session_state:
-                    st.session_state.tip_index = random.randint(0, len(tips_dict['tips']) - 1)
-
-                # Display the tip based on the index
-                daily_tip = tips_dict['tips'][st.session_state.tip_index]
-
-                st.markdown(f"""
-                    <div class='driving-tip'>
-                        <div style="position: absolute; top: 0; right: 0; font-size: 80px; opacity: 0.08; transform: translate(20%, -30%);">💡</div>
-                        <h4>Tip {st.session_state.tip_index + 1}</h4>
-                        <p style="color: #B0BEC5;">{daily_tip}</p>
-                    </div>
-                """, unsafe_allow_html=True)
-
-                if st.button("🔄 Show me another tip", use_container_width=True):
-                    st.session_state.tip_index = random.randint(0, len(tips_dict['tips']) - 1)
-                    st.experimental_rerun()  # Only if you have the correct version
-            else:
-                st.warning("No specific driving tips available at this time.")
-        except Exception as e:
-            st.error(f"Unable to generate driving tips: {str(e)}")
-            # Display fallback tips with nicer styling
-            fallback_tips = [
-                "Practice gradual acceleration to improve fuel efficiency.",
-                "Maintain a steady speed and avoid unnecessary braking.",
-                "Regular vehicle maintenance keeps your car running efficiently."
-            ]
-            for i, tip in enumerate(fallback_tips, 1):
-                st.markdown(f"""
-                    <div class='driving-tip'>
-                        <div style="position: absolute; top: 0; right: 0; font-size: 80px; opacity: 0.08; transform: translate(20%, -30%);">💡</div>
-                        <h4>Tip {i}</h4>
-                        <p style="color: #B0BEC5;">{tip}</p>
-                    </div>
-                """, unsafe_allow_html=True)
+    # Common driving profiles get rule-based tips right away. The model is only asked about
+    # unusual ones, or when the user asks for it, and that call runs in the background so
+    # the rest of the page doesn't wait; the placeholder polls until the tips arrive
+    recent_data = driving_data.tail(7).to_dict()
+    summary = summarize_driving_data(recent_data)
+    summary_key = json.dumps(summary, sort_keys=True)
+    force_ai = st.session_state.get('ask_ai_tips') == summary_key
+    local_tips = None if force_ai else rule_tips(summary)
+    if local_tips is not None:
+        show_driving_tips({'tips': local_tips, 'source': 'rules'}, summary_key)
+    else:
+        tips_key = ('driving_tips', summary_key, force_ai)
+        background.submit(tips_key, get_cached_driving_tips, recent_data, force_ai)
+        polling = not background.done(tips_key)
+        st.fragment(render_driving_tips, run_every=1 if polling else None)(tips_key, recent_data, polling)
 
     st.markdown("</div>", unsafe_allow_html=True)
 
-with tab2:
+if section == DETAILED_ANALYSIS:
     # Time period selector
     st.markdown("<div class='filter-container'>", unsafe_allow_html=True)
     period = st.radio(
         "Select Time Period:",
         ["Last 7 Days", "Last 14 Days", "Last 30 Days", "Custom Range"],
-        horizontal=True
+        horizontal=True,
+        key="analysis_period"
     )
     
     if period == "Custom Range":
@@ -518,18 +549,22 @@ with tab2:
         with col1:
             start_date = st.date_input(
                 "Start Date",
-                datetime.datetime.now() - datetime.timedelta(days=7)
+                datetime.datetime.now() - datetime.timedelta(days=7),
+                key="analysis_start"
             )
         with col2:
             end_date = st.date_input(
                 "End Date",
-                datetime.datetime.now()
+                datetime.datetime.now(),
+                key="analysis_end"
             )
-        filtered_data = driving_data[(driving_data['date'].dt.date >= start_date) & 
-                                     (driving_data['date'].dt.date <= end_date)]
+        filtered_data = load_driving_data(start=start_date, end=end_date, vehicle_id=vehicle_id,
+                                          data_version=data_version)
+        period_key = (start_date, end_date)
     else:
         days = 7 if period == "Last 7 Days" else 14 if period == "Last 14 Days" else 30
         filtered_data = driving_data.tail(days)
+        period_key = period
     st.markdown("</div>", unsafe_allow_html=True)
     
     # Enhanced charts with better styling
@@ -538,52 +573,14 @@ with tab2:
     with col1:
         st.markdown("<div class='chart-container'>", unsafe_allow_html=True)
         st.markdown("<h3 class='chart-header'>Eco-Score Trend</h3>", unsafe_allow_html=True)
-        fig_score = px.line(
-            filtered_data,
-            x='date',
-            y='eco_score',
-            title=None,
-            line_shape='linear',
-            markers=True
-        )
-        fig_score.update_traces(line=dict(width=2, color='#4CAF50'), marker=dict(size=6))
-        fig_score.update_layout(
-            xaxis_title="Date",
-            yaxis_title="Eco-Score",
-            xaxis=dict(showgrid=False, color="#607D8B", nticks=8),
-            yaxis=dict(range=[0, 100], color="#607D8B"),
-            plot_bgcolor='rgba(0,0,0,0)',
-            paper_bgcolor='rgba(0,0,0,0)',
-            font={"color": "#B0BEC5"},
-            hovermode='x unified',
-            margin=dict(l=50, r=20, t=30, b=50)
-        )
+        fig_score = cached_figure('driving.eco_score_trend', figure_version, period_key, eco_score_trend_figure, filtered_data)
         st.plotly_chart(fig_score, use_container_width=True)
         st.markdown("</div>", unsafe_allow_html=True)
 
     with col2:
         st.markdown("<div class='chart-container'>", unsafe_allow_html=True)
         st.markdown("<h3 class='chart-header'>Fuel Consumption Trend</h3>", unsafe_allow_html=True)
-        fig_fuel = px.line(
-            filtered_data,
-            x='date',
-            y='fuel_consumption',
-            title=None,
-            line_shape='linear',
-            markers=True
-        )
-        fig_fuel.update_traces(line=dict(width=2, color='#2196F3'), marker=dict(size=6))
-        fig_fuel.update_layout(
-            xaxis_title="Date",
-            yaxis_title="Fuel Consumption (L/100km)",
-            xaxis=dict(showgrid=False, color="#607D8B", nticks=8),
-            yaxis=dict(color="#607D8B"),
-            plot_bgcolor='rgba(0,0,0,0)',
-            paper_bgcolor='rgba(0,0,0,0)',
-            font={"color": "#B0BEC5"},
-            hovermode='x unified',
-            margin=dict(l=50, r=20, t=30, b=50)
-        )
+        fig_fuel = cached_figure('driving.fuel_trend', figure_version, period_key, fuel_trend_figure, filtered_data)
         st.plotly_chart(fig_fuel, use_container_width=True)
         st.markdown("</div>", unsafe_allow_html=True)
 
@@ -594,48 +591,14 @@ with tab2:
     with col3:
         st.markdown("<div class='chart-container'>", unsafe_allow_html=True)
         st.markdown("<h3 class='chart-header'>Harsh Braking Events</h3>", unsafe_allow_html=True)
-        fig_braking = px.bar(
-            filtered_data,
-            x='date',
-            y='harsh_braking',
-            title=None,
-            color_discrete_sequence=['#F44336']
-        )
-        fig_braking.update_layout(
-            xaxis_title="Date",
-            yaxis_title="Count",
-            plot_bgcolor='rgba(0,0,0,0)',
-            paper_bgcolor='rgba(0,0,0,0)',
-            font={"color": "#B0BEC5"},
-            xaxis=dict(color="#607D8B", nticks=6),
-            yaxis=dict(color="#607D8B"),
-            bargap=0.3,
-            margin=dict(l=50, r=20, t=30, b=50)
-        )
+        fig_braking = cached_figure('driving.harsh_braking', figure_version, period_key, harsh_braking_figure, filtered_data)
         st.plotly_chart(fig_braking, use_container_width=True)
         st.markdown("</div>", unsafe_allow_html=True)
 
     with col4:
         st.markdown("<div class='chart-container'>", unsafe_allow_html=True)
         st.markdown("<h3 class='chart-header'>Rapid Acceleration Events</h3>", unsafe_allow_html=True)
-        fig_accel = px.bar(
-            filtered_data,
-            x='date',
-            y='rapid_acceleration',
-            title=None,
-            color_discrete_sequence=['#FF9800']
-        )
-        fig_accel.update_layout(
-            xaxis_title="Date",
-            yaxis_title="Count",
-            plot_bgcolor='rgba(0,0,0,0)',
-            paper_bgcolor='rgba(0,0,0,0)',
-            font={"color": "#B0BEC5"},
-            xaxis=dict(color="#607D8B", nticks=6),
-            yaxis=dict(color="#607D8B"),
-            bargap=0.3,
-            margin=dict(l=50, r=20, t=30, b=50)
-        )
+        fig_accel = cached_figure('driving.rapid_acceleration', figure_version, period_key, rapid_acceleration_figure, filtered_data)
         st.plotly_chart(fig_accel, use_container_width=True)
         st.markdown("</div>", unsafe_allow_html=True)
         
@@ -643,119 +606,51 @@ with tab2:
     st.markdown("<div class='chart-container'>", unsafe_allow_html=True)
     st.markdown("<h3 class='chart-header'>Combined Analysis</h3>", unsafe_allow_html=True)
 
-    # Create a figure with secondary y-axis
-    fig = go.Figure()
-
-    # Add eco-score line - optimized with fewer points if possible
-    fig.add_trace(go.Scatter(
-        x=filtered_data['date'],
-        y=filtered_data['eco_score'],
-        name='Eco-Score',
-        line=dict(color='#4CAF50', width=2),
-        mode='lines+markers',
-        marker=dict(size=6)
-    ))
-
-    # Add harsh events bars with simplified configuration
-    fig.add_trace(go.Bar(
-        x=filtered_data['date'],
-        y=filtered_data['harsh_braking'],
-        name='Harsh Braking',
-        marker_color='#F44336',
-        opacity=0.7
-    ))
-
-    fig.add_trace(go.Bar(
-        x=filtered_data['date'],
-        y=filtered_data['rapid_acceleration'],
-        name='Rapid Acceleration',
-        marker_color='#FF9800',
-        opacity=0.7
-    ))
-
-    # Update layout with optimized configuration
-    fig.update_layout(
-        title=None,
-        xaxis_title="Date",
-        yaxis_title="Eco-Score",
-        plot_bgcolor='rgba(0,0,0,0)',
-        paper_bgcolor='rgba(0,0,0,0)',
-        font={"color": "#B0BEC5"},
-        xaxis=dict(color="#607D8B", nticks=6),
-        yaxis=dict(color="#607D8B"),
-        barmode='group',
-        bargap=0.2,
-        hovermode='x unified',
-        margin=dict(l=50, r=20, t=40, b=50),
-        legend=dict(
-            orientation="h",
-            yanchor="bottom",
-            y=1.02,
-            xanchor="right",
-            x=1,
-            font=dict(color="#B0BEC5", size=11)
-        )
-    )
-
+    # Eco-score line with the harsh events as bars
+    fig = cached_figure('driving.combined', figure_version, period_key, combined_figure, filtered_data)
     st.plotly_chart(fig, use_container_width=True)
     st.markdown("</div>", unsafe_allow_html=True)
 
-with tab3:
+if section == TRIP_HISTORY:
     # Trip History with search and filter
-    st.subheader("Trip History")
+    st.subheader("Trip History" if vehicle_id is not None else "Daily Fleet Totals")
     
     # Add filters
     col1, col2, col3 = st.columns(3)
     with col1:
-        min_eco_score = st.slider("Minimum Eco-Score", 0, 100, 0)
+        min_eco_score = st.slider("Minimum Eco-Score", 0, 100, 0, key="trip_min_eco_score")
     with col2:
         date_range = st.date_input(
             "Date Range",
             [
                 datetime.datetime.now() - datetime.timedelta(days=30),
                 datetime.datetime.now()
-            ]
+            ],
+            key="trip_date_range"
         )
     with col3:
         sort_by = st.selectbox(
             "Sort By",
-            ["Date (newest first)", "Date (oldest first)", "Eco-Score (highest first)", "Eco-Score (lowest first)"]
+            list(TRIP_SORT_ORDERS),
+            key="trip_sort"
         )
     
-    # Filter and sort the data
-    filtered_trips = driving_data[driving_data['eco_score'] >= min_eco_score].copy()
-    
+    # Filter and sort through the cached index: binary searches instead of full-column scans
+    trip_index = load_trip_index(vehicle_id, data_version)
+    filters = dict(min_eco_score=min_eco_score, sort=TRIP_SORT_ORDERS[sort_by])
     if len(date_range) == 2:
-        filtered_trips = filtered_trips[
-            (filtered_trips['date'].dt.date >= date_range[0]) & 
-            (filtered_trips['date'].dt.date <= date_range[1])
-        ]
+        filters.update(start=date_range[0], end=date_range[1])
+    positions = trip_index.positions(**filters)
     
-    # Apply sorting
-    if sort_by == "Date (newest first)":
-        filtered_trips = filtered_trips.sort_values(by='date', ascending=False)
-    elif sort_by == "Date (oldest first)":
-        filtered_trips = filtered_trips.sort_values(by='date', ascending=True)
-    elif sort_by == "Eco-Score (highest first)":
-        filtered_trips = filtered_trips.sort_values(by='eco_score', ascending=False)
-    elif sort_by == "Eco-Score (lowest first)":
-        filtered_trips = filtered_trips.sort_values(by='eco_score', ascending=True)
-    
-    # Display trips as cards with updated styling for dark theme
-    if not filtered_trips.empty:
-        for _, trip in filtered_trips.iterrows():
-            eco_score_color = "#4CAF50" if trip['eco_score'] >= 75 else "#FFC107" if trip['eco_score'] >= 50 else "#F44336"
-            
-            st.markdown(f"""
-                <div class='trip-card'>
-                    <div style='display: flex; justify-content: space-between; align-items: center;'>
-                        <div class='trip-details'>
-                            <h4 style="margin-top: 0;">{trip['date'].strftime('%B %d, %Y')}</h4>
-                            <p style="color: #B0BEC5;"><span class='metric-label'>Distance:</span> {trip['distance']} km</p>
-                            <p style="color: #B0BEC5;"><span class='metric-label'>Eco-Score:</span> <span style="color: {eco_score_color};">{trip['eco_score']}</span></p>
-                        </div>
-                    </div>
-                </div>
-            """, unsafe_allow_html=True)
+    # Display trips as cards with updated styling for dark theme, one page at a time.
+    # The fleet's history is its daily summary, so it is listed as days, not trips
+    if vehicle_id is None:
+        unit, row, card_template = "days of fleet totals", "day", FLEET_DAY_CARD_TEMPLATE
+    else:
+        unit, row, card_template = "trips", "trip", TRIP_CARD_TEMPLATE
+    if len(positions):
+        st.caption(f"{len(positions):,} {unit} · {bytes_per_trip(trip_index.trips):.0f} bytes per {row} in memory")
+        paginated_list("trip_history", len(positions), partial(trip_history_rows, trip_index, positions),
+                       card_template, reset_on=(vehicle_id, repr(filters)))
     else:
-        st.warning("No trips found for the selected filters.")
\ No newline at end of file
+        st.warning(f"No {unit} found for the selected filters.")
\ No newline at end of file
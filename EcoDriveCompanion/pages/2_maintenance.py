@@ -1,8 +1,14 @@
 import streamlit as st
 from utils.data_manager import DataManager
-from utils.openai_helper import analyze_maintenance_needs
+from utils.trip_store import DEFAULT_VEHICLE_ID
+from utils.openai_helper import stream_maintenance_analysis
+from utils.prompt_builder import DEFAULT_VEHICLE_AGE, maintenance_context as build_maintenance_context
+from utils import background
+from utils.components import lazy_sections, paginated_list
+from utils.theme import use_theme
 import json
 from datetime import datetime
+from functools import partial
 
 # Page configuration
 st.set_page_config(
@@ -11,104 +17,8 @@ st.set_page_config(
     layout="wide"
 )
 
-# Custom CSS with dark theme
-st.markdown("""
-<style>
-    :root {
-        --primary-dark: #1B5E20;
-        --primary: #2E7D32;
-        --primary-light: #4CAF50;
-        --accent: #81C784;
-        --background-darkest: #121212;
-        --background-dark: #1E1E1E;
-        --background-medium: #202A2E;
-        --text-light: #ECEFF1;
-        --text-medium: #B0BEC5;
-        --text-dark: #607D8B;
-        --warning: #FFC107;
-        --error: #F44336;
-    }
-
-    .chart-container {
-        background-color: var(--background-medium);
-        border-radius: 10px;
-        padding: 20px;
-        box-shadow: 0 4px 8px rgba(0,0,0,0.2);
-        margin-bottom: 20px;
-        border-left: 4px solid var(--primary);
-    }
-    
-    .maintenance-card {
-        background-color: var(--background-medium);
-        border-radius: 8px;
-        padding: 15px;
-        box-shadow: 0 2px 4px rgba(0,0,0,0.15);
-        margin-bottom: 12px;
-        border-left: 3px solid var(--primary);
-    }
-    
-    .maintenance-item {
-        background-color: #19321E;
-        border-left: 5px solid var(--primary);
-        padding: 15px;
-        border-radius: 5px;
-        margin-bottom: 15px;
-        position: relative;
-    }
-    
-    .maintenance-due {
-        background-color: #32231B;
-        border-left: 5px solid var(--warning);
-        padding: 15px;
-        border-radius: 5px;
-        margin-bottom: 15px;
-    }
-    
-    /* Button styling */
-    .stButton>button {
-        background-color: var(--primary);
-        color: white;
-        border: none;
-        border-radius: 4px;
-        transition: all 0.3s;
-    }
-    
-    .stButton>button:hover {
-        background-color: var(--primary-light);
-        box-shadow: 0 4px 8px rgba(0, 0, 0, 0.2);
-    }
-    
-    /* Override Streamlit's default theme */
-    .stApp {
-        background-color: var(--background-dark);
-    }
-    
-    h1, h2, h3, h4, h5, h6, .stMarkdown p {
-        color: var(--text-light);
-    }
-    
-    .stDataFrame {
-        border-radius: 8px;
-        overflow: hidden;
-    }
-    
-    /* Table styling */
-    div[data-testid="stTable"] table {
-        border-radius: 8px;
-        overflow: hidden;
-    }
-    
-    div[data-testid="stTable"] th {
-        background-color: var(--primary-dark);
-        color: white;
-    }
-    
-    div[data-testid="stTable"] td {
-        background-color: var(--background-medium);
-        color: var(--text-light);
-    }
-</style>
-""", unsafe_allow_html=True)
+# Dark theme styles, shared with the other pages through one cached stylesheet
+use_theme("maintenance")
 
 # Page title with dynamic background
 st.markdown("""
@@ -122,13 +32,86 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
-# Get maintenance data
-maintenance_data = DataManager.get_maintenance_schedule()
+# One card per logged service in the maintenance history; rows come from maintenance_history_rows
+MAINTENANCE_CARD_TEMPLATE = """
+    <div class="maintenance-item">
+        <h4 style="color: #81C784; margin-top: 0;">{item}{vehicle_label}</h4>
+        <p style="color: #B0BEC5;">Last serviced: <strong>{last_service}</strong></p>
+        <p style="color: #B0BEC5;">Next due: {next_due} (Interval: {interval_km} km)</p>
+    </div>
+"""
+
+def maintenance_history_rows(vehicle_id, offset, limit):
+    services = DataManager.get_completed_maintenance(vehicle_id, limit=limit, offset=offset)
+    return [dict(service, vehicle_label=f" · {service['vehicle_id']}" if vehicle_id is None else "")
+            for service in services.to_dict('records')]
+
+def render_maintenance_analysis(analysis_key, maintenance_context, polling):
+    """Show the AI analysis items streamed so far.
+
+    ``polling`` is True while the fragment reruns every half second; when the stream ends
+    the whole page reruns so the fragment stops polling.
+    """
+    # A no-op for a known job; restarts one dropped from the finished jobs since the page ran
+    background.submit_stream(analysis_key, stream_maintenance_analysis, maintenance_context)
+    finished = background.done(analysis_key)
+    # Done while polling, or restarted in a fragment that doesn't poll
+    if finished == polling:
+        st.rerun()
+    items = background.partial(analysis_key)
+    if not items:
+        if not finished:
+            st.info("🤖 Analyzing your maintenance history... recommendations will appear here in a moment.")
+            return
+        # The stream yields fallback recommendations itself, so nothing at all means the job
+        # failed; collecting the result logs it and lets the next run retry
+        background.result(analysis_key)
+        st.error("Unable to generate maintenance analysis right now.")
+        items = [('recommendations', rec) for rec in [
+            "Check fluid levels (engine oil, coolant, brake fluid) regularly",
+            "Inspect tires for wear and maintain proper inflation",
+            "Replace air filter every 15,000-30,000 km",
+            "Follow manufacturer-recommended maintenance schedule"
+        ]]
+
+    recommendations = [item for key, item in items if key == 'recommendations']
+    urgent_items = [item for key, item in items if key == 'urgent_items']
+
+    st.markdown("<h3 style='color: #81C784; margin-top: 10px;'>Recommendations</h3>", unsafe_allow_html=True)
+    
+    for recommendation in recommendations:
+        st.markdown(f"""
+            <div class="maintenance-item">
+                <h4 style="color: #81C784; margin-top: 0;">💡 Recommendation</h4>
+                <p style="color: #B0BEC5;">{recommendation}</p>
+            </div>
+        """, unsafe_allow_html=True)
+    
+    if urgent_items:
+        st.markdown("<h3 style='color: #F44336; margin-top: 20px;'>Urgent Maintenance Required</h3>", unsafe_allow_html=True)
+        
+        for item in urgent_items:
+            st.markdown(f"""
+                <div class="maintenance-due">
+                    <h4 style="color: #F44336; margin-top: 0;">⚠️ Urgent</h4>
+                    <p style="color: #B0BEC5;">{item}</p>
+                </div>
+            """, unsafe_allow_html=True)
+
+    if not finished:
+        st.caption("⏳ More recommendations on the way...")
+
+# Get maintenance data for the vehicle picked in the sidebar (all vehicles in fleet mode)
+vehicle_id = st.session_state.get("vehicle_id", DEFAULT_VEHICLE_ID)
+maintenance_data = DataManager.get_maintenance_schedule(vehicle_id)
 
-# Create tabs for different sections
-tab1, tab2, tab3 = st.tabs(["📆 Maintenance Schedule", "➕ Record Maintenance", "🤖 AI Recommendations"])
+# Sections of the page; only the one picked is computed, so the AI analysis starts
+# only when it is opened. The mileage entered for a service is kept for the analysis.
+SCHEDULE, RECORD, AI_RECOMMENDATIONS = "📆 Maintenance Schedule", "➕ Record Maintenance", "🤖 AI Recommendations"
+section = lazy_sections([SCHEDULE, RECORD, AI_RECOMMENDATIONS], key="maintenance_section",
+                        keep={SCHEDULE: ["maintenance_history_page_size"], RECORD: ["service_mileage"]})
 
-with tab1:
+if section == SCHEDULE:
     # Display maintenance overview
     st.subheader("Current Maintenance Schedule")
     st.dataframe(maintenance_data, use_container_width=True)
@@ -136,12 +119,13 @@ with tab1:
     # Highlight upcoming maintenance
     st.markdown("<h3 style='color: #81C784; margin-top: 30px;'>Upcoming Maintenance</h3>", unsafe_allow_html=True)
     
-    due_soon = maintenance_data[maintenance_data['status'] == 'Due Soon']
+    due_soon = DataManager.get_due_maintenance(vehicle_id)
     if not due_soon.empty:
         for _, item in due_soon.iterrows():
+            vehicle_label = f" · {item['vehicle_id']}" if vehicle_id is None else ""
             st.markdown(f"""
                 <div class="maintenance-due">
-                    <h4 style="color: #FFC107; margin-top: 0;">⚠️ {item['item']}</h4>
+                    <h4 style="color: #FFC107; margin-top: 0;">⚠️ {item['item']}{vehicle_label}</h4>
                     <p style="color: #B0BEC5;">Due on: <strong>{item['next_due']}</strong> (Interval: {item['interval_km']} km)</p>
                     <p style="color: #B0BEC5;">Last serviced: {item['last_service']}</p>
                 </div>
@@ -149,27 +133,29 @@ with tab1:
     else:
         st.info("No maintenance due soon. Your vehicle is up to date!")
     
-    # Maintenance history
+    # Maintenance history, one page of the log at a time
     st.markdown("<h3 style='color: #81C784; margin-top: 30px;'>Maintenance History</h3>", unsafe_allow_html=True)
-    completed = maintenance_data[maintenance_data['status'] == 'Completed']
-    
-    if not completed.empty:
-        for _, item in completed.iterrows():
-            st.markdown(f"""
-                <div class="maintenance-item">
-                    <h4 style="color: #81C784; margin-top: 0;">{item['item']}</h4>
-                    <p style="color: #B0BEC5;">Last serviced: <strong>{item['last_service']}</strong></p>
-                    <p style="color: #B0BEC5;">Next due: {item['next_due']} (Interval: {item['interval_km']} km)</p>
-                </div>
-            """, unsafe_allow_html=True)
+    services_logged = DataManager.count_completed_maintenance(vehicle_id)
+    if services_logged:
+        paginated_list("maintenance_history", services_logged, partial(maintenance_history_rows, vehicle_id),
+                       MAINTENANCE_CARD_TEMPLATE, reset_on=vehicle_id)
     else:
         st.info("No maintenance history found.")
 
-with tab2:
+if section == RECORD:
     # Add new maintenance record in a nicer card
     st.markdown("<div class='chart-container'>", unsafe_allow_html=True)
     st.subheader("Record New Maintenance")
     
+    if st.session_state.pop("maintenance_recorded", None):
+        st.success("Maintenance record added successfully!")
+    
+    # In fleet mode the record has to be attributed to one vehicle
+    if vehicle_id is None:
+        record_vehicle_id = st.selectbox("Vehicle", DataManager.get_fleet()['vehicle_id'].tolist())
+    else:
+        record_vehicle_id = vehicle_id
+    
     col1, col2, col3 = st.columns(3)
     
     with col1:
@@ -182,12 +168,17 @@ with tab2:
         service_date = st.date_input("Service Date", datetime.now())
     
     with col3:
-        mileage = st.number_input("Current Mileage (km)", min_value=0)
+        # Left empty, no mileage is stored rather than a service at 0 km
+        mileage = st.number_input("Current Mileage (km)", min_value=0, value=None, placeholder="Not recorded",
+                                  key="service_mileage")
     
     notes = st.text_area("Maintenance Notes", placeholder="Enter any additional details about the service...")
     
     if st.button("Record Maintenance", use_container_width=True):
-        st.success("Maintenance record added successfully!")
+        DataManager.record_maintenance(record_vehicle_id, maintenance_type, service_date, mileage=mileage, notes=notes)
+        # Rerun so the schedule tab reflects the new record
+        st.session_state.maintenance_recorded = True
+        st.rerun()
         
     st.markdown("</div>", unsafe_allow_html=True)
     
@@ -217,58 +208,24 @@ with tab2:
             </div>
         """, unsafe_allow_html=True)
 
-with tab3:
+if section == AI_RECOMMENDATIONS:
     # AI Maintenance Analysis with better styling
     st.subheader("AI Maintenance Analysis")
     
-    try:
-        maintenance_context = {
-            "current_mileage": mileage,
-            "maintenance_history": maintenance_data.to_dict(),
-            "vehicle_age": 3  # Example value
-        }
-        
-        analysis = analyze_maintenance_needs(maintenance_context)
-        analysis_dict = json.loads(analysis)
-        
-        st.markdown("<h3 style='color: #81C784; margin-top: 10px;'>Recommendations</h3>", unsafe_allow_html=True)
-        
-        for recommendation in analysis_dict.get('recommendations', []):
-            st.markdown(f"""
-                <div class="maintenance-item">
-                    <h4 style="color: #81C784; margin-top: 0;">💡 Recommendation</h4>
-                    <p style="color: #B0BEC5;">{recommendation}</p>
-                </div>
-            """, unsafe_allow_html=True)
-        
-        if analysis_dict.get('urgent_items', []):
-            st.markdown("<h3 style='color: #F44336; margin-top: 20px;'>Urgent Maintenance Required</h3>", unsafe_allow_html=True)
-            
-            for item in analysis_dict['urgent_items']:
-                st.markdown(f"""
-                    <div class="maintenance-due">
-                        <h4 style="color: #F44336; margin-top: 0;">⚠️ Urgent</h4>
-                        <p style="color: #B0BEC5;">{item}</p>
-                    </div>
-                """, unsafe_allow_html=True)
-                
-    except Exception as e:
-        st.error(f"Unable to generate maintenance analysis: {str(e)}")
-        
-        # Fallback recommendations
-        st.markdown("<h3 style='color: #81C784; margin-top: 20px;'>General Recommendations</h3>", unsafe_allow_html=True)
-        
-        fallback_recommendations = [
-            "Check fluid levels (engine oil, coolant, brake fluid) regularly",
-            "Inspect tires for wear and maintain proper inflation",
-            "Replace air filter every 15,000-30,000 km",
-            "Follow manufacturer-recommended maintenance schedule"
-        ]
-        
-        for rec in fallback_recommendations:
-            st.markdown(f"""
-                <div class="maintenance-item">
-                    <h4 style="color: #81C784; margin-top: 0;">💡 Recommendation</h4>
-                    <p style="color: #B0BEC5;">{rec}</p>
-                </div>
-            """, unsafe_allow_html=True)
+    # A bounded summary (last service, how far overdue, servicing trend per item) rather
+    # than the raw history, so the prompt stays small however many services are logged
+    maintenance_context = build_maintenance_context(
+        maintenance_data,
+        DataManager.get_completed_maintenance(vehicle_id),
+        current_mileage=st.session_state.get("service_mileage"),
+        vehicle_age=DEFAULT_VEHICLE_AGE
+    )
+
+    # The model call runs in the background so the schedule and form tabs don't wait for it.
+    # Its answer is streamed and each recommendation shows up as soon as it is complete,
+    # with the placeholder polling in partial reruns until the stream ends
+    analysis_key = ('maintenance_analysis', json.dumps(maintenance_context, sort_keys=True, default=str))
+    background.submit_stream(analysis_key, stream_maintenance_analysis, maintenance_context)
+    polling = not background.done(analysis_key)
+    st.fragment(render_maintenance_analysis, run_every=0.5 if polling else None)(analysis_key, maintenance_context,
+                                                                                  polling)
@@ -2,178 +2,192 @@ import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
 from utils.data_manager import DataManager
+from utils.trip_store import DEFAULT_VEHICLE_ID
+from utils.downsample import downsample_line, points_for_width
+from utils.components import lazy_sections
+from utils.theme import use_theme
+from utils.figures import THEME_ACCENTS, cached_figure
 import pandas as pd
 import numpy as np
 import datetime
 
-# Page Configuration
-st.set_page_config(
-    page_title="Carbon Footprint | Eco-Driving Assistant",
-    page_icon="🌱",
-    layout="wide",
-    initial_sidebar_state="expanded",
-    # Apply dark theme
-    menu_items={
-        'Get Help': 'https://www.ecodrivecompanion.com/help',
-        'Report a bug': 'https://www.ecodrivecompanion.com/bug',
-        'About': 'EcoDrive Companion helps track and reduce your carbon emissions while driving.'
-    }
-)
+# Monthly totals come from precomputed rollups, so this is a read of O(months) rows
+@st.cache_data(ttl=600)  # Cache data for 10 minutes, or until the data version changes
+def load_emissions_data(vehicle_id=DEFAULT_VEHICLE_ID, data_version=None):
+    return DataManager.get_emissions_data(granularity="monthly", vehicle_id=vehicle_id)
 
-# Custom CSS
-st.markdown("""
-<style>
-    /* Root variables for consistent theming */
-    :root {
-        --primary-darkest: #0C3D10;
-        --primary-darker: #145218;
-        --primary-dark: #1B5E20;
-        --primary-main: #2E7D32;
-        --primary-light: #4CAF50;
-        --secondary-dark: #0D47A1;
-        --secondary-main: #1976D2;
-        --background-darker: #121212;
-        --background-dark: #1E1E1E;
-        --background-medium: #202A2E;
-        --background-light: #263238;
-        --text-light: #ECEFF1;
-        --text-medium: #B0BEC5;
-        --text-dark: #78909C;
-    }
+# Chart builders for cached_figure: shared by every session, so they only use their arguments.
+# Long ranges are downsampled to what the chart's width can show, keeping its shape and extremes.
+def emissions_gauge_figure(recent_month_emissions, previous_month_emissions, average_emissions, theme):
+    fig = go.Figure(go.Indicator(
+        mode="gauge+number+delta",
+        value=recent_month_emissions,
+        delta={"reference": previous_month_emissions, "valueformat": ".1f"},
+        gauge={
+            "axis": {"range": [0, max(500, recent_month_emissions * 1.5)], "tickwidth": 1, "tickcolor": "#4CAF50"},
+            "bar": {"color": "#4CAF50" if recent_month_emissions < previous_month_emissions else "#F44336"},
+            "steps": [
+                {"range": [0, 200], "color": "#0A3E17"},  # Dark green
+                {"range": [200, 400], "color": "#9C6A00"},  # Dark amber
+                {"range": [400, 1000], "color": "#922016"}  # Dark red
+            ],
+            "threshold": {
+                "line": {"color": "white", "width": 2},
+                "thickness": 0.75,
+                "value": average_emissions
+            }
+        },
+        number={"valueformat": ".0f", "font": {"color": "#ECEFF1", "size": 40}},
+        title={"text": "Current Month CO₂ Emissions (kg)", "font": {"color": "#B0BEC5"}}
+    ))
 
-    .page-title {
-        font-size: 2.3rem;
-        font-weight: 600;
-        color: var(--primary-light);
-        margin-bottom: 1rem;
-        text-shadow: 1px 1px 2px rgba(0, 0, 0, 0.2);
-    }
+    fig.update_layout(
+        height=280,
+        margin=dict(l=20, r=20, t=50, b=20),
+        paper_bgcolor="rgba(0,0,0,0)",
+        plot_bgcolor="rgba(0,0,0,0)",
+        font={"color": "#ECEFF1"}
+    )
 
-    .chart-container {
-        background-color: var(--background-medium);
-        border-radius: 10px;
-        padding: 20px;
-        box-shadow: 0 4px 8px rgba(0, 0, 0, 0.15);
-        margin-bottom: 25px;
-        border-left: 4px solid var(--primary-light);
-        color: var(--text-light);
-    }
+    return fig
 
-    .metric-container {
-        background-color: var(--background-dark);
-        background: linear-gradient(135deg, var(--background-dark) 0%, var(--background-medium) 100%);
-        border-radius: 10px;
-        padding: 25px;
-        box-shadow: 0 4px 10px rgba(0, 0, 0, 0.2);
-        margin-bottom: 25px;
-        text-align: center;
-        border-left: 4px solid var(--primary-light);
-        color: var(--text-light);
-    }
+def emissions_trend_figure(data, theme):
+    fig_emissions = px.line(
+        downsample_line(data, 'emissions', x='date'),
+        x='date',
+        y='emissions',
+        title=None,
+        line_shape='spline',
+        markers=True
+    )
 
-    .calculator-container {
-        background-color: var(--background-medium);
-        background: linear-gradient(135deg, #1A2327 0%, var(--background-medium) 100%);
-        border-radius: 10px;
-        padding: 25px;
-        box-shadow: 0 5px 15px rgba(0, 0, 0, 0.2);
-        margin-bottom: 25px;
-        border-left: 4px solid var(--primary-light);
-        color: var(--text-light);
-    }
+    fig_emissions.update_traces(
+        line=dict(width=3, color=THEME_ACCENTS[theme]),
+        marker=dict(size=8, color='#2E7D32')
+    )
 
-    .info-box {
-        background-color: #162938;
-        border-left: 5px solid var(--secondary-main);
-        padding: 18px;
-        border-radius: 8px;
-        margin-bottom: 22px;
-        color: var(--text-light);
-        box-shadow: 0 3px 8px rgba(0, 0, 0, 0.15);
-    }
+    fig_emissions.update_layout(
+        xaxis_title="Month",
+        yaxis_title="CO₂ Emissions (kg)",
+        xaxis=dict(showgrid=False),
+        plot_bgcolor='rgba(0,0,0,0)',
+        hovermode='x unified'
+    )
 
-    .eco-tip {
-        background-color: #19321E;
-        border-left: 5px solid var(--primary-light);
-        padding: 18px;
-        border-radius: 8px;
-        margin-bottom: 15px;
-        color: var(--text-light);
-        box-shadow: 0 3px 8px rgba(0, 0, 0, 0.15);
-    }
+    # Add a target line (10% below average)
+    target = data['emissions'].mean() * 0.9
+    fig_emissions.add_shape(
+        type="line",
+        x0=data['date'].min(),
+        y0=target,
+        x1=data['date'].max(),
+        y1=target,
+        line=dict(color="rgba(255, 0, 0, 0.5)", width=2, dash="dash"),
+    )
 
-    /* Button styling */
-    .stButton>button {
-        background-color: var(--primary-main);
-        color: white;
-        border: none;
-        border-radius: 4px;
-        transition: all 0.3s;
-        padding: 0.6rem 1.2rem;
-        font-weight: 500;
-        text-transform: uppercase;
-        letter-spacing: 0.5px;
-        box-shadow: 0 2px 5px rgba(0, 0, 0, 0.2);
-    }
+    fig_emissions.add_annotation(
+        x=data['date'].max(),
+        y=target,
+        text="Target",
+        showarrow=False,
+        yshift=10,
+        font=dict(color="red")
+    )
 
-    .stButton>button:hover {
-        background-color: var(--primary-dark);
-        box-shadow: 0 4px 12px rgba(0, 0, 0, 0.3);
-        transform: translateY(-2px);
-    }
+    return fig_emissions
 
-    /* Radio buttons */
-    .stRadio>div {
-        background-color: var(--background-dark);
-        padding: 10px;
-        border-radius: 8px;
-        color: var(--text-light);
-    }
+def emissions_vs_distance_figure(data, theme):
+    fig_scatter = px.scatter(
+        data,
+        x='distance',
+        y='emissions',
+        title=None,
+        color='average_consumption',
+        color_continuous_scale='Viridis',
+        labels={"average_consumption": "Fuel Consumption (L/100km)"}
+    )
 
-    /* Tabs */
-    .stTabs [data-baseweb="tab-list"] {
-        gap: 8px;
-    }
+    fig_scatter.update_traces(marker=dict(size=12, opacity=0.7))
 
-    .stTabs [data-baseweb="tab"] {
-        height: 50px;
-        border-radius: 8px 8px 0 0;
-        padding: 10px 20px;
-        background-color: var(--background-dark);
-        color: var(--text-light);
-    }
+    fig_scatter.update_layout(
+        xaxis_title="Distance (km)",
+        yaxis_title="CO₂ Emissions (kg)",
+        plot_bgcolor='rgba(0,0,0,0)'
+    )
 
-    .stTabs [aria-selected="true"] {
-        background-color: var(--primary-dark) !important;
-        color: white !important;
-    }
-    
-    /* Background styling for charts and plots */
-    .js-plotly-plot .plot-container .svg-container {
-        background-color: transparent !important;
-    }
-    
-    /* Metric overrides for dark background */
-    [data-testid="stMetricValue"] {
-        color: var(--text-light) !important;
-        font-weight: bold;
-    }
-    
-    [data-testid="stMetricLabel"] {
-        color: var(--text-medium) !important;
-    }
-    
-    /* Header styling */
-    h1, h2, h3, h4 {
-        color: var(--text-light);
-    }
-    
-    /* General text styling */
-    p, li, td, th {
-        color: var(--text-medium);
+    return fig_scatter
+
+def efficiency_trend_figure(data, theme):
+    fig_efficiency = px.line(
+        downsample_line(data, 'average_consumption', x='date', points=points_for_width(0.5)),
+        x='date',
+        y='average_consumption',
+        title=None,
+        line_shape='spline',
+        markers=True
+    )
+
+    fig_efficiency.update_traces(
+        line=dict(width=3, color='#2196F3'),
+        marker=dict(size=8, color='#1565C0')
+    )
+
+    fig_efficiency.update_layout(
+        xaxis_title="Month",
+        yaxis_title="Fuel Consumption (L/100km)",
+        xaxis=dict(showgrid=False),
+        plot_bgcolor='rgba(0,0,0,0)',
+        hovermode='x unified'
+    )
+
+    return fig_efficiency
+
+def comparison_figure(average_emissions, theme):
+    comparison_data = pd.DataFrame({
+        'Category': ['Your Average', 'Regional Average', 'National Average', 'Target'],
+        'Emissions': [average_emissions, 350, 400, average_emissions * 0.8]
+    })
+
+    fig_comparison = px.bar(
+        comparison_data,
+        x='Category',
+        y='Emissions',
+        title=None,
+        color='Category',
+        color_discrete_map={
+            'Your Average': '#4CAF50',
+            'Regional Average': '#2196F3',
+            'National Average': '#9E9E9E',
+            'Target': '#FF9800'
+        }
+    )
+
+    fig_comparison.update_layout(
+        xaxis_title=None,
+        yaxis_title="Monthly Emissions (kg CO₂)",
+        legend_title=None,
+        plot_bgcolor='rgba(0,0,0,0)'
+    )
+
+    return fig_comparison
+
+
+# Page Configuration
+st.set_page_config(
+    page_title="Carbon Footprint | Eco-Driving Assistant",
+    page_icon="🌱",
+    layout="wide",
+    initial_sidebar_state="expanded",
+    # Apply dark theme
+    menu_items={
+        'Get Help': 'https://www.ecodrivecompanion.com/help',
+        'Report a bug': 'https://www.ecodrivecompanion.com/bug',
+        'About': 'EcoDrive Companion helps track and reduce your carbon emissions while driving.'
     }
-</style>
-""", unsafe_allow_html=True)
+)
+
+# Dark theme styles, shared with the other pages through one cached stylesheet
+use_theme("carbon")
 
 # Page Title with dynamic background
 st.markdown("""
@@ -196,52 +210,33 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
-# Create tabs for different sections
-tab1, tab2, tab3 = st.tabs(["📊 Overview", "🔍 Detailed Analysis", "🧮 Calculator"])
+# Get emissions data
+vehicle_id = st.session_state.get("vehicle_id", DEFAULT_VEHICLE_ID)
+data_version = DataManager.get_data_version(vehicle_id)
+emissions_data = load_emissions_data(vehicle_id, data_version)
+# The overview and analysis compare months, so they need at least two; the calculator
+# only needs the monthly average, which is None before any trips are recorded
+has_monthly_history = len(emissions_data) >= 2
+average_emissions = emissions_data['emissions'].mean() if not emissions_data.empty else None
+# Charts are rebuilt only when this changes (or the period or theme does)
+figure_version = (vehicle_id, data_version)
 
-with tab1:
-    # Get emissions data
-    emissions_data = DataManager.get_emissions_data()
-    
-    # Check if data is not empty and has at least 2 rows
-    if not emissions_data.empty and len(emissions_data) >= 2:
+# Sections of the page; only the one picked is computed. The period is kept while its section is hidden.
+OVERVIEW, DETAILED_ANALYSIS, CALCULATOR = "📊 Overview", "🔍 Detailed Analysis", "🧮 Calculator"
+section = lazy_sections([OVERVIEW, DETAILED_ANALYSIS, CALCULATOR], key="carbon_section",
+                        keep={DETAILED_ANALYSIS: ["emissions_period"]})
+
+if section == OVERVIEW:
+    if has_monthly_history:
         # Overall statistics
         total_emissions = emissions_data['emissions'].sum()
-        average_emissions = emissions_data['emissions'].mean()
         recent_month_emissions = emissions_data['emissions'].iloc[-1]
         previous_month_emissions = emissions_data['emissions'].iloc[-2]
         
         # Add a dynamic gauge chart for current emissions
         st.markdown("<div class='metric-container'>", unsafe_allow_html=True)
-        fig = go.Figure(go.Indicator(
-            mode="gauge+number+delta",
-            value=recent_month_emissions,
-            delta={"reference": previous_month_emissions, "valueformat": ".1f"},
-            gauge={
-                "axis": {"range": [0, max(500, recent_month_emissions * 1.5)], "tickwidth": 1, "tickcolor": "#4CAF50"},
-                "bar": {"color": "#4CAF50" if recent_month_emissions < previous_month_emissions else "#F44336"},
-                "steps": [
-                    {"range": [0, 200], "color": "#0A3E17"},  # Dark green
-                    {"range": [200, 400], "color": "#9C6A00"},  # Dark amber
-                    {"range": [400, 1000], "color": "#922016"}  # Dark red
-                ],
-                "threshold": {
-                    "line": {"color": "white", "width": 2},
-                    "thickness": 0.75,
-                    "value": average_emissions
-                }
-            },
-            number={"valueformat": ".0f", "font": {"color": "#ECEFF1", "size": 40}},
-            title={"text": "Current Month CO₂ Emissions (kg)", "font": {"color": "#B0BEC5"}}
-        ))
-        
-        fig.update_layout(
-            height=280,
-            margin=dict(l=20, r=20, t=50, b=20),
-            paper_bgcolor="rgba(0,0,0,0)",
-            plot_bgcolor="rgba(0,0,0,0)",
-            font={"color": "#ECEFF1"}
-        )
+        fig = cached_figure('carbon.emissions_gauge', figure_version, 'latest', emissions_gauge_figure,
+                            recent_month_emissions, previous_month_emissions, average_emissions)
         
         st.plotly_chart(fig, use_container_width=True)
         st.markdown("</div>", unsafe_allow_html=True)
@@ -307,13 +302,14 @@ with tab1:
     else:
         st.warning("Not enough emissions data available. Please ensure your data has at least 2 entries.")
 
-with tab2:
-    if not emissions_data.empty and len(emissions_data) >= 2:
+if section == DETAILED_ANALYSIS:
+    if has_monthly_history:
         # Time period selector
         period = st.radio(
             "Select Time Period:",
             ["Last 6 Months", "Last 12 Months", "All Data"],
-            horizontal=True
+            horizontal=True,
+            key="emissions_period"
         )
         
         if period == "Last 6 Months":
@@ -327,47 +323,8 @@ with tab2:
         st.markdown("<div class='chart-container'>", unsafe_allow_html=True)
         st.subheader("Monthly Emissions Trend")
         
-        fig_emissions = px.line(
-            filtered_data,
-            x='date',
-            y='emissions',
-            title=None,
-            line_shape='spline',
-            markers=True
-        )
-        
-        fig_emissions.update_traces(
-            line=dict(width=3, color='#4CAF50'),
-            marker=dict(size=8, color='#2E7D32')
-        )
-        
-        fig_emissions.update_layout(
-            xaxis_title="Month",
-            yaxis_title="CO₂ Emissions (kg)",
-            xaxis=dict(showgrid=False),
-            plot_bgcolor='rgba(0,0,0,0)',
-            hovermode='x unified'
-        )
-        
-        # Add a target line (10% below average)
-        target = filtered_data['emissions'].mean() * 0.9
-        fig_emissions.add_shape(
-            type="line",
-            x0=filtered_data['date'].min(),
-            y0=target,
-            x1=filtered_data['date'].max(),
-            y1=target,
-            line=dict(color="rgba(255, 0, 0, 0.5)", width=2, dash="dash"),
-        )
-        
-        fig_emissions.add_annotation(
-            x=filtered_data['date'].max(),
-            y=target,
-            text="Target",
-            showarrow=False,
-            yshift=10,
-            font=dict(color="red")
-        )
+        fig_emissions = cached_figure('carbon.emissions_trend', figure_version, period, emissions_trend_figure,
+                                      filtered_data)
         
         st.plotly_chart(fig_emissions, use_container_width=True)
         st.markdown("</div>", unsafe_allow_html=True)
@@ -380,23 +337,8 @@ with tab2:
             st.markdown("<div class='chart-container'>", unsafe_allow_html=True)
             st.subheader("Emissions vs. Distance")
             
-            fig_scatter = px.scatter(
-                filtered_data,
-                x='distance',
-                y='emissions',
-                title=None,
-                color='average_consumption',
-                color_continuous_scale='Viridis',
-                labels={"average_consumption": "Fuel Consumption (L/100km)"}
-            )
-            
-            fig_scatter.update_traces(marker=dict(size=12, opacity=0.7))
-            
-            fig_scatter.update_layout(
-                xaxis_title="Distance (km)",
-                yaxis_title="CO₂ Emissions (kg)",
-                plot_bgcolor='rgba(0,0,0,0)'
-            )
+            fig_scatter = cached_figure('carbon.emissions_vs_distance', figure_version, period,
+                                        emissions_vs_distance_figure, filtered_data)
             
             st.plotly_chart(fig_scatter, use_container_width=True)
             st.markdown("</div>", unsafe_allow_html=True)
@@ -406,27 +348,8 @@ with tab2:
             st.markdown("<div class='chart-container'>", unsafe_allow_html=True)
             st.subheader("Fuel Efficiency Trend")
             
-            fig_efficiency = px.line(
-                filtered_data,
-                x='date',
-                y='average_consumption',
-                title=None,
-                line_shape='spline',
-                markers=True
-            )
-            
-            fig_efficiency.update_traces(
-                line=dict(width=3, color='#2196F3'),
-                marker=dict(size=8, color='#1565C0')
-            )
-            
-            fig_efficiency.update_layout(
-                xaxis_title="Month",
-                yaxis_title="Fuel Consumption (L/100km)",
-                xaxis=dict(showgrid=False),
-                plot_bgcolor='rgba(0,0,0,0)',
-                hovermode='x unified'
-            )
+            fig_efficiency = cached_figure('carbon.efficiency_trend', figure_version, period, efficiency_trend_figure,
+                                           filtered_data)
             
             st.plotly_chart(fig_efficiency, use_container_width=True)
             st.markdown("</div>", unsafe_allow_html=True)
@@ -435,31 +358,8 @@ with tab2:
         st.markdown("<div class='chart-container'>", unsafe_allow_html=True)
         st.subheader("Your Emissions vs. Average")
         
-        comparison_data = pd.DataFrame({
-            'Category': ['Your Average', 'Regional Average', 'National Average', 'Target'],
-            'Emissions': [average_emissions, 350, 400, average_emissions * 0.8]
-        })
-        
-        fig_comparison = px.bar(
-            comparison_data,
-            x='Category',
-            y='Emissions',
-            title=None,
-            color='Category',
-            color_discrete_map={
-                'Your Average': '#4CAF50',
-                'Regional Average': '#2196F3',
-                'National Average': '#9E9E9E',
-                'Target': '#FF9800'
-            }
-        )
-        
-        fig_comparison.update_layout(
-            xaxis_title=None,
-            yaxis_title="Monthly Emissions (kg CO₂)",
-            legend_title=None,
-            plot_bgcolor='rgba(0,0,0,0)'
-        )
+        fig_comparison = cached_figure('carbon.comparison', figure_version, 'all', comparison_figure,
+                                       average_emissions)
         
         st.plotly_chart(fig_comparison, use_container_width=True)
         st.markdown("</div>", unsafe_allow_html=True)
@@ -492,7 +392,7 @@ with tab2:
     else:
         st.warning("Not enough data available for detailed analysis.")
     
-with tab3:
+if section == CALCULATOR:
     # Carbon footprint calculator with improved UI
     st.markdown("<div class='calculator-container'>", unsafe_allow_html=True)
     st.subheader("Carbon Footprint Calculator")
@@ -543,16 +443,22 @@ with tab3:
     if st.button("Calculate Emissions", use_container_width=True):
         with st.spinner("Calculating your carbon footprint..."):
             try:
-                # Different calculation for electric vehicles
+                # Electric vehicles use grid electricity instead of fuel
                 if vehicle_type == "Electric":
-                    # Using average grid emissions factor (varies by country)
-                    grid_factor = 0.4  # kg CO2 per kWh (example value)
-                    emissions = (distance * electricity_kwh / 100) * grid_factor
+                    emissions = DataManager.calculate_emissions(distance, electricity_kwh, "electric")
                     fuel_text = f"{electricity_kwh} kWh/100km"
                 else:
-                    emissions = DataManager.calculate_carbon_footprint(distance, consumption)
+                    fuel_type = "diesel" if "Diesel" in vehicle_type else "hybrid" if vehicle_type == "Hybrid" else "petrol"
+                    emissions = DataManager.calculate_emissions(distance, consumption, fuel_type)
                     fuel_text = f"{consumption} L/100km"
                 
+                # Put the trip in terms of the vehicle's own history once there is some
+                if average_emissions:
+                    history_comparison = (f"This trip represents {(emissions / (average_emissions / 30)):.1f} "
+                                          "days of your average monthly emissions.")
+                else:
+                    history_comparison = "Record some trips to compare this one with your monthly emissions."
+
                 # Success message with detailed breakdown
                 st.success(f"Estimated CO2 emissions for this trip: {emissions:.2f} kg")
                 
@@ -585,7 +491,7 @@ with tab3:
                     </table>
                     <div style="margin-top: 15px; background-color: rgba(76, 175, 80, 0.1); padding: 10px; border-radius: 5px; display: flex; align-items: center;">
                         <span style="color: #4CAF50; font-size: 20px; margin-right: 10px;">💡</span>
-                        <span style="color: #B0BEC5;">This trip represents {(emissions / (average_emissions / 30)):.1f} days of your average monthly emissions.</span>
+                        <span style="color: #B0BEC5;">{history_comparison}</span>
                     </div>
                 </div>
                 """, unsafe_allow_html=True)
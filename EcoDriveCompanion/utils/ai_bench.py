@@ -0,0 +1,207 @@
+import argparse
+import json
+import os
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from utils.maintenance_store import MAINTENANCE_INTERVALS
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGES = ['app.py', 'pages/1_driving_analysis.py', 'pages/2_maintenance.py', 'pages/3_carbon_footprint.py']
+
+
+def latency_summary(latencies):
+    """Return mean and p50/p95/p99 of ``latencies`` in milliseconds."""
+    if not latencies:
+        return {'mean_ms': None, 'p50_ms': None, 'p95_ms': None, 'p99_ms': None}
+    values = np.asarray(latencies) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {'mean_ms': round(float(values.mean()), 1), 'p50_ms': round(float(p50), 1),
+            'p95_ms': round(float(p95), 1), 'p99_ms': round(float(p99), 1)}
+
+
+def driving_payloads(requests, distinct, seed):
+    """Return ``requests`` week-of-driving inputs for ``get_driving_tips``, drawn from ``distinct`` driver profiles.
+
+    Each profile repeats exactly, so ``distinct`` is the number of different summaries
+    the model is asked about and everything beyond it can be served from the cache.
+    """
+    rng = np.random.default_rng(seed)
+    days = [f"2025-01-0{day}" for day in range(1, 8)]
+    profiles = []
+    for _ in range(distinct):
+        profiles.append({
+            'eco_score': dict(zip(days, rng.uniform(40, 95, 7).round(1).tolist())),
+            'fuel_consumption': dict(zip(days, rng.uniform(4.5, 11, 7).round(2).tolist())),
+            'harsh_braking': dict(zip(days, rng.integers(0, 6, 7).tolist())),
+            'rapid_acceleration': dict(zip(days, rng.integers(0, 5, 7).tolist())),
+        })
+    return [profiles[index] for index in rng.integers(0, distinct, requests)]
+
+
+def maintenance_payloads(requests, distinct, seed):
+    """Return ``requests`` maintenance contexts for ``analyze_maintenance_needs``, drawn from ``distinct`` vehicles."""
+    from utils.prompt_builder import maintenance_context
+    from utils.synthetic import generate_maintenance, vehicle_profiles
+
+    rng = np.random.default_rng(seed)
+    profiles = vehicle_profiles(distinct, seed)
+    services = pd.DataFrame(generate_maintenance(profiles, '2023-01-01', '2025-12-31', seed))
+    services = services.rename(columns={'service_date': 'last_service'})
+    schedule = services.drop_duplicates(['vehicle_id', 'item'], keep='last').assign(
+        next_due=lambda frame: frame['last_service'] + pd.to_timedelta(frame['interval_days'], unit='D'),
+        interval_km=lambda frame: frame['item'].map(lambda item: MAINTENANCE_INTERVALS[item][0]))
+    contexts = [maintenance_context(schedule[schedule['vehicle_id'] == vehicle_id],
+                                    services[services['vehicle_id'] == vehicle_id],
+                                    current_mileage=int(services.loc[services['vehicle_id'] == vehicle_id,
+                                                                     'mileage'].max()) + 3_000,
+                                    vehicle_age=int(rng.integers(1, 15)), today='2026-01-15')
+                for vehicle_id in profiles['vehicle_id']]
+    return [contexts[index] for index in rng.integers(0, distinct, requests)]
+
+
+def run_load(fn, payloads, concurrency):
+    """Call ``fn`` once per payload from ``concurrency`` threads; return per-call latencies and the wall time."""
+    def timed(payload):
+        started = time.perf_counter()
+        fn(payload)
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(timed, payloads))
+    return latencies, time.perf_counter() - started
+
+
+def bench_ai_paths(requests, concurrency, distinct, seed, stats_url=None, force_ai_tips=False):
+    """Measure throughput and latency of the AI helpers, with upstream and cache counters for each.
+
+    The streamed maintenance analysis also reports how soon its first item arrived.
+    """
+    from utils import openai_helper
+    from utils.tips_cache import get_tips_cache
+
+    first_items = []
+
+    def stream_maintenance(payload):
+        started = time.perf_counter()
+        for position, _ in enumerate(openai_helper.stream_maintenance_analysis(payload)):
+            if position == 0:
+                first_items.append(time.perf_counter() - started)
+
+    results = {}
+    for name, fn, payloads in (
+        ('driving_tips', partial(openai_helper.get_driving_tips, force_ai=force_ai_tips),
+         driving_payloads(requests, distinct, seed)),
+        ('maintenance_analysis', openai_helper.analyze_maintenance_needs, maintenance_payloads(requests, distinct, seed)),
+        ('maintenance_stream', stream_maintenance, maintenance_payloads(requests, distinct, seed)),
+    ):
+        before_upstream = _upstream_requests(stats_url)
+        before_cache = get_tips_cache().stats()
+        latencies, wall = run_load(fn, payloads, concurrency)
+        after_cache = get_tips_cache().stats()
+        results[name] = dict(
+            latency_summary(latencies),
+            calls=len(latencies),
+            throughput_per_s=round(len(latencies) / wall, 1) if wall else None,
+            upstream_requests=None if stats_url is None else _upstream_requests(stats_url) - before_upstream,
+            cache_hits=after_cache['hits'] - before_cache['hits'],
+        )
+    results['maintenance_stream']['first_item'] = latency_summary(first_items)
+    results['health'] = openai_helper.get_ai_health()
+    return results
+
+
+def bench_pages(pages, runs, fleet=False, timeout=120):
+    """Time script runs of each page: the first (cold) run, later (warm) runs, and until AI content is ready."""
+    from streamlit.testing.v1 import AppTest
+
+    from utils import background
+
+    results = {}
+    for page in pages:
+        timings, ready = [], []
+        for _ in range(runs):
+            started = time.perf_counter()
+            app = AppTest.from_file(os.path.join(APP_DIR, page), default_timeout=timeout)
+            if fleet:
+                app.session_state['vehicle_id'] = None
+            app.run()
+            timings.append(time.perf_counter() - started)
+            background.wait_all(timeout)
+            ready.append(time.perf_counter() - started)
+            if app.exception:
+                raise RuntimeError(f"{page} raised: {app.exception[0].value}")
+        results[page] = {
+            'cold_ms': round(timings[0] * 1000, 1),
+            'warm_ms': latency_summary(timings[1:])['p50_ms'],
+            'ai_ready_ms': round(ready[0] * 1000, 1),
+        }
+    return results
+
+
+def _upstream_requests(stats_url):
+    if stats_url is None:
+        return None
+    with urllib.request.urlopen(stats_url, timeout=5) as response:
+        return json.load(response)['requests']
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark page renders and the AI-backed paths against a local "
+                                                 "OpenAI stand-in (or any OPENAI_BASE_URL).")
+    parser.add_argument('--requests', type=int, default=200, help="calls per AI path")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--distinct', type=int, default=20, help="different inputs among the calls")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--latency', type=float, default=0.5, help="stub seconds per answer")
+    parser.add_argument('--jitter', type=float, default=0.1)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0)
+    parser.add_argument('--chunk-delay', type=float, default=0.02, help="stub seconds per streamed chunk")
+    parser.add_argument('--recordings', help="JSON Lines recordings for the stub to replay")
+    parser.add_argument('--base-url', help="use this API instead of starting a stub, e.g. a stub in another process")
+    parser.add_argument('--data-dir', help="read app data from here instead of ECODRIVE_DATA_DIR")
+    parser.add_argument('--clear-cache', action='store_true', help="empty the response cache first (cold start)")
+    parser.add_argument('--pages', nargs='*', default=PAGES, help="pages to time; pass none to skip page timing")
+    parser.add_argument('--page-runs', type=int, default=3)
+    parser.add_argument('--fleet', action='store_true', help="render pages for the whole fleet")
+    parser.add_argument('--force-ai-tips', action='store_true', help="ask the model for tips the rules would answer")
+    args = parser.parse_args(argv)
+
+    stats_url = None
+    if args.base_url is None:
+        from utils.openai_stub import StubState, base_url, load_recordings, start_stub
+
+        server = start_stub(StubState(load_recordings(args.recordings) if args.recordings else None,
+                                      latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                                      rate_limit_rate=args.rate_limit_rate, seed=args.seed,
+                                      chunk_delay=args.chunk_delay))
+        args.base_url = base_url(server)
+        stats_url = args.base_url.rsplit('/v1', 1)[0] + '/stats'
+
+    # The client is configured when utils.openai_helper is imported, so set these first
+    os.environ['OPENAI_BASE_URL'] = args.base_url
+    os.environ.setdefault('OPENAI_API_KEY', 'stub')
+    if args.data_dir:
+        os.environ['ECODRIVE_DATA_DIR'] = os.path.abspath(args.data_dir)
+    if args.clear_cache:
+        from utils.tips_cache import get_tips_cache
+        get_tips_cache().clear()
+
+    report = {'base_url': args.base_url}
+    if args.pages:
+        report['pages'] = bench_pages(args.pages, args.page_runs, fleet=args.fleet)
+    report['ai'] = bench_ai_paths(args.requests, args.concurrency, args.distinct, args.seed, stats_url,
+                                  force_ai_tips=args.force_ai_tips)
+    print(json.dumps(report, indent=2, default=str))
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,113 @@
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+
+logger = logging.getLogger(__name__)
+
+MAX_WORKERS = 4
+# Finished jobs kept around for later reruns to pick up; the oldest are dropped first
+MAX_RESULTS = 256
+
+_executor = None
+_jobs = OrderedDict()
+_partials = {}
+_lock = threading.Lock()
+
+
+def get_executor():
+    """Return the shared thread pool that runs slow work off the script thread."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='ecodrive-background')
+    return _executor
+
+
+def submit(key, fn, *args, **kwargs):
+    """Run ``fn(*args, **kwargs)`` in the background unless a job with ``key`` already exists.
+
+    Keys are shared by every session, so a rerun, or another user asking the same
+    question, picks up the running job instead of starting a second one.
+    """
+    with _lock:
+        future = _jobs.get(key)
+        if future is None:
+            future = get_executor().submit(fn, *args, **kwargs)
+            _jobs[key] = future
+            _evict()
+        else:
+            _jobs.move_to_end(key)
+        return future
+
+
+def submit_stream(key, fn, *args, **kwargs):
+    """Like ``submit`` for a generator function: its items are collected as they are produced.
+
+    ``partial(key)`` returns the items so far while the job runs; the job's result is
+    the full list.
+    """
+    with _lock:
+        future = _jobs.get(key)
+        if future is None:
+            items = _partials[key] = []
+            future = get_executor().submit(_collect, items, fn, args, kwargs)
+            _jobs[key] = future
+            _evict()
+        else:
+            _jobs.move_to_end(key)
+        return future
+
+
+def partial(key):
+    """Return the items a streaming job has produced so far (all of them once it has finished)."""
+    with _lock:
+        return list(_partials.get(key, ()))
+
+
+def _collect(items, fn, args, kwargs):
+    for item in fn(*args, **kwargs):
+        with _lock:
+            items.append(item)
+    return list(items)
+
+
+def done(key):
+    """Return True once the job for ``key`` has finished (or was never submitted)."""
+    with _lock:
+        future = _jobs.get(key)
+    return future is None or future.done()
+
+
+def result(key, default=None):
+    """Return the result of the job for ``key`` if it has finished, else ``default``.
+
+    A failed job is logged and forgotten, so the next ``submit`` retries it.
+    """
+    with _lock:
+        future = _jobs.get(key)
+    if future is None or not future.done():
+        return default
+    error = future.exception()
+    if error is not None:
+        logger.warning("Background job %r failed: %s", key, error)
+        with _lock:
+            if _jobs.get(key) is future:
+                del _jobs[key]
+                _partials.pop(key, None)
+        return default
+    return future.result()
+
+
+def wait_all(timeout=None):
+    """Block until every job submitted so far has finished, or ``timeout`` seconds have passed."""
+    with _lock:
+        futures = list(_jobs.values())
+    wait(futures, timeout=timeout)
+
+
+def _evict():
+    for key in [key for key, future in _jobs.items() if future.done()]:
+        if len(_jobs) <= MAX_RESULTS:
+            break
+        del _jobs[key]
+        _partials.pop(key, None)
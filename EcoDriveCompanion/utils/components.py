@@ -0,0 +1,96 @@
+import html
+import math
+from functools import lru_cache
+
+import streamlit as st
+
+# Rows per page a paginated list offers, and the default
+PAGE_SIZES = (10, 25, 50, 100)
+DEFAULT_PAGE_SIZE = 25
+# Pages taller than this scroll inside the list instead of stretching the page
+LIST_MAX_HEIGHT_PX = 640
+
+
+@lru_cache(maxsize=64)
+def row_template(template):
+    """Return ``template`` with its indentation and line breaks removed, ready for ``str.format_map``.
+
+    Cached per template string, so a list pays for compacting it once per process and
+    every row it renders is a single format call with no layout whitespace sent along.
+    """
+    return "".join(line.strip() for line in template.splitlines())
+
+
+def render_rows(template, rows):
+    """Render ``rows`` (mappings of the template's fields) into one HTML string; text fields are escaped."""
+    compact = row_template(template)
+    return "".join(compact.format_map({name: html.escape(value) if isinstance(value, str) else value
+                                       for name, value in row.items()})
+                   for row in rows)
+
+
+@st.fragment
+def paginated_list(key, total, fetch, template, reset_on=None, page_size=DEFAULT_PAGE_SIZE):
+    """Show ``total`` rows a page at a time, the whole page as one HTML element.
+
+    ``fetch(offset, limit)`` returns the rows of a page as mappings of ``template``'s
+    fields, so only those rows are read and sent to the browser however long the list
+    is. The page is kept in session state under ``key`` and goes back to the first one
+    when ``reset_on`` (e.g. the filters) changes. Turning pages reruns only the list.
+    """
+    page_key, size_key, reset_key = f"{key}_page", f"{key}_page_size", f"{key}_reset_on"
+    if st.session_state.get(reset_key) != reset_on:
+        st.session_state[reset_key] = reset_on
+        st.session_state[page_key] = 0
+    size = st.session_state.get(size_key, page_size)
+    pages = max(1, math.ceil(total / size))
+    page = min(st.session_state.get(page_key, 0), pages - 1)
+    st.session_state[page_key] = page
+
+    offset = page * size
+    rows = fetch(offset, size)
+    st.markdown(f"<div style='max-height: {LIST_MAX_HEIGHT_PX}px; overflow-y: auto; padding-right: 6px;'>"
+                f"{render_rows(template, rows)}</div>", unsafe_allow_html=True)
+
+    if total <= min(PAGE_SIZES):
+        return
+    col1, col2, col3, col4 = st.columns([1, 3, 1, 2])
+    with col1:
+        st.button("◀ Previous", key=f"{key}_previous", disabled=page == 0, use_container_width=True,
+                  on_click=_turn_page, args=(page_key, -1))
+    with col2:
+        st.caption(f"Page {page + 1:,} of {pages:,} · rows {offset + 1:,}–{offset + len(rows):,} of {total:,}")
+    with col3:
+        st.button("Next ▶", key=f"{key}_next", disabled=page >= pages - 1, use_container_width=True,
+                  on_click=_turn_page, args=(page_key, 1))
+    with col4:
+        st.selectbox("Rows per page", PAGE_SIZES, index=PAGE_SIZES.index(size) if size in PAGE_SIZES else 0,
+                     key=size_key, label_visibility="collapsed", on_change=_resize_page, args=(page_key, size_key, size))
+
+
+def lazy_sections(labels, key, keep=None):
+    """Show a tab-like picker over ``labels`` and return the one to render.
+
+    Unlike ``st.tabs``, which runs every tab's body on every rerun, only the picked
+    section's code has to run: ``if section == label:`` blocks in place of
+    ``with tab:``. Streamlit forgets the widgets of a section while it's hidden, so the
+    keys listed for it in ``keep`` (``{label: [widget keys]}``) are carried over and
+    its filters are as the user left them on coming back.
+    """
+    section = st.radio("Section", labels, key=key, horizontal=True, label_visibility="collapsed")
+    for label, widget_keys in (keep or {}).items():
+        if label != section:
+            for widget_key in widget_keys:
+                if widget_key in st.session_state:
+                    st.session_state[widget_key] = st.session_state[widget_key]
+    return section
+
+
+def _turn_page(page_key, step):
+    st.session_state[page_key] = max(0, st.session_state.get(page_key, 0) + step)
+
+
+def _resize_page(page_key, size_key, old_size):
+    # Keep the first row of the current page in view
+    first_row = st.session_state.get(page_key, 0) * old_size
+    st.session_state[page_key] = first_row // st.session_state[size_key]
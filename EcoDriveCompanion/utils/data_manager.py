@@ -1,66 +1,340 @@
+import os
+import json
+import logging
 import pandas as pd
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import numpy as np
+from utils.trip_store import TripStore, DEFAULT_VEHICLE_ID, apply_trip_schema, bytes_per_trip
+from utils.telemetry import ingest_telemetry
+from utils.emissions import calculate_emissions
+from utils.rollups import EmissionsRollup
+from utils.fleet import FleetRegistry, map_vehicles
+from utils.locks import file_lock
+from utils.maintenance_store import MaintenanceStore
+from utils.prewarm import schedule_prewarm
+from utils.sampling import MEASURES, TripSample, exact_metrics, trip_sums
+
+# Local storage for trips and other persisted data
+DATA_DIR = os.getenv("ECODRIVE_DATA_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data"))
+
+logger = logging.getLogger(__name__)
+
+_trip_store = None
+_emissions_rollup = None
+_fleet_registry = None
+_maintenance_store = None
+_trip_sample = None
+# Day this process last checked the demo history; it is extended once a day at most
+_demo_checked_on = None
+# Whether this process has made sure the maintenance log is seeded
+_maintenance_checked = False
+
+def get_trip_store():
+    """Return the shared on-disk trip store."""
+    global _trip_store
+    if _trip_store is None:
+        _trip_store = TripStore(os.path.join(DATA_DIR, "trips"))
+    return _trip_store
+
+def get_fleet_registry():
+    """Return the registry of vehicles in the fleet."""
+    global _fleet_registry
+    if _fleet_registry is None:
+        _fleet_registry = FleetRegistry(os.path.join(DATA_DIR, "vehicles.json"))
+    return _fleet_registry
+
+def get_maintenance_store():
+    """Return the shared SQLite maintenance log."""
+    global _maintenance_store
+    if _maintenance_store is None:
+        _maintenance_store = MaintenanceStore(os.path.join(DATA_DIR, "maintenance.sqlite"))
+    return _maintenance_store
+
+def get_emissions_rollup():
+    """Return the shared emissions rollups kept alongside the trip store."""
+    global _emissions_rollup
+    if _emissions_rollup is None:
+        _emissions_rollup = EmissionsRollup(os.path.join(DATA_DIR, "rollups"),
+                                            fuel_type_of=lambda vehicle_id: get_fleet_registry().fuel_type(vehicle_id))
+    return _emissions_rollup
+
+def get_trip_sample():
+    """Return the shared stratified trip sample used for approximate fleet metrics."""
+    global _trip_sample
+    if _trip_sample is None:
+        _trip_sample = TripSample(os.path.join(DATA_DIR, "samples"))
+    return _trip_sample
+
+def _load_vehicle_trips(vehicle_id, trips_root, start, end, columns):
+    """Load one vehicle's trips; runs in a worker process for fleet queries."""
+    trips = TripStore(trips_root).load(columns=columns, start=start, end=end, vehicle_id=vehicle_id)
+    if 'vehicle_id' not in trips:
+        trips.insert(0, 'vehicle_id', vehicle_id)
+    return trips
+
+def _vehicle_daily_totals(vehicle_id, trips_root, start, end):
+    """Reduce one vehicle's trips to additive per-day sums; runs in a worker process."""
+    trips = TripStore(trips_root).load(start=start, end=end, vehicle_id=vehicle_id)
+    return pd.DataFrame({
+        'date': trips['date'].dt.normalize(),
+        'distance': trips['distance'],
+        'fuel_used': trips['distance'] * trips['fuel_consumption'] / 100,
+        'eco_score': trips['eco_score'],
+        'trips': 1,
+        'harsh_braking': trips['harsh_braking'],
+        'rapid_acceleration': trips['rapid_acceleration'],
+    }).groupby('date', as_index=False).sum()
+
+def _vehicle_trip_sums(vehicle_id, trips_root, start, end):
+    """Sum one vehicle's trip measures for a period; runs in a worker process for fleet metrics."""
+    trips = TripStore(trips_root).load(columns=['distance', 'fuel_consumption', 'eco_score', 'harsh_braking',
+                                                'rapid_acceleration'], start=start, end=end, vehicle_id=vehicle_id)
+    return trip_sums(trips)
+
+def _daily_summary(totals):
+    """Turn per-day sums into a history frame with the same columns as a single vehicle's."""
+    distance = totals['distance'].to_numpy(dtype=float)
+    trips = totals['trips'].to_numpy(dtype=float)
+    return _compact_trips(pd.DataFrame({
+        'date': totals['date'],
+        'distance': distance,
+        'fuel_consumption': np.divide(totals['fuel_used'].to_numpy(dtype=float) * 100, distance,
+                                      out=np.zeros_like(distance), where=distance > 0),
+        'eco_score': np.divide(totals['eco_score'].to_numpy(dtype=float), trips, out=np.zeros_like(trips),
+                               where=trips > 0),
+        'harsh_braking': totals['harsh_braking'].round().astype(np.int64),
+        'rapid_acceleration': totals['rapid_acceleration'].round().astype(np.int64),
+    }))
+
+def _compact_trips(trips):
+    """Apply the compact trip schema and log the resulting memory cost."""
+    trips = apply_trip_schema(trips)
+    logger.debug("Loaded %d trips at %.1f bytes per trip", len(trips), bytes_per_trip(trips))
+    return trips
 
 class DataManager:
     @staticmethod
-    def get_driving_history():
-        """Get driving history data."""
-        dates = pd.date_range(end=datetime.now(), periods=30, freq='D')
+    def get_driving_history(start=None, end=None, columns=None, vehicle_id=DEFAULT_VEHICLE_ID, min_eco_score=None):
+        """Get driving history indexed by date, optionally limited to a date range and a subset of columns."""
+        DataManager._ensure_seeded()
+        return _compact_trips(get_trip_store().load(columns=columns, start=start, end=end, vehicle_id=vehicle_id,
+                                                    min_eco_score=min_eco_score))
+
+    @staticmethod
+    def get_data_version(vehicle_id=DEFAULT_VEHICLE_ID):
+        """Get a stamp that changes whenever trips are recorded for the vehicle (``None``: any vehicle)."""
+        DataManager._ensure_seeded()
+        return get_trip_store().version(vehicle_id)
+
+    @staticmethod
+    def get_fleet():
+        """Get the vehicles in the fleet with their models and fuel types."""
+        return get_fleet_registry().list()
+
+    @staticmethod
+    def get_fleet_history(vehicle_ids=None, start=None, end=None, columns=None):
+        """Get the trips of many vehicles in one frame, loading vehicles in parallel."""
+        DataManager._ensure_seeded()
+        store = get_trip_store()
+        vehicle_ids = store.vehicle_ids() if vehicle_ids is None else list(vehicle_ids)
+        frames = map_vehicles(_load_vehicle_trips, vehicle_ids, store.root, start, end, columns)
+        if not frames:
+            return _compact_trips(store.load(columns=['vehicle_id'] + list(columns or []), start=start, end=end,
+                                             vehicle_id=[]))
+        trips = pd.concat(frames, ignore_index=True).sort_values('date', kind='stable')
+        return _compact_trips(trips)
+
+    @staticmethod
+    def get_fleet_daily_summary(vehicle_ids=None, start=None, end=None, approximate=False):
+        """Get fleet-wide driving history as one row per day, aggregated per vehicle in parallel.
+
+        Distance and event counts are summed, fuel consumption is distance-weighted and the
+        eco score is averaged over trips, so the frame has the same columns as a single
+        vehicle's history. With ``approximate`` the whole fleet's days are estimated from
+        the trip sample instead of reading every trip.
+        """
+        DataManager._ensure_seeded()
+        if approximate and vehicle_ids is None:
+            return _daily_summary(DataManager._get_trip_sample().daily_totals(start, end))
+        store = get_trip_store()
+        vehicle_ids = store.vehicle_ids() if vehicle_ids is None else list(vehicle_ids)
+        partials = map_vehicles(_vehicle_daily_totals, vehicle_ids, store.root, start, end)
+        if not partials:
+            return _compact_trips(store.load(start=start, end=end, vehicle_id=[]))
+        return _daily_summary(pd.concat(partials, ignore_index=True).groupby('date', as_index=False, sort=True).sum())
+
+    @staticmethod
+    def get_trip_metrics(start=None, end=None, vehicle_id=DEFAULT_VEHICLE_ID, approximate=False):
+        """Get trip count, distance, harsh events, fuel consumption and mean eco-score for a period.
+
+        Values are ``Estimate(value, low, high)`` tuples. With ``approximate`` the fleet
+        (``vehicle_id`` of ``None``) is estimated from the trip sample with 95% confidence
+        intervals; a single vehicle is always summed exactly, as its trips are cheap to read.
+        """
+        DataManager._ensure_seeded()
+        if approximate and vehicle_id is None:
+            return DataManager._get_trip_sample().estimate(start, end)
+        store = get_trip_store()
+        vehicle_ids = store.vehicle_ids() if vehicle_id is None else [vehicle_id]
+        partials = map_vehicles(_vehicle_trip_sums, vehicle_ids, store.root, start, end)
+        return exact_metrics(pd.DataFrame(partials, columns=MEASURES).sum())
+
+    @staticmethod
+    def _get_trip_sample():
+        """Return the trip sample, building it first for stores written before it existed."""
+        sample = get_trip_sample()
+        sample.ensure_complete(get_trip_store())
+        return sample
+
+    @staticmethod
+    def record_trips(trips, vehicle_id=DEFAULT_VEHICLE_ID):
+        """Persist new trips to the trip store and fold them into the emissions rollups and trip sample.
+
+        Trips without a ``vehicle_id`` column are attributed to ``vehicle_id``. The AI
+        tips of the vehicles (and the fleet) are then pre-warmed in the background.
+        """
+        if 'vehicle_id' not in trips:
+            trips = trips.assign(vehicle_id=vehicle_id)
+        # The rollups and sample must hold the history before these trips, or they would only cover them
+        rollup = get_emissions_rollup()
+        rollup.ensure_complete(get_trip_store())
+        sample = DataManager._get_trip_sample()
+        written = get_trip_store().append(trips)
+        rollup.update(trips)
+        sample.update(trips)
+        schedule_prewarm(list(trips['vehicle_id'].unique()) + [None])
+        return written
+
+    @staticmethod
+    def ingest_telemetry(chunks, vehicle_id=DEFAULT_VEHICLE_ID, batch_size=10000):
+        """Aggregate a stream of raw telemetry chunks into trips and persist them.
+
+        Completed trips are buffered and written in batches of ``batch_size`` so the
+        store is not flooded with tiny files. Returns the number of trips written.
+        """
+        pending = []
+        pending_rows = 0
+        written = 0
+        for trips in ingest_telemetry(chunks):
+            pending.append(trips)
+            pending_rows += len(trips)
+            if pending_rows >= batch_size:
+                written += DataManager.record_trips(pd.concat(pending, ignore_index=True), vehicle_id)
+                pending, pending_rows = [], 0
+        if pending:
+            written += DataManager.record_trips(pd.concat(pending, ignore_index=True), vehicle_id)
+        return written
+
+    @staticmethod
+    def _ensure_seeded():
+        """Seed an empty trip store with demo history so the pages have data to show.
+
+        The demo history is then extended up to today whenever it is read on a later day,
+        so the pages' recent windows never run dry. Stores holding real or generated trips
+        (no demo marker) are left alone. Seeding is serialized across sessions and processes.
+        """
+        global _demo_checked_on
+        today = date.today()
+        if _demo_checked_on == today:
+            return
+        marker = os.path.join(DATA_DIR, "demo_seed.json")
+        with file_lock(os.path.join(DATA_DIR, "seed.lock")):
+            if get_trip_store().is_empty():
+                new_trips = DataManager._sample_driving_history()
+            elif os.path.exists(marker):
+                with open(marker) as f:
+                    days = (today - date.fromisoformat(json.load(f)['seeded_through'])).days
+                new_trips = DataManager._sample_driving_history(days=days, seed=today.toordinal()) if days > 0 else None
+            else:
+                new_trips = None
+            if new_trips is not None:
+                DataManager.record_trips(new_trips)
+                with open(marker, 'w') as f:
+                    json.dump({'seeded_through': today.isoformat()}, f)
+        _demo_checked_on = today
+
+    @staticmethod
+    def _sample_driving_history(days=365, seed=42):
+        """Build ``days`` days of demo history ending now, used to seed and extend the trip store."""
+        rng = np.random.default_rng(seed)
+        dates = pd.date_range(end=datetime.now().replace(microsecond=0), periods=days, freq='D')
         data = {
             'date': dates,
-            'distance': np.random.normal(30, 10, 30),  # km
-            'fuel_consumption': np.random.normal(6, 1, 30),  # L/100km
-            'eco_score': np.random.normal(80, 10, 30),  # 0-100
-            'harsh_braking': np.random.randint(0, 5, 30),
-            'rapid_acceleration': np.random.randint(0, 5, 30)
+            'distance': rng.normal(30, 10, days).clip(1),  # km
+            'fuel_consumption': rng.normal(6, 1, days).clip(2),  # L/100km
+            'eco_score': rng.normal(80, 10, days).clip(0, 100),  # 0-100
+            'harsh_braking': rng.integers(0, 5, days),
+            'rapid_acceleration': rng.integers(0, 5, days)
         }
         return pd.DataFrame(data)
 
     @staticmethod
-    def get_maintenance_schedule():
-        """Get vehicle maintenance schedule."""
-        current_date = datetime.now()
-        maintenance_items = [
-            {
-                'item': 'Oil Change',
-                'last_service': (current_date - timedelta(days=80)).strftime('%Y-%m-%d'),
-                'next_due': (current_date + timedelta(days=10)).strftime('%Y-%m-%d'),
-                'interval_km': 5000,
-                'status': 'Due Soon'
-            },
-            {
-                'item': 'Tire Rotation',
-                'last_service': (current_date - timedelta(days=45)).strftime('%Y-%m-%d'),
-                'next_due': (current_date + timedelta(days=45)).strftime('%Y-%m-%d'),
-                'interval_km': 10000,
-                'status': 'OK'
-            },
-            {
-                'item': 'Air Filter',
-                'last_service': (current_date - timedelta(days=150)).strftime('%Y-%m-%d'),
-                'next_due': (current_date + timedelta(days=30)).strftime('%Y-%m-%d'),
-                'interval_km': 15000,
-                'status': 'Due Soon'
-            }
-        ]
-        return pd.DataFrame(maintenance_items)
-
-    @staticmethod
-    def calculate_carbon_footprint(distance, fuel_consumption):
+    def get_maintenance_schedule(vehicle_id=DEFAULT_VEHICLE_ID):
+        """Get vehicle maintenance schedule; ``None`` returns the schedule of every vehicle."""
+        DataManager._ensure_maintenance_seeded()
+        return get_maintenance_store().schedule(vehicle_id)
+
+    @staticmethod
+    def get_due_maintenance(vehicle_id=DEFAULT_VEHICLE_ID, within_days=30):
+        """Get maintenance items that are overdue or due within ``within_days``."""
+        DataManager._ensure_maintenance_seeded()
+        return get_maintenance_store().due_soon(vehicle_id, within_days=within_days)
+
+    @staticmethod
+    def get_completed_maintenance(vehicle_id=DEFAULT_VEHICLE_ID, limit=None, offset=0):
+        """Get the log of completed services, most recent first, or one page of it."""
+        DataManager._ensure_maintenance_seeded()
+        return get_maintenance_store().completed(vehicle_id, limit=limit, offset=offset)
+
+    @staticmethod
+    def count_completed_maintenance(vehicle_id=DEFAULT_VEHICLE_ID):
+        """Get the number of completed services logged."""
+        DataManager._ensure_maintenance_seeded()
+        return get_maintenance_store().count_completed(vehicle_id)
+
+    @staticmethod
+    def record_maintenance(vehicle_id, item, service_date, mileage=None, notes=None):
+        """Log a completed service, reschedule the item and pre-warm the vehicle's AI maintenance analysis."""
+        get_maintenance_store().record(vehicle_id, item, service_date, mileage=mileage, notes=notes)
+        schedule_prewarm([vehicle_id, None])
+
+    @staticmethod
+    def _ensure_maintenance_seeded():
+        """Seed an empty maintenance log with the demo vehicle's service history.
+
+        Checked once per process; seeding is serialized across sessions and processes.
+        """
+        global _maintenance_checked
+        if _maintenance_checked:
+            return
+        store = get_maintenance_store()
+        with file_lock(f"{store.path}.lock"):
+            if store.is_empty():
+                current_date = datetime.now()
+                # (item, days since last service, service interval in days)
+                for item, days_ago, interval_days in [('Oil Change', 80, 90), ('Tire Rotation', 45, 90),
+                                                      ('Air Filter', 150, 180)]:
+                    store.record(DEFAULT_VEHICLE_ID, item, current_date - timedelta(days=days_ago),
+                                 interval_days=interval_days)
+        _maintenance_checked = True
+
+    @staticmethod
+    def calculate_carbon_footprint(distance, fuel_consumption, fuel_type='petrol'):
         """Calculate carbon footprint in kg CO2."""
-        # Average CO2 emissions per liter of gasoline: 2.31 kg
-        fuel_used = distance * fuel_consumption / 100  # L
-        return fuel_used * 2.31
+        return DataManager.calculate_emissions(distance, fuel_consumption, fuel_type)
 
     @staticmethod
-    def get_emissions_data():
-        """Get historical emissions data."""
-        dates = pd.date_range(end=datetime.now(), periods=12, freq='ME')
-        data = {
-            'date': dates,
-            'emissions': np.random.normal(300, 50, 12),  # kg CO2
-            'distance': np.random.normal(800, 100, 12),  # km
-            'average_consumption': np.random.normal(7, 1, 12)  # L/100km
-        }
-        return pd.DataFrame(data)
+    def calculate_emissions(distance, consumption, fuel_type='petrol'):
+        """Calculate kg CO2 for one trip or whole arrays of trips; see ``utils.emissions.calculate_emissions``."""
+        return calculate_emissions(distance, consumption, fuel_type)
+
+    @staticmethod
+    def get_emissions_data(granularity='monthly', start=None, end=None, vehicle_id=DEFAULT_VEHICLE_ID):
+        """Get historical emissions per period from the precomputed rollups.
+
+        ``vehicle_id`` of ``None`` returns totals for the whole fleet.
+        """
+        DataManager._ensure_seeded()
+        rollup = get_emissions_rollup()
+        rollup.ensure_complete(get_trip_store())
+        return rollup.load(granularity, start=start, end=end, vehicle_id=vehicle_id)
@@ -0,0 +1,87 @@
+import numpy as np
+
+# Points plotted across a full-width chart, about one per pixel on a wide layout; more can't be told apart
+FULL_WIDTH_POINTS = 1200
+# Fewest points a chart is cut down to, however narrow
+MIN_POINTS = 50
+
+
+def points_for_width(fraction=1.0):
+    """Return the point budget of a chart ``fraction`` of the page wide (0.5 for one of two columns)."""
+    return max(MIN_POINTS, int(FULL_WIDTH_POINTS * fraction))
+
+
+def lttb_indices(x, y, threshold):
+    """Return the positions of ``threshold`` points that keep the visual shape of the line (x, y).
+
+    Largest-triangle-three-buckets: the first and last points are kept and every bucket
+    in between contributes the point forming the largest triangle with the point kept
+    before it and the mean of the next bucket, which keeps peaks, dips and trends.
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if np.isnan(y).any():
+        # Gaps stay in the plotted data; they just can't win a bucket
+        y = np.where(np.isnan(y), np.nanmean(y) if not np.isnan(y).all() else 0.0, y)
+
+    bounds = (np.arange(threshold - 1) * ((n - 2) / (threshold - 2))).astype(int) + 1
+    bounds[-1] = n - 1
+    selected = np.empty(threshold, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = bounds[bucket], bounds[bucket + 1]
+        if bucket < threshold - 3:
+            next_x = x[end:bounds[bucket + 2]].mean()
+            next_y = y[end:bounds[bucket + 2]].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+        # Twice the triangle areas; the factor doesn't change which is largest
+        areas = np.abs((x[previous] - next_x) * (y[start:end] - y[previous])
+                       - (x[previous] - x[start:end]) * (next_y - y[previous]))
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    return selected
+
+
+def minmax_indices(y, threshold):
+    """Return the positions of at most ``threshold`` points: the minimum and maximum of each bucket.
+
+    Suits bars and event counts, where every extreme must survive: no spike is averaged away.
+    """
+    n = len(y)
+    buckets = threshold // 2
+    if threshold >= n or buckets < 1:
+        return np.arange(n)
+    values = np.asarray(y, dtype=float)
+    values = np.where(np.isnan(values), 0.0, values)
+    edges = np.linspace(0, n, buckets + 1).astype(int)
+    selected = []
+    for start, end in zip(edges[:-1], edges[1:]):
+        window = values[start:end]
+        selected += [start + int(np.argmin(window)), start + int(np.argmax(window))]
+    return np.unique(selected)
+
+
+def downsample_line(frame, y, x=None, points=FULL_WIDTH_POINTS):
+    """Return the rows of ``frame`` that plot column ``y`` against ``x`` (the index if None) in ``points`` points."""
+    if len(frame) <= points:
+        return frame
+    return frame.iloc[lttb_indices(_numeric(frame.index if x is None else frame[x]), frame[y], points)]
+
+
+def downsample_bars(frame, y, points=FULL_WIDTH_POINTS):
+    """Return the rows of ``frame`` that keep the extremes of column ``y`` in at most ``points`` bars."""
+    if len(frame) <= points:
+        return frame
+    return frame.iloc[minmax_indices(frame[y], points)]
+
+
+def _numeric(values):
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.datetime64):
+        return values.astype('datetime64[ns]').view('int64')
+    return values
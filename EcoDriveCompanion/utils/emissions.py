@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+
+# kg CO2 per unit of energy: litres of fuel, or kWh of grid electricity (average grid mix)
+EMISSION_FACTORS = {
+    'petrol': 2.31,
+    'diesel': 2.68,
+    'hybrid': 2.31,
+    'electric': 0.4,
+}
+FUEL_TYPES = list(EMISSION_FACTORS)
+_EMISSION_FACTOR_TABLE = np.array([EMISSION_FACTORS[name] for name in FUEL_TYPES])
+
+
+def calculate_emissions(distance, consumption, fuel_type='petrol'):
+    """Calculate kg CO2 for one trip or whole arrays of trips in a single vectorized pass.
+
+    ``consumption`` is per 100 km: litres for combustion and hybrid vehicles, kWh for
+    electric ones. ``fuel_type`` is a single type or one type per trip.
+    Scalars in give a float back, Series in give a Series with the same index.
+    """
+    distance_values = np.asarray(distance, dtype=float)
+    consumption_values = np.asarray(consumption, dtype=float)
+    if isinstance(fuel_type, str):
+        factors = EMISSION_FACTORS[fuel_type]
+    else:
+        codes = pd.Categorical(fuel_type, categories=FUEL_TYPES).codes
+        if (codes < 0).any():
+            raise ValueError(f"Unknown fuel type; expected one of {FUEL_TYPES}")
+        factors = _EMISSION_FACTOR_TABLE[codes]
+
+    emissions = distance_values * consumption_values / 100 * factors
+    if isinstance(distance, pd.Series):
+        return pd.Series(emissions, index=distance.index, name='emissions')
+    if emissions.ndim == 0:
+        return float(emissions)
+    return emissions
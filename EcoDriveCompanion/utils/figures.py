@@ -0,0 +1,33 @@
+import streamlit as st
+
+# Built figures kept for every session; each is a few kB, most of it the plotted data
+FIGURE_CACHE_ENTRIES = 256
+DEFAULT_THEME = "Dark Green"
+# Colour of each sidebar theme's primary chart series
+THEME_ACCENTS = {
+    "Dark Green": "#4CAF50",
+    "Dark Blue": "#2196F3",
+    "Dark Purple": "#AB47BC",
+}
+
+
+def current_theme():
+    """Return the theme picked in the sidebar."""
+    return st.session_state.get("theme", DEFAULT_THEME)
+
+
+def cached_figure(kind, data_version, period, build, *args):
+    """Return ``build(*args, theme=...)``, built once per (kind, data version, period, theme).
+
+    Building a Plotly figure is most of a chart's cost on a rerun, and unrelated widgets
+    rerun the whole page, so figures are shared by every rerun and session until the
+    data or the view changes. ``kind`` names the chart and must be unique across pages;
+    ``data_version`` must change whenever ``args`` would, as they are not hashed.
+    The figure is shared, so callers must not modify it.
+    """
+    return _cached_figure(kind, data_version, period, current_theme(), build, args)
+
+
+@st.cache_resource(max_entries=FIGURE_CACHE_ENTRIES, show_spinner=False)
+def _cached_figure(kind, data_version, period, theme, _build, _args):
+    return _build(*_args, theme=theme)
@@ -0,0 +1,87 @@
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from utils.trip_store import DEFAULT_VEHICLE_ID
+
+DEFAULT_VEHICLE = {'vehicle_id': DEFAULT_VEHICLE_ID, 'model': 'Toyota Prius', 'fuel_type': 'hybrid'}
+
+# Below this many vehicles the process start-up and pickling cost more than they save
+PARALLEL_MIN_VEHICLES = 4
+MAX_WORKERS = os.cpu_count() or 1
+
+_process_pool = None
+
+
+class FleetRegistry:
+    """JSON registry of the vehicles in the fleet and their fuel types."""
+
+    def __init__(self, path):
+        self.path = path
+        self._cache = (None, [])
+
+    def list(self):
+        """Return every registered vehicle as a DataFrame."""
+        vehicles = self._read()
+        if not vehicles:
+            vehicles = [DEFAULT_VEHICLE]
+        return pd.DataFrame(vehicles, columns=['vehicle_id', 'model', 'fuel_type'])
+
+    def get(self, vehicle_id):
+        for vehicle in self._read() or [DEFAULT_VEHICLE]:
+            if vehicle['vehicle_id'] == vehicle_id:
+                return vehicle
+        return None
+
+    def fuel_type(self, vehicle_id):
+        vehicle = self.get(vehicle_id)
+        return vehicle['fuel_type'] if vehicle else 'petrol'
+
+    def add(self, vehicles):
+        """Register or update vehicles given as dicts with vehicle_id, model and fuel_type."""
+        registered = {vehicle['vehicle_id']: vehicle for vehicle in self._read() or [DEFAULT_VEHICLE]}
+        for vehicle in vehicles:
+            registered[vehicle['vehicle_id']] = dict(vehicle)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(list(registered.values()), f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def _read(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return []
+        if self._cache[0] != mtime:
+            with open(self.path) as f:
+                self._cache = (mtime, json.load(f))
+        return self._cache[1]
+
+
+def get_process_pool():
+    """Return the shared process pool used to fan fleet work out across cores."""
+    global _process_pool
+    if _process_pool is None:
+        # Streamlit serves sessions from threads, so forking the server process is unsafe
+        _process_pool = ProcessPoolExecutor(max_workers=MAX_WORKERS,
+                                            mp_context=multiprocessing.get_context('spawn'))
+    return _process_pool
+
+
+def map_vehicles(fn, vehicle_ids, *args):
+    """Call ``fn(vehicle_id, *args)`` for every vehicle, in parallel for large fleets.
+
+    ``fn`` must be a module-level function so it can be sent to worker processes.
+    Results come back in the order of ``vehicle_ids``.
+    """
+    vehicle_ids = list(vehicle_ids)
+    if len(vehicle_ids) < PARALLEL_MIN_VEHICLES:
+        return [fn(vehicle_id, *args) for vehicle_id in vehicle_ids]
+
+    chunksize = max(1, len(vehicle_ids) // (MAX_WORKERS * 4))
+    repeated = [[arg] * len(vehicle_ids) for arg in args]
+    return list(get_process_pool().map(fn, vehicle_ids, *repeated, chunksize=chunksize))
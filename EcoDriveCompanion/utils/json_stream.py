@@ -0,0 +1,74 @@
+import json
+
+
+class ArrayItemParser:
+    """Incremental parser for a streamed JSON object whose values are arrays.
+
+    Feed it the text as it arrives; ``feed`` returns ``(key, item)`` for every array
+    item completed by that text, so a response like ``{"recommendations": [...]}``
+    can be shown item by item long before the closing brace arrives. Only arrays that
+    are direct values of the top-level object are split; anything else is skipped.
+    """
+
+    def __init__(self):
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string = []  # the current top-level string, which may be a key
+        self._last_string = None
+        self._array_key = None
+        self._item = []
+
+    def feed(self, text):
+        items = []
+        in_array = self._array_key is not None
+        for char in text:
+            if self._in_string:
+                if in_array:
+                    self._item.append(char)
+                elif self._depth == 1:
+                    self._string.append(char)
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if in_array and self._depth == 2:
+                        self._flush(items)  # a string item is complete at its closing quote
+                    elif self._depth == 1:
+                        self._last_string = json.loads('"' + ''.join(self._string))
+                continue
+
+            if char == '"':
+                self._in_string = True
+                if in_array:
+                    self._item.append(char)
+                elif self._depth == 1:
+                    self._string = []
+            elif char in '{[':
+                if self._depth == 1 and char == '[':
+                    self._array_key, in_array = self._last_string, True
+                elif in_array:
+                    self._item.append(char)
+                self._depth += 1
+            elif char in '}]':
+                self._depth -= 1
+                if in_array and self._depth == 1:
+                    self._flush(items)  # a number, boolean or null item ends at the bracket
+                    self._array_key, in_array = None, False
+                elif in_array:
+                    self._item.append(char)
+                    if self._depth == 2:
+                        self._flush(items)
+            elif in_array and self._depth == 2 and char == ',':
+                self._flush(items)
+            elif in_array:
+                self._item.append(char)
+        return items
+
+    def _flush(self, items):
+        text = ''.join(self._item).strip()
+        self._item = []
+        if text:
+            items.append((self._array_key, json.loads(text)))
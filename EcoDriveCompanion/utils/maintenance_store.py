@@ -0,0 +1,190 @@
+import os
+import sqlite3
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+import pandas as pd
+
+# Default service intervals per maintenance type: (km, days)
+MAINTENANCE_INTERVALS = {
+    'Oil Change': (5000, 90),
+    'Tire Rotation': (10000, 180),
+    'Air Filter': (15000, 365),
+    'Brake Service': (20000, 365),
+    'Fluid Check': (10000, 180),
+    'Battery Service': (30000, 730),
+    'Other': (10000, 365),
+}
+
+DUE_SOON_DAYS = 30
+
+SCHEDULED = 'Scheduled'
+COMPLETED = 'Completed'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS maintenance (
+    id INTEGER PRIMARY KEY,
+    vehicle_id TEXT NOT NULL,
+    item TEXT NOT NULL,
+    last_service TEXT NOT NULL,
+    next_due TEXT NOT NULL,
+    interval_km INTEGER NOT NULL,
+    mileage INTEGER,
+    notes TEXT,
+    status TEXT NOT NULL
+);
+DROP INDEX IF EXISTS idx_maintenance_vehicle_next_due;
+CREATE INDEX IF NOT EXISTS idx_maintenance_schedule_vehicle_next_due ON maintenance (vehicle_id, next_due)
+    WHERE status = 'Scheduled';
+CREATE INDEX IF NOT EXISTS idx_maintenance_status_next_due ON maintenance (status, next_due);
+CREATE INDEX IF NOT EXISTS idx_maintenance_log_vehicle_last_service ON maintenance (vehicle_id, last_service)
+    WHERE status = 'Completed';
+CREATE INDEX IF NOT EXISTS idx_maintenance_status_last_service ON maintenance (status, last_service);
+"""
+
+# Dates are stored as ISO strings, so range predicates compare correctly and use the indexes
+_COLUMNS = "vehicle_id, item, last_service, next_due, interval_km, mileage, notes"
+
+
+class MaintenanceStore:
+    """SQLite log of maintenance services and the schedule they imply.
+
+    Every recorded service is kept as a ``Completed`` row. Each (vehicle, item) also has
+    one ``Scheduled`` row holding the next due date, so "due soon" is an index range
+    scan on next_due rather than a filter over the whole history. A vehicle's schedule
+    has a partial index of its own, which the growing service log doesn't bloat.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._initialized = False
+
+    @contextmanager
+    def _connect(self):
+        if not self._initialized:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            if not self._initialized:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(SCHEMA)
+                self._initialized = True
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def is_empty(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT 1 FROM maintenance LIMIT 1").fetchone() is None
+
+    def record(self, vehicle_id, item, service_date, mileage=None, notes=None, interval_km=None, interval_days=None):
+        """Log a completed service and move the item's next due date forward.
+
+        A service logged after a more recent one (e.g. entered late) goes into the log but
+        never moves the schedule back.
+        """
+        with self._connect() as conn:
+            self._record(conn, vehicle_id, item, service_date, mileage, notes, interval_km, interval_days)
+
+    def record_many(self, services):
+        """Log many services in one transaction; ``services`` are dicts of ``record`` arguments."""
+        with self._connect() as conn:
+            count = 0
+            for service in services:
+                self._record(conn, **service)
+                count += 1
+        return count
+
+    @staticmethod
+    def _record(conn, vehicle_id, item, service_date, mileage=None, notes=None, interval_km=None, interval_days=None):
+        default_km, default_days = MAINTENANCE_INTERVALS.get(item, MAINTENANCE_INTERVALS['Other'])
+        interval_km = interval_km or default_km
+        interval_days = interval_days or default_days
+        service_date = pd.Timestamp(service_date).date()
+        next_due = (service_date + timedelta(days=interval_days)).isoformat()
+        last_service = service_date.isoformat()
+
+        conn.execute(
+            f"INSERT INTO maintenance ({_COLUMNS}, status) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (vehicle_id, item, last_service, next_due, interval_km, mileage, notes, COMPLETED),
+        )
+        # Keep the later of the scheduled and new due dates; the other fields follow the latest service
+        updated = conn.execute(
+            "UPDATE maintenance SET next_due = MAX(next_due, ?), "
+            "interval_km = CASE WHEN ? >= last_service THEN ? ELSE interval_km END, "
+            "mileage = CASE WHEN ? >= last_service THEN ? ELSE mileage END, "
+            "last_service = MAX(last_service, ?) "
+            "WHERE vehicle_id = ? AND item = ? AND status = ?",
+            (next_due, last_service, interval_km, last_service, mileage, last_service, vehicle_id, item, SCHEDULED),
+        ).rowcount
+        if not updated:
+            conn.execute(
+                f"INSERT INTO maintenance ({_COLUMNS}, status) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (vehicle_id, item, last_service, next_due, interval_km, mileage, None, SCHEDULED),
+            )
+
+    def schedule(self, vehicle_id=None, today=None, within_days=DUE_SOON_DAYS):
+        """Return the upcoming due date of every item, with an Overdue / Due Soon / OK status."""
+        today = today or date.today()
+        soon = today + timedelta(days=within_days)
+        where, params = self._vehicle_clause(vehicle_id)
+        # A vehicle's schedule is read from its partial index (see due_soon)
+        source = "maintenance" if vehicle_id is None else "maintenance INDEXED BY idx_maintenance_schedule_vehicle_next_due"
+        return self._query(
+            "SELECT vehicle_id, item, last_service, next_due, interval_km, "
+            "CASE WHEN next_due < ? THEN 'Overdue' WHEN next_due <= ? THEN 'Due Soon' ELSE 'OK' END AS status "
+            f"FROM {source} WHERE status = '{SCHEDULED}'{where} ORDER BY next_due",
+            [today.isoformat(), soon.isoformat()] + params,
+        )
+
+    def due_soon(self, vehicle_id=None, today=None, within_days=DUE_SOON_DAYS):
+        """Return items due within ``within_days`` (overdue ones included), soonest first."""
+        today = today or date.today()
+        soon = (today + timedelta(days=within_days)).isoformat()
+        if vehicle_id is None:
+            # Range scan on (status, next_due)
+            sql = (f"SELECT {_COLUMNS} FROM maintenance WHERE status = ? AND next_due <= ? ORDER BY next_due")
+            params = [SCHEDULED, soon]
+        else:
+            # Range scan on the vehicle's schedule alone, never its completed services; without
+            # table statistics SQLite would otherwise pick the status index and walk every
+            # vehicle's schedule. The status is inlined so the partial index applies
+            sql = (f"SELECT {_COLUMNS} FROM maintenance INDEXED BY idx_maintenance_schedule_vehicle_next_due "
+                   f"WHERE vehicle_id = ? AND next_due <= ? AND status = '{SCHEDULED}' ORDER BY next_due")
+            params = [vehicle_id, soon]
+        return self._query(sql, params)
+
+    def completed(self, vehicle_id=None, limit=None, offset=0):
+        """Return logged services, most recent first; ``limit`` and ``offset`` select one page of them.
+
+        Pages are read from an index in log order, so a page costs the same however long
+        the log is.
+        """
+        where, params = self._vehicle_clause(vehicle_id)
+        # A vehicle's log is read from its partial index, so the status is inlined
+        source = "maintenance" if vehicle_id is None else "maintenance INDEXED BY idx_maintenance_log_vehicle_last_service"
+        sql = (f"SELECT {_COLUMNS} FROM {source} WHERE status = '{COMPLETED}'{where} "
+               "ORDER BY last_service DESC, id DESC")
+        if limit is not None or offset:
+            sql += " LIMIT ? OFFSET ?"
+            params += [-1 if limit is None else int(limit), int(offset)]
+        return self._query(sql, params)
+
+    def count_completed(self, vehicle_id=None):
+        """Return the number of logged services."""
+        where, params = self._vehicle_clause(vehicle_id)
+        source = "maintenance" if vehicle_id is None else "maintenance INDEXED BY idx_maintenance_log_vehicle_last_service"
+        with self._connect() as conn:
+            return conn.execute(f"SELECT COUNT(*) FROM {source} WHERE status = '{COMPLETED}'{where}",
+                                params).fetchone()[0]
+
+    @staticmethod
+    def _vehicle_clause(vehicle_id):
+        if vehicle_id is None:
+            return "", []
+        return " AND vehicle_id = ?", [vehicle_id]
+
+    def _query(self, sql, params):
+        with self._connect() as conn:
+            return pd.read_sql_query(sql, conn, params=params)
@@ -1,37 +1,120 @@
 import os
 import json
-from openai import OpenAI
+import logging
+import httpx
+from openai import OpenAI, APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+from utils.json_stream import ArrayItemParser
+from utils.prompt_builder import build_maintenance_prompt, estimate_tokens
+from utils.resilience import ResilientCaller
+from utils.scheduler import INTERACTIVE, RateScheduler
+from utils.tip_engine import RULE_TIPS, rule_tips
+from utils.tips_cache import cache_key, get_tips_cache
+
+logger = logging.getLogger(__name__)
 
 # the newest OpenAI model is "gpt-4o" which was released May 13, 2024.
 # do not change this unless explicitly requested by the user
 MODEL = "gpt-4o"
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Fail fast on an unreachable provider; the page shows fallback tips instead of waiting
+CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "3"))
+READ_TIMEOUT = float(os.getenv("OPENAI_READ_TIMEOUT", "20"))
+MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+
+# Account rate limits; calls beyond them queue by priority or are shed to the fallback answers
+REQUESTS_PER_MINUTE = int(os.getenv("OPENAI_RPM", "500"))
+TOKENS_PER_MINUTE = int(os.getenv("OPENAI_TPM", "30000"))
+# Completion tokens assumed for a call until its usage is known
+COMPLETION_TOKENS_ESTIMATE = 300
+
+# Retries are left to the resilient caller, which budgets them and trips a circuit breaker
+# during outages; without an API key every call goes straight to the fallback answers
+client = OpenAI(
+    api_key=os.getenv("OPENAI_API_KEY"),
+    timeout=httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+    max_retries=0,
+) if os.getenv("OPENAI_API_KEY") else None
+
+caller = ResilientCaller(
+    "openai",
+    max_retries=MAX_RETRIES,
+    retry_on=(APIConnectionError, APITimeoutError, InternalServerError, RateLimitError),
+)
+
+scheduler = RateScheduler(REQUESTS_PER_MINUTE, TOKENS_PER_MINUTE, name="openai")
 
-def get_driving_tips(driving_data):
-    """Generate eco-driving tips based on driving behavior."""
+def create_chat_completion(priority=INTERACTIVE, **kwargs):
+    """Call the chat completions API with timeouts, budgeted retries and the circuit breaker.
+
+    The call first waits for rate budget at ``priority``; scheduler.LoadShedError is
+    raised if none comes in time.
+    """
+    if client is None:
+        raise RuntimeError("OPENAI_API_KEY is not set")
+    tokens = estimate_tokens(json.dumps(kwargs.get("messages", []))) + kwargs.get("max_tokens", COMPLETION_TOKENS_ESTIMATE)
+    ticket = scheduler.acquire(tokens, priority)
     try:
-        # Process the driving data into a more readable format
-        processed_data = {
-            "eco_score": [float(score) for score in driving_data.get('eco_score', {}).values()],
-            "fuel_consumption": [float(consumption) for consumption in driving_data.get('fuel_consumption', {}).values()],
-            "harsh_braking": [int(events) for events in driving_data.get('harsh_braking', {}).values()],
-            "rapid_acceleration": [int(events) for events in driving_data.get('rapid_acceleration', {}).values()],
-        }
-        
-        # Calculate averages for a cleaner prompt
-        avg_eco_score = sum(processed_data["eco_score"]) / len(processed_data["eco_score"]) if processed_data["eco_score"] else 0
-        avg_fuel_consumption = sum(processed_data["fuel_consumption"]) / len(processed_data["fuel_consumption"]) if processed_data["fuel_consumption"] else 0
-        total_harsh_braking = sum(processed_data["harsh_braking"])
-        total_rapid_acceleration = sum(processed_data["rapid_acceleration"])
-        
-        # Create a summarized version of the data
-        data_summary = {
-            "average_eco_score": round(avg_eco_score, 2),
-            "average_fuel_consumption": round(avg_fuel_consumption, 2),
-            "total_harsh_braking_events": total_harsh_braking,
-            "total_rapid_acceleration_events": total_rapid_acceleration
-        }
+        response = caller.call(client.chat.completions.create, **kwargs)
+    except RateLimitError as error:
+        # Retries didn't get through either; hold everyone back as long as the provider asks
+        scheduler.pause(_retry_after(error))
+        raise
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        scheduler.settle(ticket, usage.total_tokens)
+    return response
+
+def _retry_after(error, default=1.0):
+    try:
+        return float(error.response.headers.get("retry-after", default))
+    except (AttributeError, TypeError, ValueError):
+        return default
+
+def get_ai_health():
+    """Return whether the AI service is configured, its circuit state, error rate, latency percentiles and rate budget."""
+    return dict(caller.health(), configured=client is not None, scheduler=scheduler.snapshot())
+
+def summarize_driving_data(driving_data):
+    """Reduce recent driving data to the summary sent to the model.
+
+    Values are rounded to what a driver would notice (a whole eco-score point, 0.1 L/100km)
+    so near-identical weeks share a cache entry.
+    """
+    # Process the driving data into a more readable format
+    processed_data = {
+        "eco_score": [float(score) for score in driving_data.get('eco_score', {}).values()],
+        "fuel_consumption": [float(consumption) for consumption in driving_data.get('fuel_consumption', {}).values()],
+        "harsh_braking": [int(events) for events in driving_data.get('harsh_braking', {}).values()],
+        "rapid_acceleration": [int(events) for events in driving_data.get('rapid_acceleration', {}).values()],
+    }
+
+    # Calculate averages for a cleaner prompt
+    avg_eco_score = sum(processed_data["eco_score"]) / len(processed_data["eco_score"]) if processed_data["eco_score"] else 0
+    avg_fuel_consumption = sum(processed_data["fuel_consumption"]) / len(processed_data["fuel_consumption"]) if processed_data["fuel_consumption"] else 0
+
+    return {
+        "average_eco_score": round(avg_eco_score),
+        "average_fuel_consumption": round(avg_fuel_consumption, 1),
+        "total_harsh_braking_events": sum(processed_data["harsh_braking"]),
+        "total_rapid_acceleration_events": sum(processed_data["rapid_acceleration"])
+    }
+
+def get_driving_tips(driving_data, force_ai=False, priority=INTERACTIVE):
+    """Generate eco-driving tips based on driving behavior.
+
+    Common profiles get curated tips from the local rules; the model is asked only about
+    profiles the rules don't cover, or when ``force_ai`` is set; if that call fails or is
+    shed, the closest rule-based tips are returned instead. Model answers are cached
+    on disk by the summary sent to the model and concurrent requests for one summary are
+    coalesced, so every session and worker process with the same summary shares one call.
+    """
+    data_summary = None
+    try:
+        data_summary = summarize_driving_data(driving_data)
+        tips = None if force_ai else rule_tips(data_summary)
+        if tips is not None:
+            return json.dumps({"tips": tips, "source": "rules"})
+        key = driving_tips_key(data_summary)
         
         # Create the prompt with the summarized data
         prompt = f"""
@@ -44,58 +127,140 @@ def get_driving_tips(driving_data):
         Please provide 3 specific eco-driving tips that will help improve fuel efficiency and reduce emissions.
         """
         
-        response = client.chat.completions.create(
-            model=MODEL,
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are an eco-driving expert. Analyze the driving data and provide specific, actionable tips for improvement. Format your response as a JSON object with a 'tips' array containing 3 specific tips."
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            response_format={"type": "json_object"}
-        )
-        
-        return response.choices[0].message.content
+        def request_tips():
+            response = create_chat_completion(
+                priority=priority,
+                model=MODEL,
+                messages=[
+                    {
+                        "role": "system",
+                        "content": "You are an eco-driving expert. Analyze the driving data and provide specific, actionable tips for improvement. Format your response as a JSON object with a 'tips' array containing 3 specific tips."
+                    },
+                    {
+                        "role": "user",
+                        "content": prompt
+                    }
+                ],
+                response_format={"type": "json_object"}
+            )
+            return response.choices[0].message.content
+
+        # Identical summaries requested at the same time, in any worker process, share one call
+        return get_tips_cache().get_or_compute(key, request_tips)
     except Exception as e:
         # Return a default JSON response in case of an error
-        default_response = {
-            "tips": [
-                "Practice gradual acceleration to improve fuel efficiency.",
-                "Maintain a steady speed and avoid unnecessary braking.",
-                "Regular vehicle maintenance keeps your car running efficiently."
-            ]
-        }
+        tips = rule_tips(data_summary, best_effort=True) if data_summary is not None else RULE_TIPS['general']
+        default_response = {"tips": tips}
         return json.dumps(default_response)
 
-def analyze_maintenance_needs(vehicle_data):
-    """Analyze vehicle data and suggest maintenance actions."""
+def driving_tips_key(data_summary):
+    """Return the tips cache key of the model's tips for a ``summarize_driving_data`` summary."""
+    return cache_key({"driving_tips": data_summary}, MODEL)
+
+# Shown when the maintenance analysis can't be generated
+MAINTENANCE_FALLBACK = {
+    "recommendations": [
+        "Check tire pressure and inflate to recommended levels.",
+        "Consider scheduling an oil change in the next 30 days.",
+        "Inspect air filters and replace if dirty."
+    ]
+}
+
+def _maintenance_messages(vehicle_data, log=True):
+    prompt, tokens, included = build_maintenance_prompt(vehicle_data)
+    if log:
+        logger.info("Maintenance analysis prompt: ~%d tokens, %d of %d items",
+                    tokens, included, len(vehicle_data.get('items', [])))
+    return [
+        {
+            "role": "system",
+            "content": "You are a vehicle maintenance expert. Analyze the vehicle data and suggest maintenance actions. Format your response as a JSON object with a 'recommendations' array of short actions and an 'urgent_items' array of anything that needs attention now (empty if nothing does)."
+        },
+        {
+            "role": "user",
+            "content": prompt
+        }
+    ]
+
+def maintenance_analysis_key(vehicle_data):
+    """Return the tips cache key of the analysis of ``vehicle_data``, shared by the streamed and whole answers."""
+    return _maintenance_key(_maintenance_messages(vehicle_data, log=False))
+
+def _maintenance_key(messages):
+    # Keyed by the rendered prompt, so identical requests share one call and its cached answer
+    return cache_key({"maintenance_analysis": messages}, MODEL)
+
+def analyze_maintenance_needs(vehicle_data, priority=INTERACTIVE):
+    """Analyze vehicle data and suggest maintenance actions.
+
+    ``vehicle_data`` is a ``prompt_builder.maintenance_context``; it is rendered within
+    the prompt token budget, most urgent items first.
+    """
     try:
-        response = client.chat.completions.create(
-            model=MODEL,
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a vehicle maintenance expert. Analyze the vehicle data and suggest maintenance actions."
-                },
-                {
-                    "role": "user",
-                    "content": f"Based on this vehicle data, what maintenance is needed: {vehicle_data}"
-                }
-            ],
-            response_format={"type": "json_object"}
-        )
-        return response.choices[0].message.content
+        messages = _maintenance_messages(vehicle_data)
+
+        def request_analysis():
+            response = create_chat_completion(
+                priority=priority,
+                model=MODEL,
+                messages=messages,
+                response_format={"type": "json_object"}
+            )
+            return response.choices[0].message.content
+
+        return get_tips_cache().get_or_compute(_maintenance_key(messages), request_analysis)
     except Exception as e:
         # Return a default JSON response in case of an error
-        default_response = {
-            "maintenance_actions": [
-                "Check tire pressure and inflate to recommended levels.",
-                "Consider scheduling an oil change in the next 30 days.",
-                "Inspect air filters and replace if dirty."
-            ]
-        }
-        return json.dumps(default_response)
+        return json.dumps(MAINTENANCE_FALLBACK)
+
+def stream_maintenance_analysis(vehicle_data, priority=INTERACTIVE):
+    """Yield ``(key, item)`` pairs of the maintenance analysis as the model writes them.
+
+    Keys are 'recommendations' and 'urgent_items', as in ``analyze_maintenance_needs``,
+    but each item arrives as soon as it is complete rather than with the whole answer.
+    If the request fails before any item arrived the fallback recommendations are
+    yielded instead; a stream cut off later just ends.
+
+    Answers share the tips cache with ``analyze_maintenance_needs``: a cached (e.g.
+    pre-warmed) analysis is yielded at once, and a completed stream is stored for next time.
+    The stream holds the key's lease, so concurrent identical requests make one upstream call.
+    """
+    produced = False
+    try:
+        messages = _maintenance_messages(vehicle_data)
+        key = _maintenance_key(messages)
+        cached = get_tips_cache().get(key)
+        if cached is not None:
+            yield from ArrayItemParser().feed(cached)
+            return
+        # Like get_or_compute: identical analyses requested meanwhile, in this or another
+        # process, wait on the key's lease and replay this stream's answer from the cache
+        with get_tips_cache().lease(key) as cached:
+            if cached is not None:
+                yield from ArrayItemParser().feed(cached)
+                return
+            stream = create_chat_completion(
+                priority=priority,
+                model=MODEL,
+                messages=messages,
+                response_format={"type": "json_object"},
+                stream=True
+            )
+            parser = ArrayItemParser()
+            answer = []
+            for chunk in stream:
+                text = chunk.choices[0].delta.content if chunk.choices else None
+                if text:
+                    answer.append(text)
+                    for item in parser.feed(text):
+                        produced = True
+                        yield item
+            answer = "".join(answer)
+            json.loads(answer)  # only complete answers are cached
+            get_tips_cache().set(key, answer)
+    except Exception as e:
+        if produced:
+            logger.warning("Maintenance analysis stream ended early: %s", e)
+            return
+        for item in MAINTENANCE_FALLBACK["recommendations"]:
+            yield "recommendations", item
@@ -0,0 +1,258 @@
+import argparse
+import itertools
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from utils.prompt_builder import estimate_tokens
+
+# Answers served when no recording matches: one per prompt the app sends, chosen by a
+# keyword of the system message
+DEFAULT_RECORDINGS = [
+    {
+        'match': 'eco-driving expert',
+        'content': {'tips': [
+            "Anticipate traffic ahead and lift off early instead of braking hard.",
+            "Accelerate gently and shift up early to keep the engine in its efficient range.",
+            "Hold a steady speed on open roads; cruise control helps on motorways.",
+        ]},
+    },
+    {
+        'match': 'maintenance expert',
+        'content': {
+            'recommendations': [
+                "Check tire pressure monthly; under-inflated tires raise consumption.",
+                "Keep to the oil change interval for your engine.",
+            ],
+            'urgent_items': ["Brake service is overdue."],
+        },
+    },
+]
+
+
+def load_recordings(path):
+    """Read recorded answers from a JSON Lines file of ``{"match": ..., "content": ...}`` objects.
+
+    ``match`` is a substring of the request's messages (omit it to match any request)
+    and ``content`` is the assistant message, as a string or as a JSON object.
+    """
+    with open(path, encoding='utf-8') as lines:
+        return [json.loads(line) for line in lines if line.strip()]
+
+
+class StubState:
+    """Recordings, fault settings and counters shared by every request to one stub server."""
+
+    def __init__(self, recordings=None, latency=0.0, jitter=0.0, error_rate=0.0, rate_limit_rate=0.0,
+                 rpm=None, seed=None, chunk_delay=0.0, chunk_chars=16):
+        self.recordings = list(recordings or []) + DEFAULT_RECORDINGS
+        self.latency = latency
+        self.chunk_delay = chunk_delay
+        self.chunk_chars = chunk_chars
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.rpm = rpm
+        self._rng = random.Random(seed)
+        self._cycles = {}
+        self._window = []
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def content_for(self, request):
+        """Return the recorded answer for a request, cycling through all recordings that match it."""
+        text = json.dumps(request.get('messages', []))
+        matches = tuple(index for index, recording in enumerate(self.recordings)
+                        if recording.get('match', '') in text)
+        if not matches:
+            return json.dumps({})
+        with self._lock:
+            cycle = self._cycles.setdefault(matches, itertools.cycle(matches))
+            content = self.recordings[next(cycle)]['content']
+        return content if isinstance(content, str) else json.dumps(content)
+
+    def fault(self):
+        """Pick the response status for the next request: 200, or an injected 429 or 500."""
+        now = time.monotonic()
+        with self._lock:
+            roll = self._rng.random()
+            if self.rpm is not None:
+                self._window = [started for started in self._window if now - started < 60]
+                if len(self._window) >= self.rpm:
+                    return 429
+                self._window.append(now)
+            if roll < self.rate_limit_rate:
+                return 429
+            if roll < self.rate_limit_rate + self.error_rate:
+                return 500
+            return 200
+
+    def delay(self):
+        with self._lock:
+            return max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter))
+
+    def count(self, status):
+        with self._lock:
+            self._counts[status] = self._counts.get(status, 0) + 1
+
+    def stats(self):
+        with self._lock:
+            counts = {str(status): count for status, count in sorted(self._counts.items())}
+        return {'requests': sum(counts.values()), 'by_status': counts}
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+            self._window.clear()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Chat-completions endpoint; ``GET /stats`` reports request counts and ``POST /reset`` clears them."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/stats':
+            return self._send(200, self.server.state.stats())
+        self._send(404, _error("Not found", 'invalid_request_error'))
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('content-length', 0)))
+        state = self.server.state
+        if self.path.rstrip('/') == '/reset':
+            state.reset()
+            return self._send(200, state.stats())
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            return self._send(404, _error("Not found", 'invalid_request_error'))
+
+        request = json.loads(body or b'{}')
+        time.sleep(state.delay())
+        status = state.fault()
+        state.count(status)
+        if status == 429:
+            return self._send(429, _error("Rate limit reached (stub)", 'rate_limit_exceeded'), {'retry-after': '1'})
+        if status == 500:
+            return self._send(500, _error("The server had an error (stub)", 'server_error'))
+
+        content = state.content_for(request)
+        if request.get('stream'):
+            return self._stream(request, content)
+        # A whole answer takes as long to generate as its streamed chunks
+        time.sleep(state.chunk_delay * -(-len(content) // state.chunk_chars))
+        prompt_tokens = estimate_tokens(json.dumps(request.get('messages', [])))
+        completion_tokens = estimate_tokens(content)
+        self._send(200, {
+            'id': f"chatcmpl-stub-{time.time_ns()}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': request.get('model', 'stub'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content},
+                'finish_reason': 'stop',
+            }],
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'total_tokens': prompt_tokens + completion_tokens,
+            },
+        })
+
+    def _stream(self, request, content):
+        """Send ``content`` as server-sent chat completion chunks, ``chunk_chars`` at a time."""
+        state = self.server.state
+        self.send_response(200)
+        self.send_header('content-type', 'text/event-stream')
+        self.send_header('connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+        chunk_id = f"chatcmpl-stub-{time.time_ns()}"
+
+        def event(delta, finish_reason=None):
+            payload = {
+                'id': chunk_id,
+                'object': 'chat.completion.chunk',
+                'created': int(time.time()),
+                'model': request.get('model', 'stub'),
+                'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}],
+            }
+            self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode('utf-8'))
+            self.wfile.flush()
+
+        event({'role': 'assistant', 'content': ''})
+        for start in range(0, len(content), state.chunk_chars):
+            time.sleep(state.chunk_delay)
+            event({'content': content[start:start + state.chunk_chars]})
+        event({}, 'stop')
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def _send(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('content-type', 'application/json')
+        self.send_header('content-length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _error(message, code):
+    return {'error': {'message': message, 'type': code, 'param': None, 'code': code}}
+
+
+def make_server(state=None, host='127.0.0.1', port=0):
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    server.state = state or StubState()
+    return server
+
+
+def start_stub(state=None, host='127.0.0.1', port=0):
+    """Serve the stub from a daemon thread and return the server; its base URL is ``base_url(server)``."""
+    server = make_server(state, host, port)
+    threading.Thread(target=server.serve_forever, name='openai-stub', daemon=True).start()
+    return server
+
+
+def base_url(server):
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}/v1"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a local stand-in for the OpenAI chat completions API.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--recordings', help="JSON Lines file of recorded answers to replay")
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds before each answer")
+    parser.add_argument('--jitter', type=float, default=0.0, help="uniform +/- seconds added to the latency")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="share of requests answered with a 500")
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help="share of requests answered with a 429")
+    parser.add_argument('--rpm', type=int, help="answer 429 beyond this many requests per minute")
+    parser.add_argument('--seed', type=int, help="seed the fault and jitter draws")
+    parser.add_argument('--chunk-delay', type=float, default=0.0, help="seconds between streamed chunks")
+    parser.add_argument('--chunk-chars', type=int, default=16, help="characters per streamed chunk")
+    args = parser.parse_args(argv)
+
+    state = StubState(load_recordings(args.recordings) if args.recordings else None, latency=args.latency,
+                      jitter=args.jitter, error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate,
+                      rpm=args.rpm, seed=args.seed, chunk_delay=args.chunk_delay, chunk_chars=args.chunk_chars)
+    server = make_server(state, args.host, args.port)
+    print(f"Serving the OpenAI stub at {base_url(server)}; point the app at it with "
+          f"OPENAI_BASE_URL={base_url(server)} OPENAI_API_KEY=stub")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,166 @@
+import argparse
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+logger = logging.getLogger(__name__)
+
+# Model calls a pre-warm run makes at once; they also queue behind interactive calls for rate budget
+PREWARM_CONCURRENCY = 2
+# Cost cap of one run: answers beyond this many model calls are left for the page to request
+PREWARM_MAX_CALLS = 50
+# The driving analysis page asks for tips about the last entries of its 30-day window
+TIPS_WINDOW_DAYS = 30
+TIPS_RECENT_ENTRIES = 7
+
+_executor = None
+_queued = set()
+_lock = threading.Lock()
+
+
+def schedule_prewarm(vehicle_ids):
+    """Pre-warm the AI answers of ``vehicle_ids`` (``None``: the fleet view) in the background.
+
+    Called when trips or services are recorded. Runs happen one at a time and vehicles
+    already waiting for the next run are not queued twice, so a burst of writes costs
+    one pass. Does nothing when the AI service isn't configured.
+    """
+    from utils.openai_helper import client
+
+    if client is None:
+        return
+    global _executor
+    with _lock:
+        new = [vehicle_id for vehicle_id in dict.fromkeys(vehicle_ids) if vehicle_id not in _queued]
+        if not new:
+            return
+        _queued.update(new)
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='ecodrive-prewarm')
+        _executor.submit(_run_queued)
+
+
+def _run_queued():
+    with _lock:
+        vehicle_ids = list(_queued)
+        _queued.clear()
+    if not vehicle_ids:
+        return
+    try:
+        prewarm(vehicle_ids)
+    except Exception:
+        logger.exception("Pre-warming AI answers for %d vehicles failed", len(vehicle_ids))
+
+
+def prewarm(vehicle_ids, max_calls=PREWARM_MAX_CALLS, concurrency=PREWARM_CONCURRENCY, today=None):
+    """Compute and cache the driving tips and maintenance analysis the pages will ask for.
+
+    The inputs are built exactly as the driving analysis and maintenance pages build
+    them, so their next load hits the tips cache. Answers already cached and tips the
+    local rules cover are skipped; the remaining calls run at background priority,
+    ``concurrency`` at a time, and at most ``max_calls`` of them per run.
+    Returns counts of answers already warm, left to the rules, requested, and left over the cap.
+    """
+    from utils.tips_cache import get_tips_cache
+    from utils.openai_helper import (analyze_maintenance_needs, driving_tips_key, get_driving_tips,
+                                     maintenance_analysis_key, summarize_driving_data)
+    from utils.scheduler import BACKGROUND
+    from utils.tip_engine import rule_tips
+
+    cache = get_tips_cache()
+    counts = {'warm': 0, 'rules': 0, 'requested': 0, 'over_cap': 0}
+    calls = []
+    for vehicle_id in vehicle_ids:
+        recent = _recent_driving(vehicle_id, today)
+        if recent is not None:
+            summary = summarize_driving_data(recent)
+            if rule_tips(summary) is not None:
+                counts['rules'] += 1
+            elif cache.contains(driving_tips_key(summary)):
+                counts['warm'] += 1
+            else:
+                calls.append((get_driving_tips, recent))
+        context = _maintenance_context(vehicle_id)
+        if context['items']:
+            if cache.contains(maintenance_analysis_key(context)):
+                counts['warm'] += 1
+            else:
+                calls.append((analyze_maintenance_needs, context))
+
+    counts['over_cap'] = max(0, len(calls) - max_calls)
+    calls = calls[:max_calls]
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='ecodrive-prewarm-call') as pool:
+        for fn, payload in calls:
+            pool.submit(fn, payload, priority=BACKGROUND)
+    counts['requested'] = len(calls)
+    if counts['over_cap']:
+        logger.warning("Pre-warm run hit its cap of %d model calls; %d answers left cold",
+                       max_calls, counts['over_cap'])
+    logger.info("Pre-warmed AI answers for %d vehicles: %s", len(vehicle_ids), counts)
+    return counts
+
+
+def _recent_driving(vehicle_id, today=None):
+    """Return the driving data the driving analysis page summarizes for tips, or None without recent trips."""
+    from utils.data_manager import DataManager
+
+    today = today or date.today()
+    start = today - timedelta(days=TIPS_WINDOW_DAYS - 1)
+    if vehicle_id is None:
+        history = DataManager.get_fleet_daily_summary(start=start, end=today)
+    else:
+        history = DataManager.get_driving_history(start=start, end=today, vehicle_id=vehicle_id)
+    if history.empty:
+        return None
+    return history.tail(TIPS_RECENT_ENTRIES).to_dict()
+
+
+def _maintenance_context(vehicle_id):
+    """Return the context the maintenance page sends for analysis before a mileage is entered."""
+    from utils.data_manager import DataManager
+    from utils.prompt_builder import DEFAULT_VEHICLE_AGE, maintenance_context
+
+    return maintenance_context(DataManager.get_maintenance_schedule(vehicle_id),
+                               DataManager.get_completed_maintenance(vehicle_id),
+                               vehicle_age=DEFAULT_VEHICLE_AGE)
+
+
+def active_vehicles(days, today=None):
+    """Return the vehicles with trips in the last ``days`` days."""
+    from utils.data_manager import DataManager
+
+    today = today or date.today()
+    trips = DataManager.get_fleet_history(start=today - timedelta(days=days - 1), end=today, columns=['date'])
+    return sorted(trips['vehicle_id'].unique())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-compute the AI tips and maintenance analyses of active "
+                                                 "vehicles into the tips cache.")
+    parser.add_argument('--vehicles', nargs='*', help="vehicle ids to warm (default: those active recently)")
+    parser.add_argument('--active-days', type=int, default=7, help="days without trips before a vehicle is skipped")
+    parser.add_argument('--fleet', action='store_true', help="also warm the fleet-wide views")
+    parser.add_argument('--max-calls', type=int, default=PREWARM_MAX_CALLS, help="cost cap: model calls in this run")
+    parser.add_argument('--concurrency', type=int, default=PREWARM_CONCURRENCY)
+    parser.add_argument('--data-dir', help="read app data from here instead of ECODRIVE_DATA_DIR")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    if args.data_dir:
+        # Must be set before utils.data_manager is imported
+        os.environ['ECODRIVE_DATA_DIR'] = os.path.abspath(args.data_dir)
+    started = time.perf_counter()
+    vehicle_ids = list(args.vehicles) if args.vehicles else active_vehicles(args.active_days)
+    if args.fleet:
+        vehicle_ids.append(None)
+    counts = prewarm(vehicle_ids, max_calls=args.max_calls, concurrency=args.concurrency)
+    print(f"Warmed {len(vehicle_ids):,} views in {time.perf_counter() - started:.1f}s: {counts['requested']} requested, "
+          f"{counts['warm']} already cached, {counts['rules']} answered by the rules, {counts['over_cap']} over the cap.")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
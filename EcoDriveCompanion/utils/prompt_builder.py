@@ -0,0 +1,127 @@
+from datetime import date
+
+import pandas as pd
+
+# Budget for the maintenance analysis prompt; the most urgent items are kept when it runs out
+MAINTENANCE_PROMPT_TOKENS = 600
+# Converts distance past due into days past due when ranking urgency
+TYPICAL_DAILY_KM = 40
+# Services per item used to judge whether it is being serviced early or late
+TREND_SERVICES = 5
+# Vehicle age given to the analysis until the fleet registry records model years
+DEFAULT_VEHICLE_AGE = 3
+
+
+def estimate_tokens(text):
+    """Rough token count of ``text``: about four characters per token for English prose and JSON."""
+    return max(1, len(text) // 4)
+
+
+def maintenance_context(schedule, history=None, current_mileage=None, vehicle_age=None, today=None):
+    """Condense a maintenance schedule and service log into what the analysis prompt needs.
+
+    Returns one compact entry per (vehicle, item): when it was last serviced, how far it
+    is from (or past) its due date and mileage, how often it has been serviced and
+    whether services are drifting early or late. Entries are ordered most urgent first,
+    so however long the history is, the prompt can be cut to a budget from the end.
+    """
+    today = pd.Timestamp(today or date.today()).normalize()
+    services = _service_stats(history)
+    fleet = schedule['vehicle_id'].nunique() > 1 if 'vehicle_id' in schedule else False
+
+    items = []
+    for row in schedule.to_dict('records'):
+        last_service = pd.Timestamp(row['last_service'])
+        next_due = pd.Timestamp(row['next_due'])
+        stats = services.get((row.get('vehicle_id'), row['item']), {})
+        interval_days = (next_due - last_service).days
+        entry = {
+            'item': row['item'],
+            'last_service': last_service.date().isoformat(),
+            'days_overdue': int((today - next_due).days),  # negative while not yet due
+            'interval_km': int(row['interval_km']),
+            'services': stats.get('services', 0),
+            'trend': _trend(stats.get('mean_gap_days'), interval_days),
+        }
+        # The mileage reading belongs to one vehicle, so it can't place a fleet's items
+        if not fleet and current_mileage is not None and stats.get('last_mileage') is not None:
+            entry['km_overdue'] = int(current_mileage - stats['last_mileage'] - row['interval_km'])
+        if fleet:
+            entry['vehicle_id'] = row['vehicle_id']
+        items.append(entry)
+
+    items.sort(key=lambda entry: max(entry['days_overdue'], entry.get('km_overdue', -10 ** 9) / TYPICAL_DAILY_KM),
+               reverse=True)
+    return {'current_mileage': current_mileage, 'vehicle_age': vehicle_age, 'items': items}
+
+
+def build_maintenance_prompt(context, max_tokens=MAINTENANCE_PROMPT_TOKENS):
+    """Render a ``maintenance_context`` as prompt text within ``max_tokens``.
+
+    Returns ``(prompt, estimated_tokens, items_included)``. Items beyond the budget are
+    left out, least urgent first, and counted in a closing line so the model knows.
+    """
+    header = ["Vehicle maintenance status (days_overdue and km_overdue are negative while an item is not yet due):"]
+    if context.get('current_mileage'):
+        header.append(f"- Current mileage: {context['current_mileage']} km")
+    if context.get('vehicle_age'):
+        header.append(f"- Vehicle age: {context['vehicle_age']} years")
+    header.append("Items, most urgent first:")
+
+    lines = list(header)
+    used = estimate_tokens("\n".join(lines))
+    items = context.get('items', [])
+    # Leave room for the line that says how many items were dropped
+    reserve = estimate_tokens(f"- ... {len(items)} more items, all less urgent than those listed")
+    included = 0
+    for entry in items:
+        line = _item_line(entry)
+        cost = estimate_tokens(line) + 1
+        if used + cost + (reserve if included < len(items) - 1 else 0) > max_tokens:
+            break
+        lines.append(line)
+        used += cost
+        included += 1
+    if included < len(items):
+        lines.append(f"- ... {len(items) - included} more items, all less urgent than those listed")
+    prompt = "\n".join(lines)
+    return prompt, estimate_tokens(prompt), included
+
+
+def _item_line(entry):
+    label = f"{entry['vehicle_id']} {entry['item']}" if 'vehicle_id' in entry else entry['item']
+    parts = [f"last {entry['last_service']}", f"days_overdue {entry['days_overdue']}"]
+    if 'km_overdue' in entry:
+        parts.append(f"km_overdue {entry['km_overdue']}")
+    parts += [f"every {entry['interval_km']} km", f"{entry['services']} service{'' if entry['services'] == 1 else 's'}",
+              entry['trend']]
+    return f"- {label}: {', '.join(parts)}"
+
+
+def _service_stats(history):
+    """Return {(vehicle_id, item): {'services', 'last_mileage', 'mean_gap_days'}} from a service log."""
+    if history is None or history.empty:
+        return {}
+    history = history.assign(last_service=pd.to_datetime(history['last_service']))
+    history = history.sort_values(['vehicle_id', 'item', 'last_service'], kind='stable')
+    keys = ['vehicle_id', 'item']
+    counts = history.groupby(keys, sort=False).size()
+    recent = history.groupby(keys, sort=False).tail(TREND_SERVICES + 1)
+    gaps = recent.assign(gap=recent.groupby(keys, sort=False)['last_service'].diff().dt.days)
+    gaps = gaps.groupby(keys, sort=False)['gap'].mean()
+    last_mileage = history.drop_duplicates(keys, keep='last').set_index(keys)['mileage']
+    return {key: {
+        'services': int(counts[key]),
+        'last_mileage': None if pd.isna(last_mileage[key]) else float(last_mileage[key]),
+        'mean_gap_days': None if pd.isna(gaps[key]) else float(gaps[key]),
+    } for key in counts.index}
+
+
+def _trend(mean_gap_days, interval_days):
+    if mean_gap_days is None:
+        return "first service"
+    if mean_gap_days > 1.1 * interval_days:
+        return f"serviced late (every {mean_gap_days:.0f}d vs {interval_days}d)"
+    if mean_gap_days < 0.9 * interval_days:
+        return f"serviced early (every {mean_gap_days:.0f}d vs {interval_days}d)"
+    return "on schedule"
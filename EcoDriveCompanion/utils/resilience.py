@@ -0,0 +1,209 @@
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling an upstream the circuit breaker considers unhealthy."""
+
+
+class CircuitBreaker:
+    """Stop calling an upstream after repeated failures and probe it again after a cool-down.
+
+    After ``failure_threshold`` consecutive failures the breaker opens and callers fail
+    fast for ``reset_timeout`` seconds. Then one probe call is let through: success
+    closes the breaker, failure opens it for another ``reset_timeout``.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, name='upstream'):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.name = name
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return HALF_OPEN
+            return self._state
+
+    def allow(self):
+        """Return True if a call may go upstream now."""
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN and time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            # Cool-down is over: let exactly one probe through
+            if self._probing:
+                return False
+            self._state = HALF_OPEN
+            self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            if self._state != CLOSED:
+                logger.info("Circuit for %s closed; upstream recovered", self.name)
+            self._state = CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    logger.warning("Circuit for %s opened after %d consecutive failures", self.name, self._failures)
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+
+
+class RetryBudget:
+    """Allow retries only up to a fraction of recent requests, so outages don't multiply load.
+
+    Every request deposits ``ratio`` tokens (up to ``max_tokens``) and every retry
+    spends one; ``min_tokens`` keeps a few retries available at low traffic.
+    """
+
+    def __init__(self, ratio=0.2, min_tokens=3.0, max_tokens=10.0):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self._tokens = min_tokens
+        self._lock = threading.Lock()
+
+    def record_request(self):
+        with self._lock:
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def try_spend(self):
+        with self._lock:
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+
+class CallStats:
+    """Rolling counters and latency percentiles for calls to one upstream."""
+
+    def __init__(self, window=500):
+        self._latencies = deque(maxlen=window)
+        self._counts = {'calls': 0, 'successes': 0, 'failures': 0, 'retries': 0, 'short_circuited': 0}
+        self._last_error = None
+        self._lock = threading.Lock()
+
+    def record(self, outcome, latency=None, error=None):
+        with self._lock:
+            self._counts[outcome] += 1
+            if outcome in ('successes', 'failures'):
+                self._counts['calls'] += 1
+            if latency is not None:
+                self._latencies.append(latency)
+            if error is not None:
+                self._last_error = f"{type(error).__name__}: {error}"
+
+    def snapshot(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            snapshot = dict(self._counts, last_error=self._last_error)
+        for name, quantile in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99)):
+            snapshot[f'latency_{name}'] = latencies[min(len(latencies) - 1, int(quantile * len(latencies)))] \
+                if latencies else None
+        calls = snapshot['calls']
+        snapshot['error_rate'] = snapshot['failures'] / calls if calls else 0.0
+        return snapshot
+
+
+def backoff_delay(attempt, base=0.25, cap=4.0):
+    """Full-jitter exponential backoff for retry ``attempt`` (0-based), in seconds."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key into one execution whose outcome they all share."""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, *args, **kwargs):
+        """Return ``fn(*args, **kwargs)``, or wait for the identical call already running and share its outcome.
+
+        Returns ``(result, shared)`` where ``shared`` is True for callers that waited.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+        if not leader:
+            return future.result(), True
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as error:
+            future.set_exception(error)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+class ResilientCaller:
+    """Run upstream calls behind a circuit breaker, with budgeted, jittered retries and stats."""
+
+    def __init__(self, name, max_retries=2, retry_on=(Exception,), breaker=None, budget=None, stats=None):
+        self.name = name
+        self.max_retries = max_retries
+        self.retry_on = retry_on
+        self.breaker = breaker or CircuitBreaker(name=name)
+        self.budget = budget or RetryBudget()
+        self.stats = stats or CallStats()
+
+    def call(self, fn, *args, **kwargs):
+        """Return ``fn(*args, **kwargs)``; raises CircuitOpenError without calling it while the upstream is down."""
+        if not self.breaker.allow():
+            self.stats.record('short_circuited')
+            raise CircuitOpenError(f"{self.name} is unavailable; serving fallback")
+        self.budget.record_request()
+        attempt = 0
+        while True:
+            started = time.monotonic()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as error:
+                self.stats.record('failures', time.monotonic() - started, error)
+                self.breaker.record_failure()
+                retryable = isinstance(error, self.retry_on)
+                if (not retryable or attempt >= self.max_retries or not self.breaker.allow()
+                        or not self.budget.try_spend()):
+                    raise
+                self.stats.record('retries')
+                time.sleep(backoff_delay(attempt))
+                attempt += 1
+                continue
+            self.stats.record('successes', time.monotonic() - started)
+            self.breaker.record_success()
+            return result
+
+    def health(self):
+        """Return the breaker state and call statistics, for dashboards and alerts."""
+        return dict(self.stats.snapshot(), name=self.name, circuit=self.breaker.state)
@@ -0,0 +1,216 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from utils.emissions import calculate_emissions
+from utils.locks import file_lock
+
+# Rollup granularities and the pandas period used to bucket trips into them
+GRANULARITIES = {
+    'daily': 'D',
+    'weekly': 'W',
+    'monthly': 'M',
+}
+
+# Additive columns kept per vehicle and period; averages are derived from them on read
+KEY_COLUMNS = ['vehicle_id', 'date']
+SUM_COLUMNS = ['emissions', 'distance', 'fuel_used', 'trips']
+
+
+def aggregate_trips(trips, freq, fuel_type_of):
+    """Reduce trips to additive sums keyed by vehicle and period start.
+
+    ``fuel_type_of`` maps a vehicle id to its fuel type; it is called once per vehicle.
+    """
+    if trips.empty:
+        return EmissionsRollup._empty()
+    dates = pd.to_datetime(trips['date'])
+    vehicle_ids = trips['vehicle_id'].astype('category')
+    fuel_types = np.asarray([fuel_type_of(vehicle_id) for vehicle_id in vehicle_ids.cat.categories] or ['petrol'])
+    distance = trips['distance'].to_numpy(dtype=float)
+    consumption = trips['fuel_consumption'].to_numpy(dtype=float)
+    frame = pd.DataFrame({
+        'vehicle_id': vehicle_ids.astype(str).to_numpy(),
+        'date': dates.dt.to_period(freq).dt.start_time.to_numpy(),
+        'emissions': calculate_emissions(distance, consumption, fuel_types[vehicle_ids.cat.codes]),
+        'distance': distance,
+        'fuel_used': distance * consumption / 100,
+        'trips': np.ones(len(trips), dtype=np.int64),
+    })
+    return _sum_by_key(frame)
+
+
+def _sum_by_key(frame):
+    return frame.groupby(KEY_COLUMNS, as_index=False, sort=True)[SUM_COLUMNS].sum()
+
+
+class EmissionsRollup:
+    """Daily, weekly and monthly emissions totals kept up to date as trips are appended.
+
+    Each granularity is a small Parquet file of per-vehicle, per-period sums, so reading
+    the carbon page costs O(vehicles x periods) no matter how many trips are stored.
+    """
+
+    def __init__(self, root, fuel_type_of=None):
+        self.root = root
+        self.fuel_type_of = fuel_type_of or (lambda vehicle_id: 'petrol')
+
+    def is_empty(self):
+        return not os.path.exists(self._path('monthly'))
+
+    def is_complete(self):
+        """Return True once the rollups have been built from the full trip history."""
+        return os.path.exists(self._complete_path())
+
+    def ensure_complete(self, trip_store):
+        """Build the rollups from the full trip history unless that has been done already.
+
+        Call it before appending trips that ``update`` will fold in, so a store written
+        before the rollups existed isn't summed from its new trips only.
+        """
+        if self.is_complete():
+            return
+        with file_lock(self._lock_path()):
+            if not self.is_complete():
+                self._rebuild(trip_store)
+
+    def update(self, trips):
+        """Fold newly appended trips into every granularity.
+
+        The read-merge-write is done under the rollups' file lock, so concurrent updates
+        from other sessions or processes can't overwrite each other's totals.
+        """
+        if trips.empty:
+            return
+        new_totals = {granularity: aggregate_trips(trips, freq, self.fuel_type_of)
+                      for granularity, freq in GRANULARITIES.items()}
+        with file_lock(self._lock_path()):
+            for granularity, totals in new_totals.items():
+                merged = pd.concat([self._read(granularity), totals], ignore_index=True)
+                self._write(granularity, _sum_by_key(merged))
+
+    def rebuild(self, trip_store):
+        """Recompute every granularity from the full trip history."""
+        with file_lock(self._lock_path()):
+            self._rebuild(trip_store)
+
+    def _rebuild(self, trip_store):
+        if self.is_complete():
+            os.remove(self._complete_path())
+        for granularity, totals in self._recompute(trip_store).items():
+            self._write(granularity, totals)
+        open(self._complete_path(), 'w').close()
+
+    def check(self, trip_store, rtol=1e-9):
+        """Compare stored rollups with a full recompute; returns {granularity: mismatched periods}."""
+        mismatches = {}
+        for granularity, expected in self._recompute(trip_store).items():
+            stored = self._read(granularity)
+            joined = expected.merge(stored, on=KEY_COLUMNS, how='outer', suffixes=('_expected', '_stored'),
+                                    indicator=True)
+            bad = joined['_merge'] != 'both'
+            for column in SUM_COLUMNS:
+                bad |= ~np.isclose(joined[f'{column}_expected'].astype(float), joined[f'{column}_stored'].astype(float),
+                                   rtol=rtol, equal_nan=False)
+            mismatches[granularity] = list(joined.loc[bad, KEY_COLUMNS].itertuples(index=False, name=None))
+        return mismatches
+
+    def load(self, granularity='monthly', start=None, end=None, vehicle_id=None):
+        """Return per-period emissions, distance and distance-weighted average consumption.
+
+        ``vehicle_id`` is a single id or a list of ids; ``None`` totals the whole fleet.
+        """
+        totals = self._read(granularity)
+        if vehicle_id is not None:
+            ids = [vehicle_id] if isinstance(vehicle_id, str) else list(vehicle_id)
+            totals = totals[totals['vehicle_id'].isin(ids)]
+        if start is not None:
+            totals = totals[totals['date'] >= pd.Timestamp(start)]
+        if end is not None:
+            totals = totals[totals['date'] <= pd.Timestamp(end)]
+        totals = totals.groupby('date', as_index=False, sort=True)[SUM_COLUMNS].sum()
+        distance = totals['distance'].to_numpy(dtype=float)
+        average_consumption = np.divide(totals['fuel_used'].to_numpy(dtype=float) * 100, distance,
+                                        out=np.zeros_like(distance), where=distance > 0)
+        return pd.DataFrame({
+            'date': totals['date'].to_numpy(),
+            'emissions': totals['emissions'].to_numpy(dtype=float),
+            'distance': distance,
+            'average_consumption': average_consumption,
+        })
+
+    def _recompute(self, trip_store):
+        partials = {granularity: [] for granularity in GRANULARITIES}
+        for trips in trip_store.scan(columns=['vehicle_id', 'date', 'distance', 'fuel_consumption']):
+            for granularity, freq in GRANULARITIES.items():
+                partials[granularity].append(aggregate_trips(trips, freq, self.fuel_type_of))
+        totals = {}
+        for granularity, frames in partials.items():
+            if frames:
+                totals[granularity] = _sum_by_key(pd.concat(frames, ignore_index=True))
+            else:
+                totals[granularity] = self._empty()
+        return totals
+
+    def _path(self, granularity):
+        return os.path.join(self.root, f"{granularity}.parquet")
+
+    def _lock_path(self):
+        return os.path.join(self.root, ".lock")
+
+    def _complete_path(self):
+        return os.path.join(self.root, "complete")
+
+    def _read(self, granularity):
+        path = self._path(granularity)
+        if not os.path.exists(path):
+            return self._empty()
+        return pd.read_parquet(path)
+
+    def _write(self, granularity, totals):
+        os.makedirs(self.root, exist_ok=True)
+        path = self._path(granularity)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        totals.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _empty():
+        return pd.DataFrame({
+            'vehicle_id': pd.Series(dtype='object'),
+            'date': pd.Series(dtype='datetime64[ns]'),
+            'emissions': pd.Series(dtype='float64'),
+            'distance': pd.Series(dtype='float64'),
+            'fuel_used': pd.Series(dtype='float64'),
+            'trips': pd.Series(dtype='int64'),
+        })
+
+
+def main(argv=None):
+    from utils.data_manager import get_emissions_rollup, get_trip_store
+
+    parser = argparse.ArgumentParser(description="Maintain the emissions rollups.")
+    parser.add_argument('command', choices=['rebuild', 'check'])
+    args = parser.parse_args(argv)
+
+    rollup = get_emissions_rollup()
+    if args.command == 'rebuild':
+        rollup.rebuild(get_trip_store())
+        print("Rollups rebuilt.")
+        return 0
+
+    mismatches = rollup.check(get_trip_store())
+    failed = False
+    for granularity, periods in mismatches.items():
+        if periods:
+            failed = True
+            print(f"{granularity}: {len(periods)} vehicle periods differ from a full recompute")
+        else:
+            print(f"{granularity}: OK")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,234 @@
+import glob
+import os
+from collections import namedtuple
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from utils.locks import file_lock
+from utils.trip_store import inclusive_end, month_keys
+
+# Sampled trips kept per calendar month; months with fewer trips are kept whole and answer exactly
+SAMPLE_SIZE = 10_000
+SAMPLE_COLUMNS = ['vehicle_id', 'date', 'distance', 'fuel_consumption', 'eco_score', 'harsh_braking',
+                  'rapid_acceleration']
+
+# Per-trip measures that are summed; the metrics are totals of some and ratios of others
+MEASURES = ['trips', 'distance', 'fuel_used', 'eco_score', 'harsh_braking', 'rapid_acceleration', 'harsh_events']
+TOTAL_METRICS = ['trips', 'distance', 'harsh_events']
+RATIO_METRICS = {
+    'fuel_consumption': ('fuel_used', 'distance', 100),  # distance-weighted L/100km
+    'eco_score': ('eco_score', 'trips', 1),  # mean over trips
+}
+
+Estimate = namedtuple('Estimate', ['value', 'low', 'high'])
+
+
+def trip_measures(trips):
+    """Return the per-trip values of every measure in ``MEASURES``."""
+    distance = trips['distance'].to_numpy(dtype=float)
+    harsh_braking = trips['harsh_braking'].to_numpy(dtype=float)
+    rapid_acceleration = trips['rapid_acceleration'].to_numpy(dtype=float)
+    return {
+        'trips': np.ones(len(trips)),
+        'distance': distance,
+        'fuel_used': distance * trips['fuel_consumption'].to_numpy(dtype=float) / 100,
+        'eco_score': trips['eco_score'].to_numpy(dtype=float),
+        'harsh_braking': harsh_braking,
+        'rapid_acceleration': rapid_acceleration,
+        'harsh_events': harsh_braking + rapid_acceleration,
+    }
+
+
+def trip_sums(trips):
+    """Return the exact sum of every measure over ``trips``."""
+    return {name: float(values.sum()) for name, values in trip_measures(trips).items()}
+
+
+def exact_metrics(sums):
+    """Turn exact measure sums into metrics whose confidence interval is the value itself."""
+    metrics = {name: Estimate(sums[name], sums[name], sums[name]) for name in TOTAL_METRICS}
+    for name, (numerator, denominator, scale) in RATIO_METRICS.items():
+        value = scale * sums[numerator] / sums[denominator] if sums[denominator] else 0.0
+        metrics[name] = Estimate(value, value, value)
+    return metrics
+
+
+def _priorities(trips):
+    # A trip's priority is a hash of its identity, so it is the same whichever batch the
+    # trip arrives in and samples can be merged by keeping the lowest priorities
+    hashes = pd.util.hash_pandas_object(trips[['vehicle_id', 'date', 'distance']], index=False).to_numpy()
+    return hashes / np.float64(2 ** 64)
+
+
+class TripSample:
+    """Stratified bottom-k sample of the trip store for fast approximate fleet metrics.
+
+    Each calendar month is a stratum holding at most ``sample_size`` trips chosen by a
+    hash priority, plus the month's exact trip count. Appending trips merges into the
+    affected months only, and estimates read a few thousand rows per month no matter
+    how many trips are stored.
+    """
+
+    def __init__(self, root, sample_size=SAMPLE_SIZE):
+        self.root = root
+        self.sample_size = sample_size
+
+    def is_empty(self):
+        return not os.path.exists(self._strata_path())
+
+    def is_complete(self):
+        """Return True once the sample has been built from the full trip history."""
+        return os.path.exists(self._complete_path())
+
+    def ensure_complete(self, trip_store):
+        """Build the sample from the full trip history unless that has been done already.
+
+        Call it before appending trips that ``update`` will fold in, so a store written
+        before the sample existed isn't sampled from its new trips only.
+        """
+        if self.is_complete():
+            return
+        with file_lock(self._lock_path()):
+            if not self.is_complete():
+                self._rebuild(trip_store)
+
+    def update(self, trips):
+        """Merge newly appended trips into the sample of their months.
+
+        The read-merge-write is done under the sample's file lock, so concurrent updates
+        from other sessions or processes can't drop each other's trips or counts.
+        """
+        if trips.empty:
+            return
+        with file_lock(self._lock_path()):
+            self._merge(trips)
+
+    def rebuild(self, trip_store):
+        """Resample the full trip history."""
+        with file_lock(self._lock_path()):
+            self._rebuild(trip_store)
+
+    def _rebuild(self, trip_store):
+        if self.is_complete():
+            os.remove(self._complete_path())
+        for path in glob.glob(os.path.join(self.root, "*.parquet")):
+            os.remove(path)
+        for trips in trip_store.scan(columns=SAMPLE_COLUMNS):
+            self._merge(trips)
+        os.makedirs(self.root, exist_ok=True)
+        open(self._complete_path(), 'w').close()
+
+    def _merge(self, trips):
+        trips = trips[SAMPLE_COLUMNS].assign(date=pd.to_datetime(trips['date']),
+                                             vehicle_id=trips['vehicle_id'].astype(str))
+        trips['priority'] = _priorities(trips)
+        counts = self._read_strata()
+        for month, group in trips.groupby(month_keys(trips['date']), sort=False):
+            existing = self._read_month(month)
+            merged = pd.concat([existing, group], ignore_index=True) if len(existing) else group
+            merged = merged.sort_values('priority', kind='stable').head(self.sample_size)
+            self._write(self._month_path(month), merged.reset_index(drop=True))
+            counts[month] = counts.get(month, 0) + len(group)
+        self._write(self._strata_path(), pd.DataFrame({'month': list(counts), 'trips': list(counts.values())}))
+
+    def estimate(self, start=None, end=None, confidence=0.95):
+        """Estimate fleet-wide trip metrics for a period, as ``{name: Estimate}``.
+
+        Totals use the stratified expansion estimator and averages the ratio estimator;
+        intervals come from their variance across strata at the given ``confidence``.
+        """
+        strata = [(count, len(rows), {name: values * inside for name, values in trip_measures(rows).items()})
+                  for count, rows, inside in self._strata_in_range(start, end)]
+
+        totals = {name: sum(count / n * measures[name].sum() for count, n, measures in strata) for name in MEASURES}
+        z = NormalDist().inv_cdf((1 + confidence) / 2)
+
+        def interval(value, variance):
+            half_width = z * np.sqrt(variance)
+            return Estimate(value, value - half_width, value + half_width)
+
+        metrics = {}
+        for name in TOTAL_METRICS:
+            metrics[name] = interval(totals[name], _variance(strata, lambda measures: measures[name]))
+        for name, (numerator, denominator, scale) in RATIO_METRICS.items():
+            if not totals[denominator]:
+                metrics[name] = Estimate(0.0, 0.0, 0.0)
+                continue
+            ratio = totals[numerator] / totals[denominator]
+            # Linearised variance of a ratio of two estimated totals
+            variance = _variance(strata, lambda measures: measures[numerator] - ratio * measures[denominator])
+            metrics[name] = interval(scale * ratio, scale ** 2 * variance / totals[denominator] ** 2)
+        return metrics
+
+    def daily_totals(self, start=None, end=None):
+        """Estimate fleet-wide per-day sums of every measure, one row per day with sampled trips."""
+        frames = []
+        for count, rows, inside in self._strata_in_range(start, end):
+            weight = count / len(rows)
+            frame = pd.DataFrame({name: values * weight for name, values in trip_measures(rows).items()})
+            frame['date'] = rows['date'].dt.normalize().to_numpy()
+            frames.append(frame[inside])
+        if not frames:
+            return pd.DataFrame(columns=['date'] + MEASURES)
+        return pd.concat(frames, ignore_index=True).groupby('date', as_index=False, sort=True).sum()
+
+    def _strata_in_range(self, start, end):
+        """Yield (trip count, sampled rows, rows-in-range mask) for every month overlapping the range."""
+        start = None if start is None else pd.Timestamp(start)
+        end = None if end is None else inclusive_end(end)
+        for month, count in self._read_strata().items():
+            if start is not None and month < start.strftime('%Y-%m'):
+                continue
+            if end is not None and month > end.strftime('%Y-%m'):
+                continue
+            rows = self._read_month(month)
+            if rows.empty:
+                continue
+            inside = np.ones(len(rows), dtype=bool)
+            if start is not None:
+                inside &= (rows['date'] >= start).to_numpy()
+            if end is not None:
+                inside &= (rows['date'] <= end).to_numpy()
+            yield count, rows, inside
+
+    def _lock_path(self):
+        return os.path.join(self.root, ".lock")
+
+    def _complete_path(self):
+        return os.path.join(self.root, "complete")
+
+    def _strata_path(self):
+        return os.path.join(self.root, "strata.parquet")
+
+    def _month_path(self, month):
+        return os.path.join(self.root, f"{month}.parquet")
+
+    def _read_strata(self):
+        if self.is_empty():
+            return {}
+        strata = pd.read_parquet(self._strata_path())
+        return dict(zip(strata['month'], strata['trips'].astype(int)))
+
+    def _read_month(self, month):
+        path = self._month_path(month)
+        if not os.path.exists(path):
+            return pd.DataFrame(columns=SAMPLE_COLUMNS + ['priority'])
+        return pd.read_parquet(path)
+
+    def _write(self, path, frame):
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        frame.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+
+
+def _variance(strata, values_of):
+    """Variance of a stratified expansion estimator of the total of ``values_of(measures)``."""
+    variance = 0.0
+    for count, n, measures in strata:
+        if n > 1 and n < count:
+            values = values_of(measures)
+            variance += count ** 2 * (1 - n / count) * values.var(ddof=1) / n
+    return variance
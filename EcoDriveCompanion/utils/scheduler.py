@@ -0,0 +1,126 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Call priorities, most urgent first: a user waiting on a page, then precomputation
+INTERACTIVE = 0
+BACKGROUND = 1
+
+# Longest a call may queue for budget before it is shed to the fallback answer
+DEFAULT_MAX_WAIT = {INTERACTIVE: 5.0, BACKGROUND: 120.0}
+
+
+class LoadShedError(RuntimeError):
+    """Raised instead of queueing a call that would not get budget within its priority's wait limit."""
+
+
+class RateScheduler:
+    """Admit upstream calls within requests- and tokens-per-minute budgets, most urgent first.
+
+    Calls queue by priority (then arrival) and the head of the queue goes as soon as the
+    rolling one-minute window has room for one more request and its estimated tokens.
+    A call that can't be admitted within its priority's ``max_wait`` raises
+    LoadShedError, so excess load falls back to local answers instead of piling up
+    behind the provider's rate limits.
+    """
+
+    def __init__(self, rpm, tpm, max_wait=None, window=60.0, name='upstream'):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_wait = {**DEFAULT_MAX_WAIT, **(max_wait or {})}
+        self.window = window
+        self.name = name
+        self._admitted = deque()  # [admitted at, tokens] for calls inside the window
+        self._tokens = 0
+        self._queue = []
+        self._sequence = itertools.count()
+        self._paused_until = 0.0
+        self._counts = {'admitted': 0, 'shed': 0}
+        self._condition = threading.Condition()
+
+    def acquire(self, tokens, priority=INTERACTIVE):
+        """Wait for budget for a call of about ``tokens`` tokens and return its admission ticket.
+
+        Pass the ticket to ``settle`` with the tokens actually used once they are known.
+        """
+        tokens = min(tokens, self.tpm)  # a call larger than the whole budget would never fit
+        deadline = time.monotonic() + self.max_wait[priority]
+        entry = (priority, next(self._sequence))
+        with self._condition:
+            heapq.heappush(self._queue, entry)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._expire(now)
+                    if self._queue[0] == entry:
+                        wait = self._wait_time(now, tokens)
+                        if wait == 0:
+                            ticket = [now, tokens]
+                            self._admitted.append(ticket)
+                            self._tokens += tokens
+                            self._counts['admitted'] += 1
+                            return ticket
+                        if now + wait > deadline:
+                            break
+                    else:
+                        wait = deadline - now
+                        if wait <= 0:
+                            break
+                    self._condition.wait(timeout=wait)
+            finally:
+                self._queue.remove(entry)
+                heapq.heapify(self._queue)
+                self._condition.notify_all()
+            self._counts['shed'] += 1
+        logger.info("Shed a priority %d call to %s: no budget within %.0fs", priority, self.name,
+                    self.max_wait[priority])
+        raise LoadShedError(f"{self.name} is at its rate limit; serving fallback")
+
+    def settle(self, ticket, tokens):
+        """Replace a call's estimated tokens with what it actually used."""
+        with self._condition:
+            if ticket[1] is not None:
+                self._tokens += tokens - ticket[1]
+                ticket[1] = tokens
+                self._condition.notify_all()
+
+    def pause(self, seconds):
+        """Admit nothing for ``seconds``, e.g. after the provider answered with a rate limit error."""
+        with self._condition:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        logger.warning("Pausing calls to %s for %.1fs after a rate limit response", self.name, seconds)
+
+    def snapshot(self):
+        """Return the budget in use over the last window, queued calls by priority and admitted/shed counts."""
+        with self._condition:
+            self._expire(time.monotonic())
+            queued = {}
+            for priority, _ in self._queue:
+                queued[priority] = queued.get(priority, 0) + 1
+            return dict(self._counts, requests_in_window=len(self._admitted), tokens_in_window=self._tokens,
+                        rpm=self.rpm, tpm=self.tpm, queued=queued)
+
+    def _expire(self, now):
+        while self._admitted and now - self._admitted[0][0] >= self.window:
+            ticket = self._admitted.popleft()
+            self._tokens -= ticket[1]
+            ticket[1] = None
+
+    def _wait_time(self, now, tokens):
+        """Seconds until a call of ``tokens`` fits both budgets (0 if it fits now)."""
+        wait = max(0.0, self._paused_until - now)
+        if len(self._admitted) >= self.rpm:
+            wait = max(wait, self._admitted[len(self._admitted) - self.rpm][0] + self.window - now)
+        excess = self._tokens + tokens - self.tpm
+        if excess > 0:
+            for admitted_at, used in self._admitted:
+                excess -= used
+                if excess <= 0:
+                    wait = max(wait, admitted_at + self.window - now)
+                    break
+        return wait
@@ -0,0 +1,222 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.fleet import DEFAULT_VEHICLE
+from utils.maintenance_store import MAINTENANCE_INTERVALS
+
+# Fleet mix: fuel type -> (share of vehicles, typical consumption per 100 km, models).
+# Electric consumption is in kWh/100km, matching how emissions are calculated for it.
+FUEL_PROFILES = {
+    'petrol': (0.45, 7.2, ['Volkswagen Golf', 'Ford Focus', 'Honda Civic', 'Mazda CX-5 SUV']),
+    'diesel': (0.20, 5.9, ['Skoda Octavia', 'Ford Transit', 'Peugeot 308', 'Toyota Hilux Truck']),
+    'hybrid': (0.20, 4.6, ['Toyota Prius', 'Hyundai Ioniq Hybrid', 'Toyota RAV4 Hybrid SUV']),
+    'electric': (0.15, 16.5, ['Tesla Model 3', 'Nissan Leaf EV', 'Kia EV6']),
+}
+
+# Maintenance items each fuel type actually needs
+MAINTENANCE_ITEMS = {
+    'petrol': ['Oil Change', 'Tire Rotation', 'Air Filter', 'Brake Service', 'Fluid Check'],
+    'diesel': ['Oil Change', 'Tire Rotation', 'Air Filter', 'Brake Service', 'Fluid Check'],
+    'hybrid': ['Oil Change', 'Tire Rotation', 'Air Filter', 'Brake Service', 'Fluid Check', 'Battery Service'],
+    'electric': ['Tire Rotation', 'Brake Service', 'Fluid Check', 'Battery Service'],
+}
+
+# Share of a day's trips starting in each hour: morning and evening commute peaks
+_HOUR_WEIGHTS = np.array([1, 0.5, 0.3, 0.3, 0.5, 1.5, 4, 8, 9, 5, 4, 4.5,
+                          5, 4.5, 4, 5, 7, 9, 8, 5, 3.5, 2.5, 2, 1.5])
+_HOUR_WEIGHTS = _HOUR_WEIGHTS / _HOUR_WEIGHTS.sum()
+
+DEFAULT_SEED = 42
+DEFAULT_CHUNK_ROWS = 1_000_000
+
+
+def _rng(seed, *key):
+    """Return an independent generator for ``key``; the same seed and key always give the same stream."""
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=key))
+
+
+def vehicle_profiles(vehicles, seed=DEFAULT_SEED):
+    """Return the synthetic fleet as a DataFrame of per-vehicle driving characteristics.
+
+    Vehicle 0 is the app's default vehicle, so pages opened without picking a vehicle
+    have data to show.
+    """
+    fuel_types = list(FUEL_PROFILES)
+    shares = np.array([FUEL_PROFILES[name][0] for name in fuel_types])
+    profiles = []
+    for index in range(vehicles):
+        rng = _rng(seed, index)
+        if index == 0:
+            vehicle_id, fuel_type, model = DEFAULT_VEHICLE['vehicle_id'], DEFAULT_VEHICLE['fuel_type'], DEFAULT_VEHICLE['model']
+        else:
+            fuel_type = fuel_types[rng.choice(len(fuel_types), p=shares)]
+            vehicle_id, model = f"vehicle-{index:06d}", rng.choice(FUEL_PROFILES[fuel_type][2])
+        profiles.append({
+            'vehicle_id': vehicle_id,
+            'model': str(model),
+            'fuel_type': fuel_type,
+            'base_consumption': FUEL_PROFILES[fuel_type][1] * rng.normal(1, 0.08),
+            'trips_per_day': rng.gamma(4, 0.6),
+            'mean_distance': rng.lognormal(np.log(18), 0.45),  # km
+            'skill': rng.beta(6, 2),  # 0 (aggressive) .. 1 (smooth)
+            'odometer': rng.uniform(5_000, 120_000),  # km at the start of the generated period
+        })
+    return pd.DataFrame(profiles)
+
+
+def month_trips(profile, month, seed=DEFAULT_SEED, vehicle_index=0):
+    """Generate one vehicle's trips for one calendar month.
+
+    Each (vehicle, month) draws from its own seeded stream, so a month's trips are the
+    same whatever period, chunk size or vehicle count they are generated with.
+    """
+    return pd.DataFrame(_month_columns(profile, pd.Period(month, freq='M'), seed, vehicle_index))
+
+
+def _month_columns(profile, month, seed, vehicle_index):
+    rng = _rng(seed, vehicle_index, month.year * 12 + month.month)
+    first_day = np.datetime64(month.start_time.date(), 'D')
+    days = first_day + np.arange(month.days_in_month)
+
+    # Fewer trips at weekends (1970-01-01 was a Thursday)
+    weekday = (days.astype(np.int64) + 3) % 7
+    per_day = rng.poisson(profile['trips_per_day'] * np.where(weekday >= 5, 0.7, 1.0))
+    count = int(per_day.sum())
+    day_of_trip = np.repeat(days, per_day)
+    seconds = rng.choice(24, size=count, p=_HOUR_WEIGHTS) * 3600 + rng.integers(0, 3600, size=count)
+    dates = day_of_trip.astype('datetime64[ns]') + seconds.astype('timedelta64[s]')
+
+    distance = rng.lognormal(np.log(profile['mean_distance']), 0.6, count).clip(0.5, 600)
+    aggression = 1 - profile['skill']
+    exposure = np.sqrt(distance / 20)
+    harsh_braking = rng.poisson(3 * aggression * exposure)
+    rapid_acceleration = rng.poisson(2.5 * aggression * exposure)
+    eco_score = (100 * (0.6 + 0.4 * profile['skill']) - 4 * harsh_braking - 3 * rapid_acceleration
+                 + rng.normal(0, 5, count)).clip(0, 100)
+
+    # Consumption rises with aggressive driving, in winter and on short cold-start trips
+    day_of_year = (day_of_trip - day_of_trip.astype('datetime64[Y]')).astype(np.int64) + 1
+    seasonal = 1 + 0.08 * np.cos(2 * np.pi * (day_of_year - 15) / 365.25)
+    cold_start = 1 + 0.3 * np.exp(-distance / 5)
+    fuel_consumption = (profile['base_consumption'] * (1 + 0.25 * (1 - eco_score / 100)) * seasonal * cold_start
+                        * rng.normal(1, 0.05, count)).clip(0.5)
+
+    order = np.argsort(dates, kind='stable')
+    return {
+        'vehicle_id': np.full(count, profile['vehicle_id'], dtype=object),
+        'date': dates[order],
+        'distance': distance[order],
+        'fuel_consumption': fuel_consumption[order],
+        'eco_score': eco_score[order],
+        'harsh_braking': harsh_braking[order],
+        'rapid_acceleration': rapid_acceleration[order],
+    }
+
+
+def generate_trips(profiles, start, end, seed=DEFAULT_SEED, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Yield trips for every vehicle between ``start`` and ``end`` in DataFrames of about ``chunk_rows`` rows.
+
+    A vehicle's month is never split across chunks, so each month partition of the
+    trip store is written as a single file.
+    """
+    start = np.datetime64(pd.Timestamp(start).normalize(), 'ns')
+    end = np.datetime64(pd.Timestamp(end).normalize() + pd.Timedelta(days=1), 'ns')
+    months = pd.period_range(pd.Timestamp(start), pd.Timestamp(end) - pd.Timedelta(days=1), freq='M')
+    pending, pending_rows = [], 0
+    for index, profile in enumerate(profiles.to_dict('records')):
+        for position, month in enumerate(months):
+            columns = _month_columns(profile, month, seed, index)
+            if position == 0 or position == len(months) - 1:
+                inside = (columns['date'] >= start) & (columns['date'] < end)
+                columns = {name: values[inside] for name, values in columns.items()}
+            pending.append(columns)
+            pending_rows += len(columns['date'])
+            if pending_rows >= chunk_rows:
+                yield _concat_columns(pending)
+                pending, pending_rows = [], 0
+    if pending:
+        yield _concat_columns(pending)
+
+
+def _concat_columns(parts):
+    return pd.DataFrame({name: np.concatenate([part[name] for part in parts]) for name in parts[0]})
+
+
+def generate_maintenance(profiles, start, end, seed=DEFAULT_SEED):
+    """Yield service records, oldest first per vehicle and item, consistent with each vehicle's mileage."""
+    start, end = pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize()
+    for index, profile in enumerate(profiles.to_dict('records')):
+        rng = _rng(seed, index, 0)
+        daily_km = profile['trips_per_day'] * profile['mean_distance'] * np.exp(0.6 ** 2 / 2)
+        for item in MAINTENANCE_ITEMS[profile['fuel_type']]:
+            interval_km, interval_days = MAINTENANCE_INTERVALS[item]
+            # Whichever interval a vehicle reaches first sets its service rhythm
+            rhythm = min(interval_days, interval_km / daily_km)
+            service = start - pd.Timedelta(days=float(rng.uniform(0, rhythm)))
+            while True:
+                service += pd.Timedelta(days=float(rhythm * rng.uniform(0.85, 1.15)))
+                if service > end:
+                    break
+                elapsed = (service - start).days
+                yield {
+                    'vehicle_id': profile['vehicle_id'],
+                    'item': item,
+                    'service_date': service.normalize(),
+                    'mileage': int(profile['odometer'] + max(elapsed, 0) * daily_km),
+                    'interval_days': interval_days,
+                }
+
+
+def generate_dataset(vehicles, years, seed=DEFAULT_SEED, end=None, chunk_rows=DEFAULT_CHUNK_ROWS, rollups=True):
+    """Write a synthetic fleet to the app's data directory and return counts of what was written.
+
+    Trips are streamed to the trip store chunk by chunk; the emissions rollups and the
+    trip sample are rebuilt from the store afterwards rather than updated per chunk.
+    """
+    from utils.data_manager import (get_emissions_rollup, get_fleet_registry, get_maintenance_store, get_trip_sample,
+                                    get_trip_store)
+
+    end = pd.Timestamp(end or pd.Timestamp.today()).normalize()
+    start = end - pd.DateOffset(years=years) + pd.Timedelta(days=1)
+    profiles = vehicle_profiles(vehicles, seed)
+    get_fleet_registry().add(profiles[['vehicle_id', 'model', 'fuel_type']].to_dict('records'))
+
+    trip_store = get_trip_store()
+    trips = 0
+    for chunk in generate_trips(profiles, start, end, seed, chunk_rows):
+        trips += trip_store.append(chunk)
+    services = get_maintenance_store().record_many(generate_maintenance(profiles, start, end, seed))
+    if rollups:
+        get_emissions_rollup().rebuild(trip_store)
+        get_trip_sample().rebuild(trip_store)
+    return {'vehicles': len(profiles), 'trips': trips, 'services': services}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a reproducible synthetic fleet for benchmarking.")
+    parser.add_argument('--vehicles', type=int, default=100)
+    parser.add_argument('--years', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--end', help="last day of generated data (default: today); fix it for byte-identical reruns")
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument('--data-dir', help="write here instead of ECODRIVE_DATA_DIR")
+    parser.add_argument('--skip-rollups', action='store_true', help="don't rebuild the emissions rollups and trip sample")
+    args = parser.parse_args(argv)
+
+    if args.data_dir:
+        # Must be set before utils.data_manager is imported
+        os.environ['ECODRIVE_DATA_DIR'] = os.path.abspath(args.data_dir)
+    started = time.perf_counter()
+    counts = generate_dataset(args.vehicles, args.years, seed=args.seed, end=args.end, chunk_rows=args.chunk_rows,
+                              rollups=not args.skip_rollups)
+    print(f"Wrote {counts['trips']:,} trips and {counts['services']:,} services for {counts['vehicles']:,} vehicles "
+          f"in {time.perf_counter() - started:.1f}s.")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
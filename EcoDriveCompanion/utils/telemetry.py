@@ -0,0 +1,177 @@
+import numpy as np
+import pandas as pd
+
+from utils.trip_store import TRIP_COLUMNS
+
+# Columns expected in every raw telemetry chunk
+# timestamp: datetime64, speed: km/h, acceleration: m/s², fuel_rate: L/h
+# latitude/longitude are accepted but distance is integrated from speed, which is less noisy than GPS
+REQUIRED_COLUMNS = ('timestamp', 'speed', 'acceleration', 'fuel_rate')
+
+HARSH_BRAKING_THRESHOLD = -3.5  # m/s²
+RAPID_ACCELERATION_THRESHOLD = 3.0  # m/s²
+TRIP_GAP = pd.Timedelta(minutes=5)  # a longer pause between samples starts a new trip
+
+_NS_PER_HOUR = 3.6e12
+
+
+def eco_score(distance, fuel_consumption, harsh_braking, rapid_acceleration):
+    """Score trips 0-100 from harsh events per 10 km and consumption above 5 L/100km."""
+    distance = np.asarray(distance, dtype=float)
+    events = np.asarray(harsh_braking) + np.asarray(rapid_acceleration)
+    events_per_10km = np.divide(events * 10.0, distance, out=np.zeros_like(distance), where=distance > 0)
+    excess_consumption = np.clip(np.asarray(fuel_consumption, dtype=float) - 5.0, 0, None)
+    return np.clip(100.0 - 8.0 * events_per_10km - 4.0 * excess_consumption, 0, 100)
+
+
+class _OpenTrip:
+    """Running totals for the trip that is still receiving samples."""
+
+    __slots__ = ('start', 'last_ts', 'last_speed', 'last_fuel_rate', 'trip_id',
+                 'braking', 'accelerating', 'distance', 'fuel_used', 'harsh_braking', 'rapid_acceleration')
+
+    def __init__(self, start, trip_id):
+        self.start = start
+        self.trip_id = trip_id
+        self.distance = 0.0
+        self.fuel_used = 0.0
+        self.harsh_braking = 0
+        self.rapid_acceleration = 0
+
+
+class TelemetryAggregator:
+    """Turn chunks of raw telemetry into per-trip aggregates without keeping whole trips in memory.
+
+    Each chunk is processed with vectorized NumPy; only the running totals of the
+    currently open trip are carried over to the next chunk. Trips are split on a
+    change of ``trip_id`` (when the column is present) or on a gap longer than ``max_gap``.
+    """
+
+    def __init__(self, max_gap=TRIP_GAP):
+        self.max_gap_ns = pd.Timedelta(max_gap).value
+        self._open = None
+
+    def feed(self, chunk):
+        """Process one chunk and return a DataFrame of the trips it completed."""
+        missing = [name for name in REQUIRED_COLUMNS if name not in chunk]
+        if missing:
+            raise ValueError(f"Telemetry chunk is missing columns: {missing}")
+
+        ts = np.asarray(chunk['timestamp'], dtype='datetime64[ns]').view('int64')
+        n = len(ts)
+        if n == 0:
+            return _empty_trips()
+        speed = np.asarray(chunk['speed'], dtype=float)
+        accel = np.asarray(chunk['acceleration'], dtype=float)
+        fuel_rate = np.asarray(chunk['fuel_rate'], dtype=float)
+        trip_ids = np.asarray(chunk['trip_id']) if 'trip_id' in chunk else None
+
+        # Mark the first sample of every trip in this chunk
+        new_trip = np.empty(n, dtype=bool)
+        new_trip[1:] = np.diff(ts) > self.max_gap_ns
+        if trip_ids is not None:
+            new_trip[1:] |= trip_ids[1:] != trip_ids[:-1]
+        state = self._open
+        new_trip[0] = (state is None
+                       or ts[0] - state.last_ts > self.max_gap_ns
+                       or (trip_ids is not None and trip_ids[0] != state.trip_id))
+
+        # Shift every signal by one sample, seeding the first position from the open trip
+        carried = state is not None and not new_trip[0]
+        prev_ts = _shift(ts, state.last_ts if carried else ts[0])
+        prev_speed = _shift(speed, state.last_speed if carried else speed[0])
+        prev_fuel_rate = _shift(fuel_rate, state.last_fuel_rate if carried else fuel_rate[0])
+
+        dt_hours = (ts - prev_ts) / _NS_PER_HOUR
+        dt_hours[new_trip] = 0.0
+        distance = (speed + prev_speed) * 0.5 * dt_hours
+        fuel_used = (fuel_rate + prev_fuel_rate) * 0.5 * dt_hours
+
+        # Count events on the sample where the threshold is first crossed
+        braking = accel <= HARSH_BRAKING_THRESHOLD
+        accelerating = accel >= RAPID_ACCELERATION_THRESHOLD
+        prev_braking = _shift(braking, state.braking if carried else False)
+        prev_accelerating = _shift(accelerating, state.accelerating if carried else False)
+        prev_braking[new_trip] = False
+        prev_accelerating[new_trip] = False
+        braking_events = (braking & ~prev_braking).astype(np.int64)
+        accel_events = (accelerating & ~prev_accelerating).astype(np.int64)
+
+        # Per-segment totals in a single pass
+        seg_starts = np.flatnonzero(new_trip)
+        if carried:
+            seg_starts = np.concatenate(([0], seg_starts))
+        seg_distance = np.add.reduceat(distance, seg_starts)
+        seg_fuel = np.add.reduceat(fuel_used, seg_starts)
+        seg_braking = np.add.reduceat(braking_events, seg_starts)
+        seg_accel = np.add.reduceat(accel_events, seg_starts)
+
+        completed = []
+        for i, start in enumerate(seg_starts):
+            if i == 0 and carried:
+                trip = state
+            else:
+                if self._open is not None:
+                    completed.append(self._open)
+                trip = _OpenTrip(ts[start], trip_ids[start] if trip_ids is not None else None)
+            trip.distance += seg_distance[i]
+            trip.fuel_used += seg_fuel[i]
+            trip.harsh_braking += int(seg_braking[i])
+            trip.rapid_acceleration += int(seg_accel[i])
+            self._open = trip
+
+        last = self._open
+        last.last_ts = ts[-1]
+        last.last_speed = speed[-1]
+        last.last_fuel_rate = fuel_rate[-1]
+        last.braking = bool(braking[-1])
+        last.accelerating = bool(accelerating[-1])
+        return _trips_frame(completed)
+
+    def flush(self):
+        """Close the open trip, if any, and return it as a one-row DataFrame."""
+        trip, self._open = self._open, None
+        return _trips_frame([trip] if trip is not None else [])
+
+
+def ingest_telemetry(chunks, max_gap=TRIP_GAP):
+    """Yield per-trip aggregates as trips complete in a stream of telemetry chunks."""
+    aggregator = TelemetryAggregator(max_gap=max_gap)
+    for chunk in chunks:
+        trips = aggregator.feed(chunk)
+        if not trips.empty:
+            yield trips
+    trips = aggregator.flush()
+    if not trips.empty:
+        yield trips
+
+
+def _shift(values, first):
+    """Return ``values`` moved one position later, with ``first`` in front."""
+    shifted = np.empty_like(values)
+    shifted[0] = first
+    shifted[1:] = values[:-1]
+    return shifted
+
+
+def _empty_trips():
+    return pd.DataFrame({name: pd.Series(dtype='float64') for name in TRIP_COLUMNS}).astype(
+        {'date': 'datetime64[ns]', 'harsh_braking': 'int64', 'rapid_acceleration': 'int64'})
+
+
+def _trips_frame(trips):
+    if not trips:
+        return _empty_trips()
+    distance = np.array([trip.distance for trip in trips])
+    fuel_used = np.array([trip.fuel_used for trip in trips])
+    harsh_braking = np.array([trip.harsh_braking for trip in trips], dtype=np.int64)
+    rapid_acceleration = np.array([trip.rapid_acceleration for trip in trips], dtype=np.int64)
+    fuel_consumption = np.divide(fuel_used * 100.0, distance, out=np.zeros_like(distance), where=distance > 0)
+    return pd.DataFrame({
+        'date': pd.to_datetime(np.array([trip.start for trip in trips], dtype='int64')),
+        'distance': distance,
+        'fuel_consumption': fuel_consumption,
+        'eco_score': eco_score(distance, fuel_consumption, harsh_braking, rapid_acceleration),
+        'harsh_braking': harsh_braking,
+        'rapid_acceleration': rapid_acceleration,
+    })
@@ -0,0 +1,133 @@
+import argparse
+import glob
+import hashlib
+import os
+import re
+from functools import lru_cache
+
+import streamlit.components.v1 as components
+
+from utils.figures import THEME_ACCENTS, current_theme
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Stylesheet sources, edited by hand
+SOURCE_DIR = os.path.join(APP_DIR, "theme")
+# Built stylesheets; Streamlit serves this folder at app/static/ with server.enableStaticServing
+STATIC_DIR = os.path.join(APP_DIR, "static")
+STATIC_URL = "app/static"
+# Streamlit serves static .css as text/plain, which browsers won't apply from a <link>, so the page
+# fetches the stylesheet (through the HTTP cache) into a <style> of the app's document instead.
+# Only a new URL is fetched: reruns, page changes and switching back to a theme cost nothing.
+STYLESHEET_LOADER = (
+    "<script>"
+    "const doc = window.parent.document, href = new URL({href!r}, doc.baseURI).href;"
+    "let style = doc.getElementById('ecodrive-theme');"
+    "if (!style || style.dataset.href !== href) {{"
+    "fetch(href).then(response => response.text()).then(css => {{"
+    "style = doc.getElementById('ecodrive-theme') || doc.head.appendChild(doc.createElement('style'));"
+    "style.id = 'ecodrive-theme'; style.dataset.href = href; style.textContent = css;"
+    "}});"
+    "}}"
+    "</script>"
+)
+
+# Sources of each page's stylesheet, in cascade order
+PAGE_SOURCES = {
+    "home": ("base.css", "home.css"),
+    "driving": ("base.css", "driving.css"),
+    "maintenance": ("base.css", "maintenance.css"),
+    "carbon": ("base.css", "carbon.css"),
+}
+# The colours a theme changes; everything else in the sources is shared
+PALETTES = {
+    "Dark Green": {"primary-dark": "#1B5E20", "primary-main": "#2E7D32", "accent": "#81C784"},
+    "Dark Blue": {"primary-dark": "#0D47A1", "primary-main": "#1565C0", "accent": "#64B5F6"},
+    "Dark Purple": {"primary-dark": "#4A148C", "primary-main": "#7B1FA2", "accent": "#CE93D8"},
+}
+
+
+def minify_css(css):
+    """Return ``css`` without comments and the whitespace a browser doesn't need."""
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};,>])\s*", r"\1", css)
+    css = re.sub(r":\s+", ":", css)
+    return css.replace(";}", "}").strip()
+
+
+def palette_css(theme):
+    """Return the ``:root`` block setting ``theme``'s palette variables."""
+    colours = dict(PALETTES[theme], **{"primary-light": THEME_ACCENTS[theme]})
+    return ":root{" + ";".join(f"--{name}:{value}" for name, value in colours.items()) + "}"
+
+
+@lru_cache(maxsize=None)
+def build_stylesheet(page, theme):
+    """Return the file name and minified CSS of ``page``'s stylesheet in ``theme``.
+
+    The name carries a hash of the content, so a changed stylesheet gets a new URL and
+    browsers can keep every version for good. Sources are read once per process.
+    """
+    sources = []
+    for name in PAGE_SOURCES[page]:
+        with open(os.path.join(SOURCE_DIR, name), encoding="utf-8") as f:
+            sources.append(f.read())
+    css = palette_css(theme) + minify_css("\n".join(sources))
+    digest = hashlib.sha256(css.encode("utf-8")).hexdigest()[:12]
+    return f"{page}.{digest}.css", css
+
+
+@lru_cache(maxsize=None)
+def stylesheet_url(page, theme):
+    """Return the URL of ``page``'s stylesheet in ``theme``, writing it to the static folder if missing."""
+    name, css = build_stylesheet(page, theme)
+    _write(name, css)
+    # The ``v`` argument makes Streamlit's static file handler send long-lived cache headers
+    return f"{STATIC_URL}/{name}?v={name.split('.')[1]}"
+
+
+def use_theme(page):
+    """Apply ``page``'s stylesheet in the theme picked in the sidebar.
+
+    A rerun sends a short loader naming the stylesheet rather than the CSS itself; the
+    browser downloads each stylesheet once, and switching themes only changes the URL.
+    """
+    components.html(STYLESHEET_LOADER.format(href=stylesheet_url(page, current_theme())), height=0)
+
+
+def build_all():
+    """Write the stylesheet of every page and theme, delete outdated ones and return the file names."""
+    names = {build_stylesheet(page, theme)[0] for page in PAGE_SOURCES for theme in PALETTES}
+    for page in PAGE_SOURCES:
+        for theme in PALETTES:
+            _write(*build_stylesheet(page, theme))
+    for path in glob.glob(os.path.join(STATIC_DIR, "*.css")):
+        if os.path.basename(path) not in names:
+            os.remove(path)
+    return sorted(names)
+
+
+def _write(name, css):
+    path = os.path.join(STATIC_DIR, name)
+    if os.path.exists(path):
+        return
+    os.makedirs(STATIC_DIR, exist_ok=True)
+    # Written aside and renamed, so a server process never serves a half-written file
+    partial = f"{path}.{os.getpid()}.part"
+    with open(partial, "w", encoding="utf-8") as f:
+        f.write(css)
+    os.replace(partial, path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the minified, content-hashed stylesheets of every page "
+                                                 "and theme into static/, removing outdated ones.")
+    parser.parse_args(argv)
+    names = build_all()
+    sizes = sum(os.path.getsize(os.path.join(STATIC_DIR, name)) for name in names)
+    print(f"Built {len(names)} stylesheets ({sizes / 1024:.1f} kB) in {STATIC_DIR}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
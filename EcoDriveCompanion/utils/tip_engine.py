@@ -0,0 +1,101 @@
+# Rule-based driving tips for the common profiles; only unusual ones need the model.
+# Thresholds apply to the summary the model would get (``summarize_driving_data``):
+# averages and event totals over the last seven entries.
+
+TIPS_PER_ANSWER = 3
+
+# Where a profile is well understood; outside these the model is asked instead
+KNOWN_ECO_SCORE = (35, 100)
+KNOWN_FUEL_CONSUMPTION = (3.0, 12.0)  # L/100km; kWh figures of electric vehicles fall outside
+MAX_KNOWN_EVENTS = 35
+
+HARSH_BRAKING_EVENTS = 7
+RAPID_ACCELERATION_EVENTS = 6
+HIGH_FUEL_CONSUMPTION = 8.0
+LOW_ECO_SCORE = 60
+GOOD_ECO_SCORE = 80
+
+RULE_TIPS = {
+    'harsh_braking': [
+        "Look further ahead and lift off the accelerator early, so you can coast to a stop instead of braking hard.",
+        "Leave a bigger gap to the car in front; it gives you time to slow down gently.",
+        "Approach junctions and traffic lights expecting them to change, and ease off before you reach them.",
+    ],
+    'rapid_acceleration': [
+        "Accelerate gently, as if there were an open cup of coffee on the dashboard.",
+        "Shift up early (around 2,000 rpm) to keep the engine in its most efficient range.",
+        "Pull away smoothly from lights; hard starts use much more fuel and barely save any time.",
+    ],
+    'high_fuel_consumption': [
+        "Check your tire pressure monthly; under-inflated tires can raise consumption by several percent.",
+        "Combine short errands into one trip; a cold engine uses far more fuel for the first few kilometres.",
+        "Clear out excess weight and remove unused roof racks, which add drag at speed.",
+    ],
+    'low_eco_score': [
+        "Keep a steady speed and use cruise control on highways; constant speed changes cost up to 20% in efficiency.",
+        "Turn off the engine when you expect to wait more than a minute.",
+        "Drive a little below the limit on highways; consumption rises steeply above 90 km/h.",
+    ],
+    'good_driving': [
+        "Your driving is already efficient; keep anticipating traffic to hold your eco-score.",
+        "Plan routes that avoid stop-and-go traffic to make the most of your smooth driving style.",
+        "Keep up regular maintenance so the car stays as efficient as your driving.",
+    ],
+    'general': [
+        "Practice gradual acceleration to improve fuel efficiency.",
+        "Maintain a steady speed and avoid unnecessary braking.",
+        "Regular vehicle maintenance keeps your car running efficiently.",
+    ],
+}
+
+
+def needs_model(summary):
+    """Return why ``summary`` falls outside the profiles the rules cover, or None if they cover it."""
+    eco_score = summary['average_eco_score']
+    consumption = summary['average_fuel_consumption']
+    braking = summary['total_harsh_braking_events']
+    acceleration = summary['total_rapid_acceleration_events']
+
+    if not KNOWN_ECO_SCORE[0] <= eco_score <= KNOWN_ECO_SCORE[1]:
+        return "eco-score outside the usual range"
+    if not KNOWN_FUEL_CONSUMPTION[0] <= consumption <= KNOWN_FUEL_CONSUMPTION[1]:
+        return "fuel consumption outside the usual range"
+    if braking > MAX_KNOWN_EVENTS or acceleration > MAX_KNOWN_EVENTS:
+        return "unusually many harsh driving events"
+    if eco_score >= GOOD_ECO_SCORE and (braking >= 2 * HARSH_BRAKING_EVENTS
+                                        or acceleration >= 2 * RAPID_ACCELERATION_EVENTS):
+        return "good eco-score despite frequent harsh driving events"
+    return None
+
+
+def rule_tips(summary, best_effort=False):
+    """Return tips for ``summary`` from the curated rules, or None when the profile needs the model.
+
+    Rules that fire are ranked by how far the profile is past their threshold and the
+    tips are taken from them in that order, so the biggest issue comes first. With
+    ``best_effort`` tips are returned for any profile, for when the model can't be asked.
+    """
+    if not best_effort and needs_model(summary) is not None:
+        return None
+
+    eco_score = summary['average_eco_score']
+    triggered = []
+    if summary['total_harsh_braking_events'] >= HARSH_BRAKING_EVENTS:
+        triggered.append((summary['total_harsh_braking_events'] / HARSH_BRAKING_EVENTS, 'harsh_braking'))
+    if summary['total_rapid_acceleration_events'] >= RAPID_ACCELERATION_EVENTS:
+        triggered.append((summary['total_rapid_acceleration_events'] / RAPID_ACCELERATION_EVENTS, 'rapid_acceleration'))
+    if summary['average_fuel_consumption'] >= HIGH_FUEL_CONSUMPTION:
+        triggered.append((summary['average_fuel_consumption'] / HIGH_FUEL_CONSUMPTION, 'high_fuel_consumption'))
+    if eco_score < LOW_ECO_SCORE:
+        triggered.append((LOW_ECO_SCORE / max(eco_score, 1), 'low_eco_score'))
+    triggered.sort(key=lambda rule: rule[0], reverse=True)
+
+    rules = [name for _, name in triggered]
+    rules.append('good_driving' if not triggered and eco_score >= GOOD_ECO_SCORE else 'general')
+    # Take the first tip of every rule, then the second, and so on
+    tips = []
+    for position in range(max(len(RULE_TIPS[name]) for name in rules)):
+        for name in rules:
+            if position < len(RULE_TIPS[name]) and len(tips) < TIPS_PER_ANSWER:
+                tips.append(RULE_TIPS[name][position])
+    return tips
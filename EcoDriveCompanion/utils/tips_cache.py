@@ -0,0 +1,227 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from utils.resilience import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Cached model answers are reused for a day and at most this many are kept
+DEFAULT_TTL_SECONDS = 24 * 3600
+DEFAULT_MAX_ENTRIES = 10_000
+# A process computing a value holds the key's lease and renews it while it runs, however long
+# it queues for rate budget or streams; if it dies the lease lapses this long after the last renewal
+DEFAULT_LEASE_SECONDS = 60
+LEASE_RENEWALS_PER_TERM = 3
+LEASE_POLL_SECONDS = 0.1
+# The app's data directory, as in utils.data_manager; read on first use so tools can set
+# ECODRIVE_DATA_DIR before the cache is opened
+DEFAULT_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+_tips_cache = None
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS leases (
+    key TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires REAL NOT NULL
+);
+"""
+
+
+def cache_key(payload, model):
+    """Return the content address of a request: a hash of its canonical JSON and the model."""
+    canonical = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(f"{model}\n{canonical}".encode('utf-8')).hexdigest()
+
+
+def get_tips_cache():
+    """Return the on-disk cache of model answers shared by all sessions and workers."""
+    global _tips_cache
+    if _tips_cache is None:
+        data_dir = os.getenv("ECODRIVE_DATA_DIR", DEFAULT_DATA_DIR)
+        _tips_cache = TipsCache(os.path.join(data_dir, "llm_cache.sqlite"))
+    return _tips_cache
+
+
+class TipsCache:
+    """SQLite cache of model responses shared by every Streamlit worker process.
+
+    Entries expire ``ttl`` seconds after they were written; beyond ``max_entries`` the
+    least recently read are evicted. Hits and misses are counted in the database so
+    the numbers cover all processes.
+    """
+
+    def __init__(self, path, ttl=DEFAULT_TTL_SECONDS, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._initialized = False
+        self._flights = SingleFlight()
+
+    @contextmanager
+    def _connect(self):
+        if not self._initialized:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            if not self._initialized:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(SCHEMA)
+                self._initialized = True
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key):
+        """Return the cached value for ``key``, or None when it is missing or expired."""
+        return self._lookup(key, count=True)
+
+    def contains(self, key):
+        """Return True if ``key`` has an unexpired value, without counting a hit or miss."""
+        with self._connect() as conn:
+            return conn.execute("SELECT 1 FROM responses WHERE key = ? AND created >= ?",
+                                (key, time.time() - self.ttl)).fetchone() is not None
+
+    def get_or_compute(self, key, compute, lease_seconds=DEFAULT_LEASE_SECONDS):
+        """Return the cached value for ``key``, calling ``compute()`` and caching its result on a miss.
+
+        Concurrent misses for the same key are coalesced: threads of this process wait on
+        the one computing it, and other processes wait while it holds the key's lease, so
+        identical requests reach the upstream once. If the computing caller fails, its
+        threads share the error and a waiting process takes over the lease.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+        value, shared = self._flights.do(key, self._compute_once, key, compute, lease_seconds)
+        if shared:
+            with self._connect() as conn:
+                self._count(conn, 'coalesced')
+        return value
+
+    def _compute_once(self, key, compute, lease_seconds):
+        with self.lease(key, lease_seconds) as cached:
+            if cached is not None:
+                return cached
+            value = compute()
+            self.set(key, value)
+            return value
+
+    @contextmanager
+    def lease(self, key, lease_seconds=DEFAULT_LEASE_SECONDS):
+        """Hold ``key``'s lease for the block, for computations ``get_or_compute`` can't wrap (e.g. streams).
+
+        Waits while another caller holds it. Yields the cached value if that caller stored
+        one meanwhile, else None: the block should then compute and ``set`` the value, with
+        the lease renewed until it ends.
+        """
+        owner = f"{os.getpid()}:{threading.get_ident()}"
+        while True:
+            leased = self._acquire(key, owner, lease_seconds)
+            # Checked after taking the lease too, as the previous holder may have just stored it
+            value = self._lookup(key, count=False)
+            if value is not None:
+                if leased:
+                    self._release(key, owner)
+                with self._connect() as conn:
+                    self._count(conn, 'coalesced')
+                yield value
+                return
+            if leased:
+                break
+            time.sleep(LEASE_POLL_SECONDS)
+        stop = threading.Event()
+        renewer = threading.Thread(target=self._renew, args=(key, owner, lease_seconds, stop),
+                                   name='tips-cache-lease', daemon=True)
+        renewer.start()
+        try:
+            yield None
+        finally:
+            stop.set()
+            renewer.join()
+            self._release(key, owner)
+
+    def _renew(self, key, owner, lease_seconds, stop):
+        while not stop.wait(lease_seconds / LEASE_RENEWALS_PER_TERM):
+            try:
+                with self._connect() as conn:
+                    conn.execute("UPDATE leases SET expires = ? WHERE key = ? AND owner = ?",
+                                 (time.time() + lease_seconds, key, owner))
+            except sqlite3.Error as error:
+                logger.warning("Could not renew the lease on %s: %s", key, error)
+
+    def _acquire(self, key, owner, lease_seconds):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("DELETE FROM leases WHERE key = ? AND expires < ?", (key, now))
+            return conn.execute("INSERT OR IGNORE INTO leases (key, owner, expires) VALUES (?, ?, ?)",
+                                (key, owner, now + lease_seconds)).rowcount == 1
+
+    def _release(self, key, owner):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, owner))
+
+    def _lookup(self, key, count):
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute("SELECT value, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and row[1] >= now - self.ttl:
+                conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+                if count:
+                    self._count(conn, 'hits')
+                return row[0]
+            if row is not None:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            if count:
+                self._count(conn, 'misses')
+            return None
+
+    def set(self, key, value):
+        """Store ``value`` under ``key`` and evict expired and least recently used entries."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO responses (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                         (key, value, now, now))
+            conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+            conn.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def stats(self):
+        """Return hit, miss and coalesced-wait counts across all processes, plus the number of cached entries."""
+        with self._connect() as conn:
+            counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+            entries = conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {'hits': counters.get('hits', 0), 'misses': counters.get('misses', 0),
+                'coalesced': counters.get('coalesced', 0), 'entries': entries}
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM responses")
+            conn.execute("DELETE FROM counters")
+            conn.execute("DELETE FROM leases")
+
+    @staticmethod
+    def _count(conn, name):
+        conn.execute("INSERT INTO counters (name, value) VALUES (?, 1) "
+                     "ON CONFLICT(name) DO UPDATE SET value = value + 1", (name,))
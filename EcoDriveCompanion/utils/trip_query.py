@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+
+from utils.trip_store import inclusive_end
+
+# Sort orders understood by TripIndex.query
+SORT_ORDERS = ('date_desc', 'date_asc', 'eco_desc', 'eco_asc')
+
+
+class TripIndex:
+    """Read-only index over a date-indexed trip frame for interactive history queries.
+
+    Built once per data version: the date index is kept sorted so a date range is two
+    binary searches, and the eco-score order is precomputed so an eco-score threshold
+    is one more binary search and sorting by score is free. Queries only touch the
+    rows they return.
+    """
+
+    def __init__(self, trips):
+        if not trips.index.is_monotonic_increasing:
+            trips = trips.sort_index(kind='stable')
+        self.trips = trips
+        self._dates = trips.index.to_numpy(dtype='datetime64[ns]').view('int64')
+        eco = trips['eco_score'].to_numpy()
+        self._eco = eco
+        self._eco_order = np.argsort(eco, kind='stable')
+        self._eco_sorted = eco[self._eco_order]
+
+    def __len__(self):
+        return len(self.trips)
+
+    def positions(self, start=None, end=None, min_eco_score=None, sort='date_desc'):
+        """Return the row positions matching the filters, in the requested order."""
+        if sort not in SORT_ORDERS:
+            raise ValueError(f"Unknown sort order {sort!r}; expected one of {SORT_ORDERS}")
+        lo, hi = self._date_bounds(start, end)
+
+        if sort.startswith('date'):
+            positions = np.arange(lo, hi)
+            if min_eco_score is not None:
+                positions = positions[self._eco[lo:hi] >= min_eco_score]
+        else:
+            cut = 0 if min_eco_score is None else np.searchsorted(self._eco_sorted, min_eco_score, side='left')
+            positions = self._eco_order[cut:]
+            if lo > 0 or hi < len(self._dates):
+                positions = positions[(positions >= lo) & (positions < hi)]
+
+        if sort.endswith('desc'):
+            positions = positions[::-1]
+        return positions
+
+    def query(self, start=None, end=None, min_eco_score=None, sort='date_desc', offset=0, limit=None):
+        """Return the matching trips as a frame, optionally only one page of them."""
+        positions = self.positions(start, end, min_eco_score, sort)
+        stop = None if limit is None else offset + limit
+        return self.trips.iloc[positions[offset:stop]]
+
+    def _date_bounds(self, start, end):
+        lo = 0 if start is None else np.searchsorted(self._dates, pd.Timestamp(start).value, side='left')
+        hi = len(self._dates) if end is None else np.searchsorted(self._dates, inclusive_end(end).value,
+                                                                   side='right')
+        return lo, max(lo, hi)
@@ -0,0 +1,243 @@
+import os
+import uuid
+from urllib.parse import quote, unquote
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+# Column schema shared by every page that reads driving history
+TRIP_SCHEMA = pa.schema([
+    ('date', pa.timestamp('ns')),
+    ('distance', pa.float64()),  # km
+    ('fuel_consumption', pa.float64()),  # L/100km
+    ('eco_score', pa.float64()),  # 0-100
+    ('harsh_braking', pa.int64()),
+    ('rapid_acceleration', pa.int64()),
+])
+TRIP_COLUMNS = TRIP_SCHEMA.names
+
+# Compact in-memory dtypes for trip frames handed to the pages; float32 keeps far more
+# precision than the dashboards display and event counts per trip fit in a byte
+TRIP_FRAME_DTYPES = {
+    'vehicle_id': 'category',
+    'distance': 'float32',
+    'fuel_consumption': 'float32',
+    'eco_score': 'float32',
+    'harsh_braking': 'uint8',
+    'rapid_acceleration': 'uint8',
+}
+
+DEFAULT_VEHICLE_ID = 'default'
+
+# Trips are partitioned by vehicle, then calendar month, so a vehicle's range read
+# only opens the files it needs
+PARTITION_COLUMN = 'month'
+PARTITION_SCHEMA = pa.schema([('vehicle_id', pa.string()), (PARTITION_COLUMN, pa.string())])
+PARTITIONING = ds.partitioning(PARTITION_SCHEMA, flavor='hive')
+DATASET_SCHEMA = pa.schema(list(TRIP_SCHEMA) + list(PARTITION_SCHEMA))
+
+# Version markers, one per vehicle plus one for the whole store, rewritten by every append.
+# Dataset discovery skips names starting with '_', so they never show up as trips.
+VERSIONS_DIR = '_versions'
+FLEET_VERSION = 'fleet'
+
+
+def apply_trip_schema(trips):
+    """Return trips with the compact dtypes of ``TRIP_FRAME_DTYPES`` and a DatetimeIndex named ``date``.
+
+    Counts that overflow their declared type (e.g. fleet-wide daily totals) are widened
+    to the smallest unsigned type that holds them instead of wrapping around.
+    """
+    dtypes = {}
+    for name, dtype in TRIP_FRAME_DTYPES.items():
+        if name not in trips:
+            continue
+        if dtype.startswith('uint') and len(trips) and trips[name].max() > np.iinfo(dtype).max:
+            dtype = np.min_scalar_type(int(trips[name].max()))
+        dtypes[name] = dtype
+    return trips.astype(dtypes).set_index('date')
+
+
+def month_keys(dates):
+    """Return the 'YYYY-MM' month of every timestamp; much faster than ``strftime`` on large batches."""
+    months, inverse = np.unique(pd.to_datetime(dates).to_numpy().astype('datetime64[M]'), return_inverse=True)
+    return months.astype(str)[inverse]
+
+
+def inclusive_end(end):
+    """Return ``end`` as a Timestamp, treating a bare date as "through the end of that day"."""
+    end = pd.Timestamp(end)
+    if end == end.normalize():
+        end = end + pd.Timedelta(days=1) - pd.Timedelta(1, unit='ns')
+    return end
+
+
+def bytes_per_trip(trips):
+    """Return the in-memory size of a trip frame per row, index included."""
+    if len(trips) == 0:
+        return 0.0
+    return trips.memory_usage(index=True, deep=True).sum() / len(trips)
+
+
+class TripStore:
+    """Append-only Parquet store of per-trip records, partitioned by vehicle and month."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def is_empty(self):
+        """Return True when no trips have been written yet."""
+        if not os.path.isdir(self.root):
+            return True
+        for _, _, files in os.walk(self.root):
+            if any(name.endswith('.parquet') for name in files):
+                return False
+        return True
+
+    def append(self, trips, vehicle_id=DEFAULT_VEHICLE_ID):
+        """Append a DataFrame of trips; returns the number of rows written.
+
+        Trips without a ``vehicle_id`` column are attributed to ``vehicle_id``.
+        """
+        if trips.empty:
+            return 0
+        missing = set(TRIP_COLUMNS) - set(trips.columns)
+        if missing:
+            raise ValueError(f"Trips are missing columns: {sorted(missing)}")
+
+        frame = trips[TRIP_COLUMNS].copy()
+        frame['date'] = pd.to_datetime(frame['date'])
+        frame['vehicle_id'] = trips['vehicle_id'].astype(str) if 'vehicle_id' in trips else vehicle_id
+        frame[PARTITION_COLUMN] = month_keys(frame['date'])
+
+        table = pa.Table.from_pandas(frame, schema=DATASET_SCHEMA, preserve_index=False)
+        os.makedirs(self.root, exist_ok=True)
+        ds.write_dataset(
+            table,
+            self.root,
+            format='parquet',
+            partitioning=PARTITIONING,
+            basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+            existing_data_behavior='overwrite_or_ignore',
+        )
+        for name in ['vehicle_id=' + quote(v, safe='') for v in frame['vehicle_id'].unique()] + [FLEET_VERSION]:
+            self._bump_version(name)
+        return len(frame)
+
+    def vehicle_ids(self):
+        """Return the ids of all vehicles with stored trips."""
+        if not os.path.isdir(self.root):
+            return []
+        prefix = 'vehicle_id='
+        return sorted(unquote(name[len(prefix):]) for name in os.listdir(self.root) if name.startswith(prefix))
+
+    def version(self, vehicle_id=None):
+        """Return a cheap stamp that changes whenever trips are appended for ``vehicle_id`` (or any vehicle).
+
+        Reads one small marker file; ``'0'`` until the first append that writes it.
+        """
+        name = FLEET_VERSION if vehicle_id is None else 'vehicle_id=' + quote(vehicle_id, safe='')
+        try:
+            with open(os.path.join(self.root, VERSIONS_DIR, name), encoding='utf-8') as f:
+                return f.read()
+        except FileNotFoundError:
+            return '0'
+
+    def load(self, columns=None, start=None, end=None, vehicle_id=None, min_eco_score=None):
+        """Load trips sorted by date, reading only the requested columns and date range.
+
+        ``start`` and ``end`` are inclusive and accept anything ``pd.Timestamp`` understands.
+        ``vehicle_id`` is a single id or a list of ids; ``None`` loads every vehicle.
+        ``min_eco_score`` is applied while scanning, so Parquet row-group statistics can
+        skip data before it is decoded.
+        """
+        columns = list(columns) if columns else list(TRIP_COLUMNS)
+        if 'date' not in columns:
+            columns = ['date'] + columns
+        unknown = set(columns) - set(TRIP_COLUMNS) - {'vehicle_id'}
+        if unknown:
+            raise ValueError(f"Unknown trip columns: {sorted(unknown)}")
+
+        if self.is_empty():
+            return DATASET_SCHEMA.empty_table().select(columns).to_pandas()
+
+        expression = self._date_filter(start, end)
+        ids = None
+        if vehicle_id is not None:
+            ids = [vehicle_id] if isinstance(vehicle_id, str) else list(vehicle_id)
+            condition = ds.field('vehicle_id').isin(pa.array(ids, type=pa.string()))
+            expression = condition if expression is None else expression & condition
+        if min_eco_score is not None:
+            condition = ds.field('eco_score') >= min_eco_score
+            expression = condition if expression is None else expression & condition
+        table = self._dataset(ids, start, end).to_table(columns=columns, filter=expression)
+        frame = table.to_pandas()
+        return frame.sort_values('date', kind='stable').reset_index(drop=True)
+
+    def scan(self, columns=None, batch_size=1_000_000):
+        """Yield the stored trips as DataFrames of at most ``batch_size`` rows, in no particular order."""
+        if self.is_empty():
+            return
+        columns = list(columns) if columns else list(TRIP_COLUMNS)
+        # Every vehicle-month is its own small file, so coalesce their batches rather
+        # than handing the caller one tiny frame per file
+        pending, pending_rows = [], 0
+        for batch in self._dataset().to_batches(columns=columns, batch_size=batch_size):
+            if pending_rows + batch.num_rows > batch_size and pending:
+                yield pa.Table.from_batches(pending).to_pandas()
+                pending, pending_rows = [], 0
+            if batch.num_rows:
+                pending.append(batch)
+                pending_rows += batch.num_rows
+        if pending:
+            yield pa.Table.from_batches(pending).to_pandas()
+
+    def _dataset(self, vehicle_ids=None, start=None, end=None):
+        """Open the dataset, listing only the given vehicles' month directories within the range.
+
+        Discovering every file of a large fleet costs far more than reading one vehicle's
+        month, so vehicle reads walk their own partitions instead.
+        """
+        if vehicle_ids is None:
+            return ds.dataset(self.root, schema=DATASET_SCHEMA, format='parquet', partitioning=PARTITIONING)
+        first = None if start is None else f"{PARTITION_COLUMN}={pd.Timestamp(start).strftime('%Y-%m')}"
+        last = None if end is None else f"{PARTITION_COLUMN}={inclusive_end(end).strftime('%Y-%m')}"
+        paths = []
+        for vehicle_id in vehicle_ids:
+            vehicle_dir = os.path.join(self.root, 'vehicle_id=' + quote(vehicle_id, safe=''))
+            if not os.path.isdir(vehicle_dir):
+                continue
+            for month_dir in sorted(os.listdir(vehicle_dir)):
+                if (first is not None and month_dir < first) or (last is not None and month_dir > last):
+                    continue
+                directory = os.path.join(vehicle_dir, month_dir)
+                paths.extend(os.path.join(directory, name) for name in sorted(os.listdir(directory))
+                             if name.endswith('.parquet'))
+        return ds.dataset(paths, schema=DATASET_SCHEMA, format='parquet', partitioning=PARTITIONING,
+                          partition_base_dir=self.root)
+
+    def _bump_version(self, name):
+        # A fresh random token rather than a counter, so concurrent appends need no lock;
+        # written aside and renamed so readers never see a partial stamp
+        directory = os.path.join(self.root, VERSIONS_DIR)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, name)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(uuid.uuid4().hex)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _date_filter(start, end):
+        """Build a row filter plus a month filter that lets pyarrow prune partitions."""
+        expression = None
+        if start is not None:
+            start = pd.Timestamp(start)
+            expression = (ds.field(PARTITION_COLUMN) >= start.strftime('%Y-%m')) & (ds.field('date') >= start)
+        if end is not None:
+            end = inclusive_end(end)
+            condition = (ds.field(PARTITION_COLUMN) <= end.strftime('%Y-%m')) & (ds.field('date') <= end)
+            expression = condition if expression is None else expression & condition
+        return expression